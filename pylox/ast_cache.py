@@ -0,0 +1,65 @@
+import hashlib, os, pickle, sys, tempfile
+from pathlib import Path
+
+CACHE_DIR = "__loxcache__"
+MAGIC = b"LOXC"
+
+# Modules whose code decides what a resolved program looks like, including
+# the operator handlers and inline caches the resolver and interpreter store
+# on nodes. Changing any of them changes the version and so invalidates every
+# cache entry.
+FRONT_END_MODULES = ["tokentype.py", "expr.py", "stmt.py", "scanner.py", "parser.py", "resolver.py",
+                     "operators.py", "lox_callable.py"]
+
+def interpreter_version() -> bytes:
+    digest = hashlib.sha256(sys.version.encode())
+    here = Path(__file__).parent
+    for module in FRONT_END_MODULES:
+        digest.update((here / module).read_bytes())
+    return digest.digest()
+
+class AstCache:
+    version: bytes = None
+
+    def __init__(self, script: str) -> None:
+        script = Path(script)
+        self.path = script.parent / CACHE_DIR / f"{script.name}.loxc"
+        if AstCache.version is None:
+            AstCache.version = interpreter_version()
+
+    def key(self, source: str | bytes, encoding: str = "utf-8") -> bytes:
+        # Bytes are decoded with the given encoding, so the same bytes read
+        # under another encoding are a different program.
+        if isinstance(source, str):
+            source = source.encode("utf-8", "surrogatepass")
+            encoding = "utf-8"
+        digest = hashlib.sha256(self.version)
+        digest.update(encoding.encode() + b"\0")
+        digest.update(source)
+        return digest.digest()
+
+    def load(self, key: bytes):
+        try:
+            with open(self.path, 'rb') as f:
+                header = f.read(len(MAGIC) + len(key))
+                if header != MAGIC + key:
+                    return None
+                return pickle.load(f)
+        except Exception:
+            # A missing, stale or corrupt entry just means a cold run.
+            return None
+
+    def store(self, key: bytes, program) -> None:
+        try:
+            self.path.parent.mkdir(exist_ok=True)
+            fd, temp = tempfile.mkstemp(dir=self.path.parent)
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(MAGIC + key)
+                    pickle.dump(program, f, pickle.HIGHEST_PROTOCOL)
+                os.replace(temp, self.path)
+            except BaseException:
+                os.unlink(temp)
+                raise
+        except (OSError, RecursionError, pickle.PicklingError):
+            pass
@@ -0,0 +1,84 @@
+from enum import IntEnum
+from typing import Any
+from tokentype import Token
+
+class OpCode(IntEnum):
+    # The same instructions, in the same order, as clox/chunk.h, followed
+    # by the ones for classes and the long forms of those that take a
+    # constant index.
+    OP_CONSTANT = 0
+    OP_NIL = 1
+    OP_TRUE = 2
+    OP_FALSE = 3
+    OP_POP = 4
+    OP_GET_LOCAL = 5
+    OP_SET_LOCAL = 6
+    OP_GET_GLOBAL = 7
+    OP_DEFINE_GLOBAL = 8
+    OP_SET_GLOBAL = 9
+    OP_GET_UPVALUE = 10
+    OP_SET_UPVALUE = 11
+    OP_EQUAL = 12
+    OP_GREATER = 13
+    OP_LESS = 14
+    OP_ADD = 15
+    OP_SUBSTRACT = 16
+    OP_MULTIPLY = 17
+    OP_DIVIDE = 18
+    OP_NOT = 19
+    OP_NEGATE = 20
+    OP_PRINT = 21
+    OP_JUMP = 22
+    OP_JUMP_IF_FALSE = 23
+    OP_LOOP = 24
+    OP_CALL = 25
+    OP_CLOSURE = 26
+    OP_CLOSE_UPVALUE = 27
+    OP_RETURN = 28
+    OP_GET_PROPERTY = 29
+    OP_SET_PROPERTY = 30
+    OP_GET_SUPER = 31
+    OP_INVOKE = 32
+    OP_SUPER_INVOKE = 33
+    OP_CLASS = 34
+    OP_INHERIT = 35
+    OP_METHOD = 36
+    OP_CONSTANT_LONG = 37
+    OP_GET_GLOBAL_LONG = 38
+    OP_DEFINE_GLOBAL_LONG = 39
+    OP_SET_GLOBAL_LONG = 40
+    OP_CLOSURE_LONG = 41
+    OP_GET_PROPERTY_LONG = 42
+    OP_SET_PROPERTY_LONG = 43
+    OP_GET_SUPER_LONG = 44
+    OP_CLASS_LONG = 45
+    OP_METHOD_LONG = 46
+
+class Chunk:
+    def __init__(self) -> None:
+        self.code = bytearray()
+        self.lines: list[int] = []
+        self.constants: list[Any] = []
+        # The token behind each instruction that can fail, so runtime errors
+        # read the same as the tree-walker's.
+        self.tokens: dict[int, Token] = {}
+
+    def write(self, byte: int, line: int) -> None:
+        self.code.append(byte)
+        self.lines.append(line)
+
+    def add_constant(self, value: Any) -> int:
+        self.constants.append(value)
+        return len(self.constants) - 1
+
+class Function:
+    __slots__ = ("arity", "upvalue_count", "chunk", "name")
+
+    def __init__(self, name: str = None) -> None:
+        self.arity = 0
+        self.upvalue_count = 0
+        self.chunk = Chunk()
+        self.name = name
+
+    def __str__(self) -> str:
+        return "<script>" if self.name is None else f"<fn {self.name}>"
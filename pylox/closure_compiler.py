@@ -0,0 +1,331 @@
+from typing import Any, Callable
+from expr import *
+from stmt import *
+from tokentype import TokenType
+from environment import Environment, RuntimeException, UNDEFINED
+from lox_callable import *
+from interpreter import Interpreter
+from operators import BINARY, UNARY
+
+Code = Callable[[Environment], Any]
+
+class ClosureInterpreter(Interpreter):
+    # Runs the same resolved AST as Interpreter, but turns every node into a
+    # Python closure once instead of dispatching on it each time it runs.
+    def __init__(self) -> None:
+        super().__init__()
+        self.compiler = ClosureCompiler(self)
+        self.bodies: dict[StmtFunction, Code] = {}
+
+    def interpret(self, stmts: list[Stmt]):
+        try:
+            for code in [self.compiler.compile_stmt(stmt) for stmt in stmts]:
+                code(self.globals)
+            return None, self.errors
+        except RuntimeException as error:
+            return None, self.report(error)
+
+    def execute_body(self, declaration: StmtFunction, environment: Environment) -> Any:
+        return self.bodies[declaration](environment)
+
+class ClosureCompiler(ExprVisitor, StmtVisitor):
+    def __init__(self, interpreter: ClosureInterpreter) -> None:
+        self.interpreter = interpreter
+
+    def compile_stmt(self, stmt: Stmt) -> Code:
+        return stmt.accept(self)
+
+    def compile_expr(self, expr: Expr) -> Code:
+        return expr.accept(self)
+
+    def compile_list(self, statements: list[Stmt]) -> Code:
+        codes = tuple(self.compile_stmt(stmt) for stmt in statements)
+        if len(codes) == 1:
+            return codes[0]
+        def run(env):
+            for code in codes:
+                if code(env) is RETURN:
+                    return RETURN
+        return run
+
+    def compile_function(self, stmt: StmtFunction) -> None:
+        self.interpreter.bodies[stmt] = self.compile_list(stmt.body)
+
+    def compile_define(self, name: Token, slot: int, value: Code) -> Code:
+        if slot is None:
+            globals = self.interpreter.globals
+            def define_global(env):
+                globals.define(name.lexeme, value(env))
+            return define_global
+        def define(env):
+            env.values[slot] = value(env)
+        return define
+
+    def compile_get(self, name: Token, depth: int, slot: int) -> Code:
+        if depth is None:
+            globals = self.interpreter.globals
+            if slot is None:
+                return lambda env: globals.get(name)
+            def get_global(env):
+                value = globals.values[slot]
+                if value is UNDEFINED:
+                    return globals.get(name)
+                return value
+            return get_global
+        if depth == 0:
+            return lambda env: env.values[slot]
+        if depth == 1:
+            return lambda env: env.enclosing.values[slot]
+        return lambda env: env.ancestor(depth).values[slot]
+
+    def visit_block_stmt(self, stmt: StmtBlock) -> Code:
+        body = self.compile_list(stmt.statements)
+        size = stmt.size
+        if size is None:
+            return body
+        return lambda env: body(Environment(env, size))
+
+    def visit_class_stmt(self, stmt: StmtClass) -> Code:
+        interpreter = self.interpreter
+        superclass_code = self.compile_expr(stmt.superclass) if stmt.superclass is not None else None
+        for method in stmt.methods:
+            self.compile_function(method)
+        def klass(env):
+            superclass = None
+            if superclass_code is not None:
+                superclass = superclass_code(env)
+                if not isinstance(superclass, LoxClass):
+                    raise interpreter.error(stmt.superclass.name, "Superclass must be a class.")
+                env = Environment(env, 1)
+                env.values[0] = superclass
+            methods = {}
+            for method in stmt.methods:
+                methods[method.name.lexeme] = LoxFunction(method, env, method.name.lexeme == "init")
+            return LoxClass(stmt.name.lexeme, superclass, methods)
+        return self.compile_define(stmt.name, stmt.slot, klass)
+
+    def visit_expression_stmt(self, stmt: StmtExpression) -> Code:
+        return self.compile_expr(stmt.expression)
+
+    def visit_for_stmt(self, stmt: StmtFor) -> Code:
+        initializer = self.compile_stmt(stmt.initializer) if stmt.initializer is not None else None
+        condition = self.compile_expr(stmt.condition)
+        body = self.compile_stmt(stmt.body)
+        increment = self.compile_expr(stmt.increment) if stmt.increment is not None else None
+        size = stmt.size
+        def loop(env):
+            if size is not None:
+                env = Environment(env, size)
+            if initializer is not None:
+                initializer(env)
+            while True:
+                value = condition(env)
+                if value is None or value is False:
+                    return
+                if body(env) is RETURN:
+                    return RETURN
+                if increment is not None:
+                    increment(env)
+        return loop
+
+    def visit_function_stmt(self, stmt: StmtFunction) -> Code:
+        self.compile_function(stmt)
+        return self.compile_define(stmt.name, stmt.slot, lambda env: LoxFunction(stmt, env, False))
+
+    def visit_if_stmt(self, stmt: StmtIf) -> Code:
+        condition = self.compile_expr(stmt.condition)
+        then_branch = self.compile_stmt(stmt.then_branch)
+        else_branch = self.compile_stmt(stmt.else_branch) if stmt.else_branch is not None else None
+        def branch(env):
+            value = condition(env)
+            if value is not None and value is not False:
+                return then_branch(env)
+            elif else_branch is not None:
+                return else_branch(env)
+        return branch
+
+    def visit_print_stmt(self, stmt: StmtPrint) -> Code:
+        expression = self.compile_expr(stmt.expression)
+        stringify = self.interpreter.stringify
+        return lambda env: print(stringify(expression(env)))
+
+    def visit_return_stmt(self, stmt: StmtReturn) -> Code:
+        interpreter = self.interpreter
+        if stmt.tail:
+            callee_code = self.compile_expr(stmt.value.callee)
+            argument_codes = tuple(self.compile_expr(argument) for argument in stmt.value.arguments)
+            paren, tail = stmt.value.paren, interpreter.call_in_tail_position
+            def tail_call(env):
+                callee = callee_code(env)
+                interpreter.return_value = tail(paren, callee, [argument(env) for argument in argument_codes])
+                return RETURN
+            return tail_call
+        value = self.compile_expr(stmt.value) if stmt.value is not None else None
+        def ret(env):
+            interpreter.return_value = value(env) if value is not None else None
+            return RETURN
+        return ret
+
+    def visit_var_stmt(self, stmt: StmtVar) -> Code:
+        initializer = self.compile_expr(stmt.initializer) if stmt.initializer is not None else lambda env: None
+        return self.compile_define(stmt.name, stmt.slot, initializer)
+
+    def visit_while_stmt(self, stmt: StmtWhile) -> Code:
+        condition = self.compile_expr(stmt.condition)
+        body = self.compile_stmt(stmt.body)
+        def loop(env):
+            while True:
+                value = condition(env)
+                if value is None or value is False:
+                    return
+                if body(env) is RETURN:
+                    return RETURN
+        return loop
+
+    def visit_assign_expr(self, expr: ExprAssign) -> Code:
+        value_code = self.compile_expr(expr.value)
+        name, depth, slot = expr.name, expr.depth, expr.slot
+        if depth is None:
+            globals = self.interpreter.globals
+            def assign_global(env):
+                value = value_code(env)
+                if slot is not None and globals.values[slot] is not UNDEFINED:
+                    globals.values[slot] = value
+                else:
+                    globals.assign(name, value)
+                return value
+            return assign_global
+        if depth == 0:
+            def assign_local(env):
+                value = env.values[slot] = value_code(env)
+                return value
+            return assign_local
+        def assign(env):
+            value = env.ancestor(depth).values[slot] = value_code(env)
+            return value
+        return assign
+
+    def visit_binary_expr(self, expr: ExprBinary) -> Code:
+        left, right = self.compile_expr(expr.left), self.compile_expr(expr.right)
+        token, handler = expr.operator, expr.handler or BINARY[expr.operator.type]
+        return lambda env: handler(token, left(env), right(env))
+
+    def visit_call_expr(self, expr: ExprCall) -> Code:
+        if type(expr.callee) is ExprGet:
+            return self.compile_invoke(expr)
+        callee_code = self.compile_expr(expr.callee)
+        argument_codes = tuple(self.compile_expr(argument) for argument in expr.arguments)
+        interpreter, paren = self.interpreter, expr.paren
+        def call(env):
+            callee = callee_code(env)
+            arguments = [argument(env) for argument in argument_codes]
+            # Checking the protocol is slow; plain functions can skip it.
+            if type(callee) is not LoxFunction and not isinstance(callee, LoxCallable):
+                raise interpreter.error(paren, "Can only call functions and classes.")
+            if len(arguments) != callee.arity():
+                raise interpreter.error(paren, f"Expected {callee.arity()} arguments but got {len(arguments)}.")
+            return callee.call(interpreter, arguments)
+        return call
+
+    def compile_invoke(self, expr: ExprCall) -> Code:
+        # obj.method(...) calls the method with obj as 'this' directly,
+        # without building a bound method first.
+        object_code, get = self.compile_expr(expr.callee.object), self.compile_get_property(expr.callee)
+        argument_codes = tuple(self.compile_expr(argument) for argument in expr.arguments)
+        interpreter, paren, count = self.interpreter, expr.paren, len(expr.arguments)
+        cache, lexeme = InlineCache(), expr.callee.name.lexeme
+        def invoke(env):
+            obj = object_code(env)
+            if isinstance(obj, LoxInstance) and lexeme not in obj.shape:
+                klass = obj.klass
+                method = cache.method if klass is cache.klass else cache.lookup(klass, lexeme)
+                if method is not None:
+                    arguments = [argument(env) for argument in argument_codes]
+                    if count != method.arity():
+                        raise interpreter.error(paren, f"Expected {method.arity()} arguments but got {count}.")
+                    return method.invoke(interpreter, obj, arguments)
+            callee = get(obj)
+            arguments = [argument(env) for argument in argument_codes]
+            if not isinstance(callee, LoxCallable):
+                raise interpreter.error(paren, "Can only call functions and classes.")
+            if len(arguments) != callee.arity():
+                raise interpreter.error(paren, f"Expected {callee.arity()} arguments but got {len(arguments)}.")
+            return callee.call(interpreter, arguments)
+        return invoke
+
+    def visit_get_expr(self, expr: ExprGet) -> Code:
+        object_code, get = self.compile_expr(expr.object), self.compile_get_property(expr)
+        return lambda env: get(object_code(env))
+
+    def compile_get_property(self, expr: ExprGet) -> Callable[[Any], Any]:
+        name, error = expr.name, self.interpreter.error
+        cache, lexeme = InlineCache(), name.lexeme
+        def get(obj):
+            if not isinstance(obj, LoxInstance):
+                raise error(name, "Only instances have properties.")
+            index = obj.shape.get(lexeme)
+            if index is not None:
+                return obj.values[index]
+            klass = obj.klass
+            method = cache.method if klass is cache.klass else cache.lookup(klass, lexeme)
+            if method is None:
+                raise error(name, f"Undefined property '{lexeme}'.")
+            return method.bind(obj)
+        return get
+
+    def visit_grouping_expr(self, expr: ExprGrouping) -> Code:
+        return self.compile_expr(expr.expression)
+
+    def visit_literal_expr(self, expr: ExprLiteral) -> Code:
+        value = expr.value
+        return lambda env: value
+
+    def visit_logical_expr(self, expr: ExprLogical) -> Code:
+        left, right = self.compile_expr(expr.left), self.compile_expr(expr.right)
+        if expr.operator.type == TokenType.OR:
+            def logical_or(env):
+                value = left(env)
+                if value is not None and value is not False:
+                    return value
+                return right(env)
+            return logical_or
+        def logical_and(env):
+            value = left(env)
+            if value is None or value is False:
+                return value
+            return right(env)
+        return logical_and
+
+    def visit_set_expr(self, expr: ExprSet) -> Code:
+        object_code, value_code = self.compile_expr(expr.object), self.compile_expr(expr.value)
+        name, error = expr.name, self.interpreter.error
+        def set_field(env):
+            obj = object_code(env)
+            if not isinstance(obj, LoxInstance):
+                raise error(name, "Only instances have fields.")
+            value = value_code(env)
+            obj.store(name.lexeme, value)
+            return value
+        return set_field
+
+    def visit_super_expr(self, expr: ExprSuper) -> Code:
+        if expr.depth is None:
+            return lambda env: None
+        depth, slot, method_name, error = expr.depth, expr.slot, expr.method, self.interpreter.error
+        def super_method(env):
+            superclass = env.ancestor(depth).values[slot]
+            obj = env.ancestor(depth - 1).values[0]
+            method = superclass.find_method(method_name.lexeme)
+            if method == None: raise error(method_name, f"Undefined property '{method_name.lexeme}'.")
+            return method.bind(obj)
+        return super_method
+
+    def visit_this_expr(self, expr: ExprThis) -> Code:
+        return self.compile_get(expr.keyword, expr.depth, expr.slot)
+
+    def visit_unary_expr(self, expr: ExprUnary) -> Code:
+        right, token, handler = self.compile_expr(expr.right), expr.operator, expr.handler or UNARY[expr.operator.type]
+        return lambda env: handler(token, right(env))
+
+    def visit_variable_expr(self, expr: ExprVariable) -> Code:
+        return self.compile_get(expr.name, expr.depth, expr.slot)
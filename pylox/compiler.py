@@ -0,0 +1,450 @@
+from typing import Any
+from expr import *
+from stmt import *
+from tokentype import Token, TokenType
+from chunk import Chunk, Function, OpCode
+from resolver import FunctionType
+
+UINT8_COUNT = 256
+UINT24_COUNT = 1 << 24
+
+# Instructions with a long form taking a three-byte constant index.
+LONG = {
+    OpCode.OP_CONSTANT: OpCode.OP_CONSTANT_LONG,
+    OpCode.OP_GET_GLOBAL: OpCode.OP_GET_GLOBAL_LONG,
+    OpCode.OP_DEFINE_GLOBAL: OpCode.OP_DEFINE_GLOBAL_LONG,
+    OpCode.OP_SET_GLOBAL: OpCode.OP_SET_GLOBAL_LONG,
+    OpCode.OP_CLOSURE: OpCode.OP_CLOSURE_LONG,
+    OpCode.OP_GET_PROPERTY: OpCode.OP_GET_PROPERTY_LONG,
+    OpCode.OP_SET_PROPERTY: OpCode.OP_SET_PROPERTY_LONG,
+    OpCode.OP_GET_SUPER: OpCode.OP_GET_SUPER_LONG,
+    OpCode.OP_CLASS: OpCode.OP_CLASS_LONG,
+    OpCode.OP_METHOD: OpCode.OP_METHOD_LONG
+}
+
+class Local:
+    __slots__ = ("name", "depth", "is_captured")
+
+    def __init__(self, name: str, depth: int) -> None:
+        self.name = name
+        self.depth = depth
+        self.is_captured = False
+
+class FunctionState:
+    # One function being compiled, like clox's Compiler struct. Slot zero
+    # holds the closure being called, or 'this' in a method.
+    def __init__(self, enclosing: "FunctionState", function: Function, type: FunctionType) -> None:
+        self.enclosing = enclosing
+        self.function = function
+        self.type = type
+        self.locals = [Local("this" if type in (FunctionType.METHOD, FunctionType.INITIALIZER) else "", 0)]
+        self.upvalues: list[tuple[int, bool]] = []
+        self.scope_depth = 0
+        # Index of each number and string already in the constant pool.
+        self.constants: dict[tuple, int] = {}
+
+class CompileError(Exception):
+    def __init__(self, token: Token, message: str) -> None:
+        self.message = message
+        self.token = token
+
+    def report(self, where='') -> str:
+        if where == '':
+            if self.token.type == TokenType.EOF:
+                where = "at end"
+            else:
+                where = f"at '{self.token.lexeme}'"
+        return f"Compile error {where} [line {self.token.line}]: {self.message}\n"
+
+class Compiler(ExprVisitor, StmtVisitor):
+    # Compiles a resolved program into clox-style bytecode. Locals and
+    # upvalues are resolved here the way clox does it in a single pass.
+    # The resolver has already rejected misplaced 'this', 'super' and
+    # 'return', so those are not checked again.
+    def __init__(self) -> None:
+        self.errors: list[CompileError] = []
+        self.state: FunctionState = None
+        self.line = 1
+
+    def compile(self, statements: list[Stmt]) -> Function:
+        self.state = FunctionState(None, Function(), FunctionType.NONE)
+        for stmt in statements:
+            self.compile_stmt(stmt)
+        self.emit_return()
+        return self.state.function
+
+    def compile_stmt(self, stmt: Stmt) -> None:
+        # Like clox's panic mode: report, then carry on with the next
+        # statement so later errors are found too.
+        state, depth, count = self.state, self.state.scope_depth, len(self.state.locals)
+        try:
+            stmt.accept(self)
+        except CompileError:
+            self.state = state
+            state.scope_depth = depth
+            del state.locals[count:]
+
+    def compile_expr(self, expr: Expr) -> None:
+        expr.accept(self)
+
+    def error(self, token: Token, message: str) -> CompileError:
+        if token is None:
+            token = Token(TokenType.EOF, "", None, self.line)
+        error = CompileError(token, message)
+        self.errors.append(error)
+        return error
+
+    @property
+    def chunk(self) -> Chunk:
+        return self.state.function.chunk
+
+    def emit(self, *data: int) -> None:
+        for byte in data:
+            self.chunk.write(byte, self.line)
+
+    def emit_op(self, token: Token, op: OpCode, *operands: int) -> None:
+        # Records the token an instruction reports its runtime errors at.
+        self.line = token.line
+        self.chunk.tokens[len(self.chunk.code)] = token
+        self.emit(op, *operands)
+
+    def emit_return(self) -> None:
+        if self.state.type == FunctionType.INITIALIZER:
+            self.emit(OpCode.OP_GET_LOCAL, 0, OpCode.OP_RETURN)
+        else:
+            self.emit(OpCode.OP_NIL, OpCode.OP_RETURN)
+
+    def emit_invoke(self, op: OpCode, name: Token, paren: Token, count: int) -> None:
+        # Errors finding the method are reported at its name and errors
+        # calling it at the paren, which is kept against the operand.
+        self.emit_op(name, op, self.identifier_constant(name), count)
+        self.chunk.tokens[len(self.chunk.code) - 2] = paren
+
+    def emit_jump(self, op: OpCode) -> int:
+        self.emit(op, 0xff, 0xff)
+        return len(self.chunk.code) - 2
+
+    def patch_jump(self, offset: int, token: Token = None) -> None:
+        jump = len(self.chunk.code) - offset - 2
+        if jump > 0xffff:
+            raise self.error(token, "Too much code to jump over.")
+        self.chunk.code[offset] = (jump >> 8) & 0xff
+        self.chunk.code[offset + 1] = jump & 0xff
+
+    def emit_loop(self, loop_start: int, token: Token = None) -> None:
+        self.emit(OpCode.OP_LOOP)
+        offset = len(self.chunk.code) - loop_start + 2
+        if offset > 0xffff:
+            raise self.error(token, "Loop body too large.")
+        self.emit((offset >> 8) & 0xff, offset & 0xff)
+
+    def make_constant(self, value: Any, token: Token, limit: int = UINT8_COUNT) -> int:
+        # Numbers and strings, names included, get one constant per chunk.
+        # Only instructions with a long form can use indices past a byte.
+        key = (type(value), repr(value)) if type(value) in (float, str) else None
+        index = self.state.constants.get(key)
+        if index is None:
+            if len(self.chunk.constants) >= limit:
+                raise self.error(token, "Too many constants in one chunk.")
+            index = self.chunk.add_constant(value)
+            if key is not None:
+                self.state.constants[key] = index
+        elif index >= limit:
+            raise self.error(token, "Too many constants in one chunk.")
+        return index
+
+    def identifier_constant(self, name: Token, limit: int = UINT8_COUNT) -> int:
+        return self.make_constant(name.lexeme, name, limit)
+
+    def emit_constant_op(self, token: Token, op: OpCode, index: int) -> None:
+        if index < UINT8_COUNT:
+            self.emit_op(token, op, index)
+        else:
+            self.emit_op(token, LONG[op], index >> 16, (index >> 8) & 0xff, index & 0xff)
+
+    def begin_scope(self) -> None:
+        self.state.scope_depth += 1
+
+    def end_scope(self) -> None:
+        state = self.state
+        state.scope_depth -= 1
+        while state.locals and state.locals[-1].depth > state.scope_depth:
+            if state.locals[-1].is_captured:
+                self.emit(OpCode.OP_CLOSE_UPVALUE)
+            else:
+                self.emit(OpCode.OP_POP)
+            state.locals.pop()
+
+    def add_local(self, name: Token) -> None:
+        if len(self.state.locals) == UINT8_COUNT:
+            raise self.error(name, "Too many local variables in function.")
+        self.state.locals.append(Local(name.lexeme, self.state.scope_depth))
+
+    def resolve_local(self, state: FunctionState, name: Token) -> int:
+        for index in range(len(state.locals) - 1, -1, -1):
+            if state.locals[index].name == name.lexeme:
+                return index
+        return -1
+
+    def add_upvalue(self, state: FunctionState, index: int, is_local: bool, name: Token) -> int:
+        upvalue = (index, is_local)
+        if upvalue in state.upvalues:
+            return state.upvalues.index(upvalue)
+        if len(state.upvalues) == UINT8_COUNT:
+            raise self.error(name, "Too many closure variables in function.")
+        state.upvalues.append(upvalue)
+        state.function.upvalue_count = len(state.upvalues)
+        return len(state.upvalues) - 1
+
+    def resolve_upvalue(self, state: FunctionState, name: Token) -> int:
+        if state.enclosing is None:
+            return -1
+        local = self.resolve_local(state.enclosing, name)
+        if local != -1:
+            state.enclosing.locals[local].is_captured = True
+            return self.add_upvalue(state, local, True, name)
+        upvalue = self.resolve_upvalue(state.enclosing, name)
+        if upvalue != -1:
+            return self.add_upvalue(state, upvalue, False, name)
+        return -1
+
+    def named_variable(self, name: Token, can_assign: bool) -> None:
+        arg = self.resolve_local(self.state, name)
+        if arg != -1:
+            get_op, set_op = OpCode.OP_GET_LOCAL, OpCode.OP_SET_LOCAL
+        else:
+            arg = self.resolve_upvalue(self.state, name)
+            if arg != -1:
+                get_op, set_op = OpCode.OP_GET_UPVALUE, OpCode.OP_SET_UPVALUE
+            else:
+                arg = self.identifier_constant(name, UINT24_COUNT)
+                self.emit_constant_op(name, OpCode.OP_SET_GLOBAL if can_assign else OpCode.OP_GET_GLOBAL, arg)
+                return
+        self.emit_op(name, set_op if can_assign else get_op, arg)
+
+    def define_variable(self, name: Token) -> None:
+        if self.state.scope_depth > 0:
+            self.add_local(name)
+        else:
+            self.emit_constant_op(name, OpCode.OP_DEFINE_GLOBAL, self.identifier_constant(name, UINT24_COUNT))
+
+    def function(self, stmt: StmtFunction, type: FunctionType = FunctionType.FUNCTION) -> None:
+        self.state = FunctionState(self.state, Function(stmt.name.lexeme), type)
+        self.state.function.arity = len(stmt.parameters)
+        self.begin_scope()
+        for parameter in stmt.parameters:
+            self.add_local(parameter)
+        for statement in stmt.body:
+            self.compile_stmt(statement)
+        self.emit_return()
+        state, self.state = self.state, self.state.enclosing
+        self.emit_constant_op(stmt.name, OpCode.OP_CLOSURE, self.make_constant(state.function, stmt.name, UINT24_COUNT))
+        for index, is_local in state.upvalues:
+            self.emit(1 if is_local else 0, index)
+
+    def visit_block_stmt(self, stmt: StmtBlock) -> None:
+        self.begin_scope()
+        for statement in stmt.statements:
+            self.compile_stmt(statement)
+        self.end_scope()
+
+    def visit_class_stmt(self, stmt: StmtClass) -> None:
+        name = stmt.name
+        self.emit_constant_op(name, OpCode.OP_CLASS, self.identifier_constant(name, UINT24_COUNT))
+        self.define_variable(name)
+        if stmt.superclass is not None:
+            # Methods reach the superclass through a 'super' local that
+            # they capture like any other variable.
+            self.compile_expr(stmt.superclass)
+            self.begin_scope()
+            self.add_local(Token(TokenType.SUPER, "super", None, name.line))
+            self.named_variable(name, False)
+            self.emit_op(stmt.superclass.name, OpCode.OP_INHERIT)
+        self.named_variable(name, False)
+        for method in stmt.methods:
+            type = FunctionType.INITIALIZER if method.name.lexeme == "init" else FunctionType.METHOD
+            self.function(method, type)
+            self.emit_constant_op(method.name, OpCode.OP_METHOD, self.identifier_constant(method.name, UINT24_COUNT))
+        self.emit(OpCode.OP_POP)
+        if stmt.superclass is not None:
+            self.end_scope()
+
+    def visit_expression_stmt(self, stmt: StmtExpression) -> None:
+        self.compile_expr(stmt.expression)
+        self.emit(OpCode.OP_POP)
+
+    def visit_for_stmt(self, stmt: StmtFor) -> None:
+        self.begin_scope()
+        if stmt.initializer is not None:
+            self.compile_stmt(stmt.initializer)
+        loop_start = len(self.chunk.code)
+        self.compile_expr(stmt.condition)
+        exit_jump = self.emit_jump(OpCode.OP_JUMP_IF_FALSE)
+        self.emit(OpCode.OP_POP)
+        self.compile_stmt(stmt.body)
+        if stmt.increment is not None:
+            self.compile_expr(stmt.increment)
+            self.emit(OpCode.OP_POP)
+        self.emit_loop(loop_start)
+        self.patch_jump(exit_jump)
+        self.emit(OpCode.OP_POP)
+        self.end_scope()
+
+    def visit_function_stmt(self, stmt: StmtFunction) -> None:
+        # A local function is in scope in its own body, so it can recurse.
+        if self.state.scope_depth > 0:
+            self.add_local(stmt.name)
+            self.function(stmt)
+        else:
+            self.function(stmt)
+            self.define_variable(stmt.name)
+
+    def visit_if_stmt(self, stmt: StmtIf) -> None:
+        self.compile_expr(stmt.condition)
+        then_jump = self.emit_jump(OpCode.OP_JUMP_IF_FALSE)
+        self.emit(OpCode.OP_POP)
+        self.compile_stmt(stmt.then_branch)
+        else_jump = self.emit_jump(OpCode.OP_JUMP)
+        self.patch_jump(then_jump)
+        self.emit(OpCode.OP_POP)
+        if stmt.else_branch is not None:
+            self.compile_stmt(stmt.else_branch)
+        self.patch_jump(else_jump)
+
+    def visit_print_stmt(self, stmt: StmtPrint) -> None:
+        self.compile_expr(stmt.expression)
+        self.emit(OpCode.OP_PRINT)
+
+    def visit_return_stmt(self, stmt: StmtReturn) -> None:
+        self.line = stmt.keyword.line
+        if stmt.value is None:
+            self.emit_return()
+        else:
+            self.compile_expr(stmt.value)
+            self.emit(OpCode.OP_RETURN)
+
+    def visit_var_stmt(self, stmt: StmtVar) -> None:
+        self.line = stmt.name.line
+        if stmt.initializer is None:
+            self.emit(OpCode.OP_NIL)
+        else:
+            self.compile_expr(stmt.initializer)
+        self.define_variable(stmt.name)
+
+    def visit_while_stmt(self, stmt: StmtWhile) -> None:
+        loop_start = len(self.chunk.code)
+        self.compile_expr(stmt.condition)
+        exit_jump = self.emit_jump(OpCode.OP_JUMP_IF_FALSE)
+        self.emit(OpCode.OP_POP)
+        self.compile_stmt(stmt.body)
+        self.emit_loop(loop_start)
+        self.patch_jump(exit_jump)
+        self.emit(OpCode.OP_POP)
+
+    def visit_assign_expr(self, expr: ExprAssign) -> None:
+        self.compile_expr(expr.value)
+        self.named_variable(expr.name, True)
+
+    def visit_binary_expr(self, expr: ExprBinary) -> None:
+        self.compile_expr(expr.left)
+        self.compile_expr(expr.right)
+        token = expr.operator
+        match token.type:
+            case TokenType.BANG_EQUAL:
+                self.emit_op(token, OpCode.OP_EQUAL)
+                self.emit(OpCode.OP_NOT)
+            case TokenType.EQUAL_EQUAL:
+                self.emit_op(token, OpCode.OP_EQUAL)
+            case TokenType.GREATER:
+                self.emit_op(token, OpCode.OP_GREATER)
+            case TokenType.GREATER_EQUAL:
+                self.emit_op(token, OpCode.OP_LESS)
+                self.emit(OpCode.OP_NOT)
+            case TokenType.LESS:
+                self.emit_op(token, OpCode.OP_LESS)
+            case TokenType.LESS_EQUAL:
+                self.emit_op(token, OpCode.OP_GREATER)
+                self.emit(OpCode.OP_NOT)
+            case TokenType.PLUS:
+                self.emit_op(token, OpCode.OP_ADD)
+            case TokenType.MINUS:
+                self.emit_op(token, OpCode.OP_SUBSTRACT)
+            case TokenType.STAR:
+                self.emit_op(token, OpCode.OP_MULTIPLY)
+            case TokenType.SLASH:
+                self.emit_op(token, OpCode.OP_DIVIDE)
+
+    def visit_call_expr(self, expr: ExprCall) -> None:
+        # Invocations have no long form; a method whose name needs one is
+        # looked up and then called like any other value.
+        callee = expr.callee
+        if type(callee) is ExprGet and self.identifier_constant(callee.name, UINT24_COUNT) < UINT8_COUNT:
+            self.compile_expr(callee.object)
+            for argument in expr.arguments:
+                self.compile_expr(argument)
+            self.emit_invoke(OpCode.OP_INVOKE, callee.name, expr.paren, len(expr.arguments))
+            return
+        if type(callee) is ExprSuper and self.identifier_constant(callee.method, UINT24_COUNT) < UINT8_COUNT:
+            self.named_variable(Token(TokenType.THIS, "this", None, callee.keyword.line), False)
+            for argument in expr.arguments:
+                self.compile_expr(argument)
+            self.named_variable(callee.keyword, False)
+            self.emit_invoke(OpCode.OP_SUPER_INVOKE, callee.method, expr.paren, len(expr.arguments))
+            return
+        self.compile_expr(expr.callee)
+        for argument in expr.arguments:
+            self.compile_expr(argument)
+        self.emit_op(expr.paren, OpCode.OP_CALL, len(expr.arguments))
+
+    def visit_get_expr(self, expr: ExprGet) -> None:
+        self.compile_expr(expr.object)
+        self.emit_constant_op(expr.name, OpCode.OP_GET_PROPERTY, self.identifier_constant(expr.name, UINT24_COUNT))
+
+    def visit_grouping_expr(self, expr: ExprGrouping) -> None:
+        self.compile_expr(expr.expression)
+
+    def visit_literal_expr(self, expr: ExprLiteral) -> None:
+        if expr.value is None:
+            self.emit(OpCode.OP_NIL)
+        elif expr.value is True:
+            self.emit(OpCode.OP_TRUE)
+        elif expr.value is False:
+            self.emit(OpCode.OP_FALSE)
+        else:
+            token = Token(TokenType.NUMBER, str(expr.value), expr.value, self.line)
+            self.emit_constant_op(token, OpCode.OP_CONSTANT, self.make_constant(expr.value, token, UINT24_COUNT))
+
+    def visit_logical_expr(self, expr: ExprLogical) -> None:
+        self.compile_expr(expr.left)
+        if expr.operator.type == TokenType.AND:
+            end_jump = self.emit_jump(OpCode.OP_JUMP_IF_FALSE)
+        else:
+            else_jump = self.emit_jump(OpCode.OP_JUMP_IF_FALSE)
+            end_jump = self.emit_jump(OpCode.OP_JUMP)
+            self.patch_jump(else_jump)
+        self.emit(OpCode.OP_POP)
+        self.compile_expr(expr.right)
+        self.patch_jump(end_jump)
+
+    def visit_set_expr(self, expr: ExprSet) -> None:
+        self.compile_expr(expr.object)
+        self.compile_expr(expr.value)
+        self.emit_constant_op(expr.name, OpCode.OP_SET_PROPERTY, self.identifier_constant(expr.name, UINT24_COUNT))
+
+    def visit_super_expr(self, expr: ExprSuper) -> None:
+        self.named_variable(Token(TokenType.THIS, "this", None, expr.keyword.line), False)
+        self.named_variable(expr.keyword, False)
+        self.emit_constant_op(expr.method, OpCode.OP_GET_SUPER, self.identifier_constant(expr.method, UINT24_COUNT))
+
+    def visit_this_expr(self, expr: ExprThis) -> None:
+        self.named_variable(expr.keyword, False)
+
+    def visit_unary_expr(self, expr: ExprUnary) -> None:
+        self.compile_expr(expr.right)
+        if expr.operator.type == TokenType.MINUS:
+            self.emit_op(expr.operator, OpCode.OP_NEGATE)
+        else:
+            self.emit(OpCode.OP_NOT)
+
+    def visit_variable_expr(self, expr: ExprVariable) -> None:
+        self.named_variable(expr.name, False)
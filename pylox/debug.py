@@ -0,0 +1,91 @@
+from typing import Any
+from chunk import Chunk, Function, OpCode
+
+# Prints chunks in the same format as clox/debug.c.
+
+def format_value(value: Any) -> str:
+    if value is None: return "nil"
+    if isinstance(value, bool): return "true" if value else "false"
+    if isinstance(value, float): return "%g" % value
+    return str(value)
+
+def disassemble_chunk(chunk: Chunk, name: str) -> None:
+    print(f"== {name} ==")
+    offset = 0
+    while offset < len(chunk.code):
+        offset = disassemble_instruction(chunk, offset)
+
+def constant_instruction(name: str, chunk: Chunk, offset: int) -> int:
+    constant = chunk.code[offset + 1]
+    print(f"{name:<16} {constant:4d} '{format_value(chunk.constants[constant])}'")
+    return offset + 2
+
+def constant_long_instruction(name: str, chunk: Chunk, offset: int) -> int:
+    constant = chunk.code[offset + 1] << 16 | chunk.code[offset + 2] << 8 | chunk.code[offset + 3]
+    print(f"{name:<16} {constant:4d} '{format_value(chunk.constants[constant])}'")
+    return offset + 4
+
+def invoke_instruction(name: str, chunk: Chunk, offset: int) -> int:
+    constant, count = chunk.code[offset + 1], chunk.code[offset + 2]
+    print(f"{name:<16} ({count} args) {constant:4d} '{format_value(chunk.constants[constant])}'")
+    return offset + 3
+
+def simple_instruction(name: str, offset: int) -> int:
+    print(name)
+    return offset + 1
+
+def byte_instruction(name: str, chunk: Chunk, offset: int) -> int:
+    print(f"{name:<16} {chunk.code[offset + 1]:4d}")
+    return offset + 2
+
+def jump_instruction(name: str, sign: int, chunk: Chunk, offset: int) -> int:
+    jump = chunk.code[offset + 1] << 8 | chunk.code[offset + 2]
+    print(f"{name:<16} {offset:4d} -> {offset + 3 + sign * jump}")
+    return offset + 3
+
+def closure_instruction(name: str, chunk: Chunk, offset: int) -> int:
+    if name == "OP_CLOSURE":
+        constant = chunk.code[offset + 1]
+        offset += 2
+    else:
+        constant = chunk.code[offset + 1] << 16 | chunk.code[offset + 2] << 8 | chunk.code[offset + 3]
+        offset += 4
+    function: Function = chunk.constants[constant]
+    print(f"{name:<16} {constant:4d} {format_value(function)}")
+    for _ in range(function.upvalue_count):
+        is_local, index = chunk.code[offset], chunk.code[offset + 1]
+        print(f"{offset:04d}      |                     {'local' if is_local else 'upvalue'} {index}")
+        offset += 2
+    return offset
+
+CONSTANT = (OpCode.OP_CONSTANT, OpCode.OP_GET_GLOBAL, OpCode.OP_DEFINE_GLOBAL, OpCode.OP_SET_GLOBAL,
+            OpCode.OP_GET_PROPERTY, OpCode.OP_SET_PROPERTY, OpCode.OP_GET_SUPER, OpCode.OP_CLASS, OpCode.OP_METHOD)
+CONSTANT_LONG = (OpCode.OP_CONSTANT_LONG, OpCode.OP_GET_GLOBAL_LONG, OpCode.OP_DEFINE_GLOBAL_LONG,
+                 OpCode.OP_SET_GLOBAL_LONG, OpCode.OP_GET_PROPERTY_LONG, OpCode.OP_SET_PROPERTY_LONG,
+                 OpCode.OP_GET_SUPER_LONG, OpCode.OP_CLASS_LONG, OpCode.OP_METHOD_LONG)
+BYTE = (OpCode.OP_GET_LOCAL, OpCode.OP_SET_LOCAL, OpCode.OP_GET_UPVALUE, OpCode.OP_SET_UPVALUE, OpCode.OP_CALL)
+JUMP = {OpCode.OP_JUMP: 1, OpCode.OP_JUMP_IF_FALSE: 1, OpCode.OP_LOOP: -1}
+
+def disassemble_instruction(chunk: Chunk, offset: int) -> int:
+    if offset > 0 and chunk.lines[offset] == chunk.lines[offset - 1]:
+        print(f"{offset:04d}    | ", end="")
+    else:
+        print(f"{offset:04d} {chunk.lines[offset]:4d} ", end="")
+    instruction = chunk.code[offset]
+    if instruction not in OpCode._value2member_map_:
+        print(f"Unknown opcode {instruction}")
+        return offset + 1
+    op = OpCode(instruction)
+    if op in CONSTANT:
+        return constant_instruction(op.name, chunk, offset)
+    if op in CONSTANT_LONG:
+        return constant_long_instruction(op.name, chunk, offset)
+    if op in BYTE:
+        return byte_instruction(op.name, chunk, offset)
+    if op in JUMP:
+        return jump_instruction(op.name, JUMP[op], chunk, offset)
+    if op == OpCode.OP_INVOKE or op == OpCode.OP_SUPER_INVOKE:
+        return invoke_instruction(op.name, chunk, offset)
+    if op == OpCode.OP_CLOSURE or op == OpCode.OP_CLOSURE_LONG:
+        return closure_instruction(op.name, chunk, offset)
+    return simple_instruction(op.name, offset)
@@ -14,38 +14,67 @@ class RuntimeException(Exception):
                 where = f"at '{self.token.lexeme}'"
         return f"Runtime error {where} [line {self.token.line}]: {self.message}\n"
 
+# Marks a global slot that the resolver has handed out but that no
+# declaration has filled yet.
+UNDEFINED = object()
+
 class Environment:
-    def __init__(self, enclosing: "Environment" = None):
-        self.values = {}
+    __slots__ = ("values", "enclosing")
+
+    def __init__(self, enclosing: "Environment" = None, size: int = 0):
+        # Every local the resolver can see is given a slot, so local scopes
+        # only need a list.
+        self.values = [None] * size
         self.enclosing = enclosing
 
+    def ancestor(self, distance: int) -> 'Environment':
+        environment = self
+        for i in range(distance):
+            environment = environment.enclosing
+        return environment
+
+    def get_at(self, distance: int, slot: int) -> Any:
+        return self.ancestor(distance).values[slot]
+    
+    def assign_at(self, distance: int, slot: int, value: Any) -> None:
+        self.ancestor(distance).values[slot] = value
+
+class GlobalEnvironment(Environment):
+    # Globals are late-bound, so a slot may be read before its declaration
+    # runs. Those reads, and nodes that were never resolved, go by name.
+    __slots__ = ("names",)
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.names: dict[str, int] = {}
+
+    def slot(self, name: str) -> int:
+        if name not in self.names:
+            self.names[name] = len(self.values)
+            self.values.append(UNDEFINED)
+        return self.names[name]
+
     def get(self, name: Token) -> Any:
-        if name.lexeme in self.values:
-            return self.values[name.lexeme]
-        if self.enclosing is not None:
-            return self.enclosing.get(name)
+        slot = self.names.get(name.lexeme)
+        if slot is not None and self.values[slot] is not UNDEFINED:
+            return self.values[slot]
         raise RuntimeException(name, f"Undefined variable '{name.lexeme}'.")
     
     def assign(self, name: Token, value: Any) -> None:
-        if name.lexeme in self.values:
-            self.values[name.lexeme] = value
-            return 
-        if self.enclosing is not None:
-            self.enclosing.assign(name, value)
+        slot = self.names.get(name.lexeme)
+        if slot is not None and self.values[slot] is not UNDEFINED:
+            self.values[slot] = value
             return 
         raise RuntimeException(name, f"Undefined variable '{name.lexeme}'.")
 
     def define(self, name: str, value: Any) -> None:
-        self.values[name] = value
-
-    def ancestor(self, distance: int) -> 'Environment':
-        environment = self
-        for i in range(distance):
-            environment = environment.enclosing
-        return environment
+        self.values[self.slot(name)] = value
 
-    def get_at(self, distance: int, name: str) -> Any:
-        return self.ancestor(distance).values[name]
-    
-    def assign_at(self, distance: int, name: Token, value: Any) -> None:
-        self.ancestor(distance).values[name.lexeme] = value
\ No newline at end of file
+    def adopt(self, names: dict[str, int]) -> None:
+        # Takes over the slot numbering a program was resolved against,
+        # keeping whatever is already defined.
+        defined = {name: self.values[slot] for name, slot in self.names.items()}
+        self.names = dict(names)
+        self.values = [UNDEFINED] * len(self.names)
+        for name, value in defined.items():
+            self.values[self.slot(name)] = value
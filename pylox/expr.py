@@ -16,27 +16,41 @@ class ExprVisitor(Protocol):
     def visit_variable_expr(self, expr: "ExprVariable") -> Any: ...
 
 class Expr:
+    __slots__ = ()
+
     def accept(self, visitor: ExprVisitor) -> Any:
         raise NotImplementedError("Method accept() must be realized")
 
 class ExprAssign(Expr):
+    __slots__ = ("name", "value", "depth", "slot")
+    __match_args__ = ("name", "value")
+
     def __init__(self, name: Token, value: Expr) -> None:
         self.name = name
         self.value = value
+        self.depth: int = None
+        self.slot: int = None
 
     def accept(self, visitor: ExprVisitor) -> Any:
         return visitor.visit_assign_expr(self)
 
 class ExprBinary(Expr):
+    __slots__ = ("left", "operator", "right", "handler")
+    __match_args__ = ("left", "operator", "right")
+
     def __init__(self, left: Expr, operator: Token, right: Expr) -> None:
         self.left = left
         self.operator = operator
         self.right = right
+        self.handler: Any = None
 
     def accept(self, visitor: ExprVisitor) -> Any:
         return visitor.visit_binary_expr(self)
 
 class ExprCall(Expr):
+    __slots__ = ("callee", "paren", "arguments")
+    __match_args__ = ("callee", "paren", "arguments")
+
     def __init__(self, callee: Expr, paren: Token, arguments: list[Expr]) -> None:
         self.callee = callee
         self.paren = paren
@@ -46,14 +60,21 @@ class ExprCall(Expr):
         return visitor.visit_call_expr(self)
 
 class ExprGet(Expr):
+    __slots__ = ("object", "name", "cache")
+    __match_args__ = ("object", "name")
+
     def __init__(self, object: Expr, name: Token) -> None:
         self.object = object
         self.name = name
+        self.cache: Any = None
 
     def accept(self, visitor: ExprVisitor) -> Any:
         return visitor.visit_get_expr(self)
 
 class ExprGrouping(Expr):
+    __slots__ = ("expression",)
+    __match_args__ = ("expression",)
+
     def __init__(self, expression: Expr) -> None:
         self.expression = expression
 
@@ -61,6 +82,9 @@ class ExprGrouping(Expr):
         return visitor.visit_grouping_expr(self)
 
 class ExprLiteral(Expr):
+    __slots__ = ("value",)
+    __match_args__ = ("value",)
+
     def __init__(self, value: Any) -> None:
         self.value = value
 
@@ -68,6 +92,9 @@ class ExprLiteral(Expr):
         return visitor.visit_literal_expr(self)
 
 class ExprLogical(Expr):
+    __slots__ = ("left", "operator", "right")
+    __match_args__ = ("left", "operator", "right")
+
     def __init__(self, left: Expr, operator: Token, right: Expr) -> None:
         self.left = left
         self.operator = operator
@@ -77,6 +104,9 @@ class ExprLogical(Expr):
         return visitor.visit_logical_expr(self)
 
 class ExprSet(Expr):
+    __slots__ = ("object", "name", "value")
+    __match_args__ = ("object", "name", "value")
+
     def __init__(self, object: Expr, name: Token, value: Expr) -> None:
         self.object = object
         self.name = name
@@ -86,31 +116,50 @@ class ExprSet(Expr):
         return visitor.visit_set_expr(self)
 
 class ExprSuper(Expr):
+    __slots__ = ("keyword", "method", "depth", "slot")
+    __match_args__ = ("keyword", "method")
+
     def __init__(self, keyword: Token, method: Token) -> None:
         self.keyword = keyword
         self.method = method
+        self.depth: int = None
+        self.slot: int = None
 
     def accept(self, visitor: ExprVisitor) -> Any:
         return visitor.visit_super_expr(self)
 
 class ExprThis(Expr):
+    __slots__ = ("keyword", "depth", "slot")
+    __match_args__ = ("keyword",)
+
     def __init__(self, keyword: Token) -> None:
         self.keyword = keyword
+        self.depth: int = None
+        self.slot: int = None
 
     def accept(self, visitor: ExprVisitor) -> Any:
         return visitor.visit_this_expr(self)
 
 class ExprUnary(Expr):
+    __slots__ = ("operator", "right", "handler")
+    __match_args__ = ("operator", "right")
+
     def __init__(self, operator: Token, right: Expr) -> None:
         self.operator = operator
         self.right = right
+        self.handler: Any = None
 
     def accept(self, visitor: ExprVisitor) -> Any:
         return visitor.visit_unary_expr(self)
 
 class ExprVariable(Expr):
+    __slots__ = ("name", "depth", "slot")
+    __match_args__ = ("name",)
+
     def __init__(self, name: Token) -> None:
         self.name = name
+        self.depth: int = None
+        self.slot: int = None
 
     def accept(self, visitor: ExprVisitor) -> Any:
         return visitor.visit_variable_expr(self)
@@ -0,0 +1,275 @@
+from bisect import bisect_left, bisect_right
+from scanner import Scanner, ScanError
+from parser import Parser
+from resolver import Resolver
+from tokentype import Token, TokenType
+from stmt import Stmt
+from environment import GlobalEnvironment
+
+class Resolution(dict):
+    # Stands in for the interpreter while resolving a single top-level
+    # statement, so its locals can be dropped again when it is replaced.
+    def __init__(self, globals: GlobalEnvironment) -> None:
+        super().__init__()
+        self.globals = globals
+
+    def resolve(self, expr, depth: int, slot: int) -> None:
+        self[expr] = (depth, slot)
+
+    def global_slot(self, name: str) -> int:
+        return self.globals.slot(name)
+
+class Segment:
+    # The tokens of one top-level statement. Their offsets and lines are kept
+    # relative to the segment, so an edit before it moves the statement by
+    # updating the segment alone and never rewrites its tokens.
+    __slots__ = ("statement", "first", "start", "line", "starts", "ends", "resolution", "errors")
+
+    def __init__(self, statement: Stmt, first: int, start: int, line: int) -> None:
+        self.statement = statement
+        self.first = first
+        self.start = start
+        self.line = line
+        self.starts: list[int] = []
+        self.ends: list[int] = []
+        self.resolution: Resolution = None
+        self.errors: list = []
+
+    def end(self) -> int:
+        return self.first + len(self.starts)
+
+class SegmentToken(Token):
+    # A token whose line is an offset from its segment's, or the line itself
+    # while it belongs to none.
+    __slots__ = ("segment", "offset")
+
+    def __init__(self, typ: TokenType, lexeme: str, literal, line: int) -> None:
+        self.type = typ
+        self.lexeme = lexeme
+        self.literal = literal
+        self.segment: Segment = None
+        self.offset = line
+
+    @property
+    def line(self) -> int:
+        segment = self.segment
+        return self.offset if segment is None else segment.line + self.offset
+
+def segment_start(segment: Segment) -> int:
+    return segment.start
+
+def segment_first(segment: Segment) -> int:
+    return segment.first
+
+class IncrementalFrontEnd:
+    def __init__(self, source: str = "") -> None:
+        self.source = ""
+        self.tokens: list[SegmentToken] = []
+        self.segments: list[Segment] = []
+        self.statements: list[Stmt] = []
+        self.locals = {}
+        # Global slots handed out so far; an interpreter running these
+        # statements adopts the same numbering.
+        self.globals = GlobalEnvironment()
+        self.errors = []
+        self.failing: set[Segment] = set()
+        self.valid = False
+        self.relexed = 0
+        self.reparsed = 0
+        self.update(source)
+
+    def update(self, source: str) -> list:
+        # Without the edit's offsets the two sources have to be compared to
+        # find them; callers that know where the edit is should use edit().
+        if not self.valid:
+            return self.rebuild(source)
+        old = self.source
+        start = common_prefix(old, source)
+        suffix = common_suffix(old[start:], source[start:])
+        return self.apply(source, start, len(old) - suffix, len(source) - suffix - start)
+
+    def edit(self, start: int, end: int, text: str) -> list:
+        source = self.source[:start] + text + self.source[end:]
+        if not self.valid:
+            return self.rebuild(source)
+        return self.apply(source, start, end, len(text))
+
+    def rebuild(self, source: str) -> list:
+        self.source = ""
+        self.tokens, self.segments, self.statements = [], [], []
+        self.locals = {}
+        self.failing = set()
+        self.valid = True
+        return self.apply(source, 0, 0, len(source))
+
+    def token_from(self, offset: int) -> int:
+        # The index of the first token ending at or after offset.
+        segments = self.segments
+        index = bisect_left(segments, offset, key=segment_start) - 1
+        if index < 0:
+            return 0
+        segment = segments[index]
+        return segment.first + bisect_left(segment.ends, offset - segment.start)
+
+    def token_starting(self, offset: int) -> int:
+        # The index of the token starting exactly at offset, if there is one.
+        if offset == len(self.source):
+            return len(self.tokens) - 1
+        segments = self.segments
+        index = bisect_right(segments, offset, key=segment_start) - 1
+        if index < 0:
+            return None
+        segment = segments[index]
+        relative = offset - segment.start
+        position = bisect_left(segment.starts, relative)
+        if position < len(segment.starts) and segment.starts[position] == relative:
+            return segment.first + position
+        return None
+
+    def token_end(self, index: int) -> int:
+        if index == len(self.tokens) - 1:
+            return len(self.source)
+        segment = self.tokens[index].segment
+        return segment.start + segment.ends[index - segment.first]
+
+    def apply(self, source: str, start: int, end: int, length: int) -> list:
+        old = self.source
+        delta = length - (end - start)
+        line_delta = source.count('\n', start, start + length) - old.count('\n', start, end)
+
+        # Re-lex from the end of the last token that cannot see the edit.
+        # Lexing a token looks at most two characters past its end.
+        first = self.token_from(start - 2)
+        pos = self.token_end(first - 1) if first > 0 else 0
+        line = self.tokens[first - 1].line if first > 0 else 1
+        scanner = Scanner(source, fast=True)
+        tokens, starts, ends = [], [], []
+        resume = len(self.tokens)
+        try:
+            for typ, token_start, token_end, token_line in scanner.fast_spans(pos, line):
+                if token_start >= start + length and self.tokens:
+                    old_index = self.token_starting(token_start - delta)
+                    if old_index is not None:
+                        resume = old_index
+                        break
+                token = scanner.span_token(typ, token_start, token_end, token_line)
+                tokens.append(SegmentToken(token.type, token.lexeme, token.literal, token_line))
+                starts.append(token_start)
+                ends.append(token_end)
+        except ScanError:
+            return self.fail(source, scanner.errors)
+        self.relexed = len(tokens)
+
+        # Statements whose tokens (and one token of lookahead) lie before the
+        # re-lexed range, or entirely after it, are reused as they are.
+        segments = self.segments
+        shift = len(tokens) - (resume - first)
+        head = bisect_left(segments, first, key=Segment.end)
+        reuse = bisect_left(segments, resume, key=segment_first)
+        current = segments[head].first if head < len(segments) else (segments[-1].end() if segments else 0)
+        # The rest of a statement the edit lands in is detached at its new
+        # position, and the statements after it move now, so the reparse
+        # reports errors at the lines the tokens end up on.
+        tail = segments[reuse].first if reuse < len(segments) else len(self.tokens) - 1
+        for index in range(resume, tail):
+            token = self.tokens[index]
+            segment = token.segment
+            offset = index - segment.first
+            starts.append(segment.start + segment.starts[offset] + delta)
+            ends.append(segment.start + segment.ends[offset] + delta)
+            token.offset = token.line + line_delta
+            token.segment = None
+            tokens.append(token)
+        resume = max(resume, tail)
+        if shift or delta or line_delta:
+            for index in range(reuse, len(segments)):
+                segment = segments[index]
+                segment.first += shift
+                segment.start += delta
+                segment.line += line_delta
+        if resume < len(self.tokens) and line_delta:
+            self.tokens[-1].offset += line_delta
+        self.tokens[first:resume] = tokens
+
+        parser = Parser(self.tokens, pratt=True)
+        parser.current = current
+        parsed = []
+        while True:
+            while reuse < len(segments) and segments[reuse].first < parser.current:
+                reuse += 1
+            if parser.is_at_end() or (reuse < len(segments) and segments[reuse].first == parser.current):
+                break
+            statement_start = parser.current
+            parsed.append((parser.declaration(), statement_start, parser.current))
+        if parser.errors:
+            return self.fail(source, parser.errors)
+        self.reparsed = len(parsed)
+
+        # Work out where each token of the new statements now is before any
+        # of them moves to its new segment.
+        def position(index: int) -> tuple[int, int, int]:
+            if index < first:
+                segment = self.tokens[index].segment
+                offset = index - segment.first
+                return segment.start + segment.starts[offset], segment.start + segment.ends[offset], self.tokens[index].line
+            if index < first + len(tokens):
+                return starts[index - first], ends[index - first], self.tokens[index].line
+            segment = self.tokens[index].segment
+            offset = index - segment.first
+            return segment.start + segment.starts[offset], segment.start + segment.ends[offset], self.tokens[index].line
+
+        new_segments = []
+        for statement, statement_start, statement_end in parsed:
+            positions = [position(index) for index in range(statement_start, statement_end)]
+            segment = Segment(statement, statement_start, positions[0][0], positions[0][2])
+            new_segments.append((segment, positions))
+        for segment, positions in new_segments:
+            segment.starts = [token_start - segment.start for token_start, _, _ in positions]
+            segment.ends = [token_end - segment.start for _, token_end, _ in positions]
+            for token, (_, _, token_line) in zip(self.tokens[segment.first:segment.end()], positions):
+                token.segment = segment
+                token.offset = token_line - segment.line
+
+        for segment in segments[head:reuse]:
+            for expr in segment.resolution:
+                del self.locals[expr]
+            self.failing.discard(segment)
+        for segment, _ in new_segments:
+            segment.resolution = Resolution(self.globals)
+            segment.errors = Resolver(segment.resolution).resolve_list([segment.statement])
+            self.locals.update(segment.resolution)
+            if segment.errors:
+                self.failing.add(segment)
+
+        segments[head:reuse] = [segment for segment, _ in new_segments]
+        self.statements[head:reuse] = [segment.statement for segment, _ in new_segments]
+        self.source = source
+        self.errors = [error for segment in sorted(self.failing, key=segment_first) for error in segment.errors]
+        return self.errors
+
+    def fail(self, source: str, errors: list) -> list:
+        # Broken sources are not cached; the next update starts from scratch.
+        self.source = source
+        self.valid = False
+        self.errors = errors
+        return errors
+
+def common_prefix(a: str, b: str) -> int:
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[low:middle] == b[low:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+def common_suffix(a: str, b: str) -> int:
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[len(a) - middle:len(a) - low] == b[len(b) - middle:len(b) - low]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
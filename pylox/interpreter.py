@@ -2,15 +2,28 @@ from expr import *
 from stmt import *
 from typing import Any
 from tokentype import *
-from environment import Environment, RuntimeException
+from environment import Environment, GlobalEnvironment, RuntimeException, UNDEFINED
 from lox_callable import *
+from operators import BINARY, UNARY
+
+def stringify(value: Any) -> str:
+    if value is None: return "nil"
+    if isinstance(value, bool): return "true" if value else "false"
+    if isinstance(value, float):
+        text = str(value)
+        if text.endswith(".0"):
+            text = text[:-2]
+        return text
+    return str(value)
 
 class Interpreter(ExprVisitor, StmtVisitor):
     def __init__(self) -> None:
         self.errors: list = []
-        self.globals = Environment()
+        self.globals = GlobalEnvironment()
         self.environment = self.globals
         self.locals = {}
+        self.return_value = None
+        self.tail_call = None
         self.globals.define("clock", Clock())
 
 
@@ -19,59 +32,43 @@ class Interpreter(ExprVisitor, StmtVisitor):
             for stmt in stmts:
                 self.execute(stmt)
             return None, self.errors
-        except RuntimeException:
-            return None, self.errors
+        except RuntimeException as error:
+            return None, self.report(error)
         
     def stringify(self, value: Any) -> str:
-        if value is None: return "nil"
-        if isinstance(value, float):
-            text = str(value)
-            if text.endswith(".0"):
-                text = text[:-2]
-            return text
-        return str(value)
+        return stringify(value)
 
-    def visit_binary_expr(self, expr: ExprBinary) -> Any:
-        left = self.evaluate(expr.left)
-        right = self.evaluate(expr.right)
-        match expr.operator.type:
-            case TokenType.GREATER:
-                self.check_number_operands(expr.operator, left, right)
-                return float(left) > float(right)
-            case TokenType.GREATER_EQUAL:
-                self.check_number_operands(expr.operator, left, right)
-                return float(left) >= float(right)
-            case TokenType.LESS:
-                self.check_number_operands(expr.operator, left, right)
-                return float(left) < float(right)
-            case TokenType.LESS_EQUAL:
-                self.check_number_operands(expr.operator, left, right)
-                return float(left) <= float(right)
-            case TokenType.MINUS:
-                self.check_number_operands(expr.operator, left, right)
-                return float(left) - float(right)
-            case TokenType.PLUS:
-                if isinstance(left, float) and isinstance(right, float):
-                    return float(left) + float(right)
-                if isinstance(left, str) and isinstance(right, str):
-                    return str(left) + str(right)
-                raise self.error(expr.operator, "Operand must be two numbers or two strings.")
-    
-            case TokenType.SLASH:
-                self.check_number_operands(expr.operator, left, right)
-                return float(left) / float(right)
-            case TokenType.STAR:
-                self.check_number_operands(expr.operator, left, right)
-                return float(left) * float(right)
-            case TokenType.BANG_EQUAL:
-                return not self.is_equal(left, right)
-            case TokenType.EQUAL_EQUAL:
-                return self.is_equal(left, right)
+    def compile(self, stmts: list[Stmt]) -> list:
+        # Engines that translate the resolved program before running it do
+        # that here, so their errors are reported with the front end's.
+        return []
 
-        return None
+    def report(self, error: RuntimeException) -> list:
+        # Operator handlers and environments raise without going through
+        # error(), so they are recorded here.
+        if error not in self.errors:
+            self.errors.append(error)
+        return self.errors
+
+    def visit_binary_expr(self, expr: ExprBinary) -> Any:
+        handler = expr.handler or BINARY[expr.operator.type]
+        return handler(expr.operator, self.evaluate(expr.left), self.evaluate(expr.right))
     
     def visit_call_expr(self, expr: ExprCall) -> Any:
-        callee = self.evaluate(expr.callee)
+        callee_expr = expr.callee
+        if type(callee_expr) is ExprGet:
+            # obj.method(...) calls the method with obj as 'this' directly,
+            # without building a bound method first.
+            obj = self.evaluate(callee_expr.object)
+            method = self.find_method(obj, callee_expr)
+            if method is not None:
+                return self.invoke(expr, method, obj)
+            callee = self.get_property(obj, callee_expr)
+        elif type(callee_expr) is ExprSuper:
+            method = self.super_method(callee_expr)
+            return self.invoke(expr, method, self.environment.get_at(callee_expr.depth - 1, 0))
+        else:
+            callee = self.evaluate(callee_expr)
         arguments = []
         for argument in expr.arguments:
             arguments.append(self.evaluate(argument))
@@ -81,12 +78,38 @@ class Interpreter(ExprVisitor, StmtVisitor):
         if len(arguments) != function.arity():
             raise self.error(expr.paren, f"Expected {function.arity()} arguments but got {len(arguments)}.")
         return function.call(self, arguments)
+
+    def invoke(self, expr: ExprCall, method: LoxFunction, obj: "LoxInstance") -> Any:
+        arguments = [self.evaluate(argument) for argument in expr.arguments]
+        if len(arguments) != method.arity():
+            raise self.error(expr.paren, f"Expected {method.arity()} arguments but got {len(arguments)}.")
+        return method.invoke(self, obj, arguments)
     
     def visit_get_expr(self, expr: ExprGet) -> Any:
-        obj = self.evaluate(expr.object)
-        if isinstance(obj, LoxInstance):
-            return obj.get(expr.name)
-        raise self.error(expr.name, "Only instances have properties.")
+        return self.get_property(self.evaluate(expr.object), expr)
+
+    def find_method(self, obj: Any, expr: ExprGet) -> LoxFunction:
+        # The method a property access finds, or None if it is a field or
+        # anything other than a method of an instance.
+        if not isinstance(obj, LoxInstance) or expr.name.lexeme in obj.shape:
+            return None
+        cache = expr.cache
+        if cache is None:
+            cache = expr.cache = InlineCache()
+        klass = obj.klass
+        return cache.method if klass is cache.klass else cache.lookup(klass, expr.name.lexeme)
+
+    def get_property(self, obj: Any, expr: ExprGet) -> Any:
+        if not isinstance(obj, LoxInstance):
+            raise self.error(expr.name, "Only instances have properties.")
+        name = expr.name.lexeme
+        index = obj.shape.get(name)
+        if index is not None:
+            return obj.values[index]
+        method = self.find_method(obj, expr)
+        if method is None:
+            raise self.error(expr.name, f"Undefined property '{name}'.")
+        return method.bind(obj)
 
     def visit_grouping_expr(self, expr: ExprGrouping) -> Any:
         return self.evaluate(expr.expression)
@@ -107,53 +130,40 @@ class Interpreter(ExprVisitor, StmtVisitor):
         if not isinstance(obj, LoxInstance):
             raise self.error(expr.name, "Only instances have fields.")
         value = self.evaluate(expr.value)
-        obj.set(expr.name, value)
+        obj.store(expr.name.lexeme, value)
         return value
     
     def visit_super_expr(self, expr: ExprSuper) -> Any:
-        if expr in self.locals:
-            distance = self.locals[expr]
-            superclass = self.environment.get_at(distance, "super")
-            obj = self.environment.get_at(distance - 1, "this")
-            method = superclass.find_method(expr.method.lexeme)
-            if method == None: raise self.error(expr.method, f"Undefined property '{expr.method.lexeme}'.")
-
-            return method.bind(obj)
+        if expr.depth is not None:
+            return self.super_method(expr).bind(self.environment.get_at(expr.depth - 1, 0))
         return 
+
+    def super_method(self, expr: ExprSuper) -> LoxFunction:
+        # The method's own frame, holding 'this' in slot 0, sits directly
+        # inside the scope that holds 'super'.
+        superclass = self.environment.get_at(expr.depth, expr.slot)
+        method = superclass.find_method(expr.method.lexeme)
+        if method == None: raise self.error(expr.method, f"Undefined property '{expr.method.lexeme}'.")
+        return method
     
     def visit_this_expr(self, expr: ExprThis) -> Any:
         return self.look_up_variable(expr.keyword, expr)
     
-    def visit_unary_expr(self, expr: ExprUnary) -> str:
-        right = self.evaluate(expr.right)
-        match expr.operator.type:
-            case TokenType.MINUS:
-                self.check_number_operand(expr.operator, right)
-                return -float(right)
-            case TokenType.BANG:
-                return not self.is_truthy()
-               
-        return None
+    def visit_unary_expr(self, expr: ExprUnary) -> Any:
+        handler = expr.handler or UNARY[expr.operator.type]
+        return handler(expr.operator, self.evaluate(expr.right))
     
     def visit_variable_expr(self, expr: ExprVariable) -> Any:
         return self.look_up_variable(expr.name, expr)
     
     def look_up_variable(self, name: Token, expr: Expr) -> Any:
-        distance = None
-        if expr in self.locals:
-            distance = self.locals[expr]
-        if distance != None:
-            return self.environment.get_at(distance, name.lexeme)
-        else:
-            return self.globals.get(name)
-
-    def check_number_operand(self, operator: Token, obj: Any):
-        if isinstance(obj, float): return
-        raise self.error(operator, "Operand must be a number.")
-    
-    def check_number_operands(self, operator: Token, left: Any, right: Any):
-        if isinstance(left, float) and isinstance(right, float): return
-        raise self.error(operator, "Operands must be numbers.")
+        if expr.depth is not None:
+            return self.environment.get_at(expr.depth, expr.slot)
+        if expr.slot is not None:
+            value = self.globals.values[expr.slot]
+            if value is not UNDEFINED:
+                return value
+        return self.globals.get(name)
 
     def is_truthy(self, obj: Any) -> bool:
         if obj == None: return False
@@ -163,29 +173,51 @@ class Interpreter(ExprVisitor, StmtVisitor):
     def is_equal(self, a: Any, b: Any) -> bool:
         if a is None and b is None: return True
         if a is None or b is None: return False
-        if isinstance(a, float) and isinstance(b, float):
-            return a == b
+        if type(a) is not type(b): return False
+        return a == b
     
     def evaluate(self, expr: Expr) -> Any:
         return expr.accept(self)
     
-    def execute(self, stmt: Stmt) -> None:
-        stmt.accept(self)
+    def execute(self, stmt: Stmt) -> Any:
+        # Returns RETURN once a 'return' has run, which every statement that
+        # contains others passes straight up.
+        return stmt.accept(self)
+
+    def define(self, name: Token, slot: int, value: Any) -> None:
+        # Global declarations run in the global environment, so a resolved
+        # slot is always an index into the current one.
+        if slot is None:
+            self.globals.define(name.lexeme, value)
+        else:
+            self.environment.values[slot] = value
 
-    def resolve(self, expr: Expr, depth: int) -> None:
-        self.locals[expr] = depth
+    def global_slot(self, name: str) -> int:
+        return self.globals.slot(name)
 
-    def execute_block(self, statements: list[Stmt], environment: Environment) -> None:
+    def resolve(self, expr: Expr, depth: int, slot: int) -> None:
+        self.locals[expr] = (depth, slot)
+
+    def execute_block(self, statements: list[Stmt], environment: Environment) -> Any:
         previous = self.environment
         try:
             self.environment = environment
             for statement in statements:
-                self.execute(statement)
+                if self.execute(statement) is RETURN:
+                    return RETURN
         finally:
             self.environment = previous
+        return None
 
-    def visit_block_stmt(self, stmt: StmtBlock) -> None:
-        self.execute_block(stmt.statements, Environment(self.environment))
+    def execute_body(self, declaration: StmtFunction, environment: Environment) -> Any:
+        return self.execute_block(declaration.body, environment)
+
+    def visit_block_stmt(self, stmt: StmtBlock) -> Any:
+        if stmt.size is not None:
+            return self.execute_block(stmt.statements, Environment(self.environment, stmt.size))
+        for statement in stmt.statements:
+            if self.execute(statement) is RETURN:
+                return RETURN
         return None
     
     def visit_class_stmt(self, stmt: StmtClass) -> None:
@@ -195,11 +227,9 @@ class Interpreter(ExprVisitor, StmtVisitor):
             if not isinstance(superclass, LoxClass):
                 raise self.error(stmt.superclass.name, "Superclass must be a class.")
 
-        self.environment.define(stmt.name.lexeme, None)
-
         if stmt.superclass != None:
-            self.environment = Environment(self.environment)
-            self.environment.define("super", superclass)
+            self.environment = Environment(self.environment, 1)
+            self.environment.values[0] = superclass
 
         methods = {}
         for method in stmt.methods:
@@ -210,7 +240,9 @@ class Interpreter(ExprVisitor, StmtVisitor):
         klass = LoxClass(stmt.name.lexeme, superclass, methods)
         if superclass != None:
             self.environment = self.environment.enclosing
-        self.environment.assign(stmt.name, klass)
+        # Nothing can run between declaring the class and creating it, so
+        # defining it here still gives the name the slot it was resolved to.
+        self.define(stmt.name, stmt.slot, klass)
         return None
     
     def error(self, token: Token, message:str) -> RuntimeException:
@@ -222,16 +254,34 @@ class Interpreter(ExprVisitor, StmtVisitor):
         self.evaluate(stmt.expression)
         return None
     
+    def visit_for_stmt(self, stmt: StmtFor) -> Any:
+        # A loop variable that a closure captures gets one scope, shared by
+        # every iteration, exactly like the block the loop used to desugar into.
+        previous = self.environment
+        if stmt.size is not None:
+            self.environment = Environment(previous, stmt.size)
+        try:
+            if stmt.initializer is not None:
+                self.execute(stmt.initializer)
+            while self.is_truthy(self.evaluate(stmt.condition)):
+                if self.execute(stmt.body) is RETURN:
+                    return RETURN
+                if stmt.increment is not None:
+                    self.evaluate(stmt.increment)
+        finally:
+            self.environment = previous
+        return None
+
     def visit_function_stmt(self, stmt: StmtFunction) -> None:
         function = LoxFunction(stmt, self.environment, False)
-        self.environment.define(stmt.name.lexeme, function)
+        self.define(stmt.name, stmt.slot, function)
         return None
     
-    def visit_if_stmt(self, stmt: StmtIf):
+    def visit_if_stmt(self, stmt: StmtIf) -> Any:
         if self.is_truthy(self.evaluate(stmt.condition)):
-            self.execute(stmt.then_branch)
+            return self.execute(stmt.then_branch)
         elif stmt.else_branch is not None:
-            self.execute(stmt.else_branch)
+            return self.execute(stmt.else_branch)
         return None
     
     def visit_print_stmt(self, stmt: StmtPrint) -> None:
@@ -239,30 +289,52 @@ class Interpreter(ExprVisitor, StmtVisitor):
         print(self.stringify(value))
         return None
     
-    def visit_return_stmt(self, stmt: StmtReturn) -> None:
+    def visit_return_stmt(self, stmt: StmtReturn) -> Any:
+        if stmt.tail:
+            call = stmt.value
+            callee = self.evaluate(call.callee)
+            arguments = [self.evaluate(argument) for argument in call.arguments]
+            self.return_value = self.call_in_tail_position(call.paren, callee, arguments)
+            return RETURN
         value = None
         if stmt.value != None: value = self.evaluate(stmt.value)
-        raise Return(value)
+        self.return_value = value
+        return RETURN
+
+    def call_in_tail_position(self, paren: Token, callee: Any, arguments: list) -> Any:
+        # Lox functions and methods are handed back to LoxFunction.invoke
+        # to run in place of the current call; anything else is called now.
+        this = None
+        if type(callee) is BoundMethod:
+            callee, this = callee.method, callee.this
+        if not isinstance(callee, LoxCallable):
+            raise self.error(paren, "Can only call functions and classes.")
+        if len(arguments) != callee.arity():
+            raise self.error(paren, f"Expected {callee.arity()} arguments but got {len(arguments)}.")
+        if type(callee) is not LoxFunction:
+            return callee.call(self, arguments)
+        self.tail_call = (callee, this, arguments)
+        return TAIL_CALL
     
     def visit_var_stmt(self, stmt: StmtVar):
         value = None
         if stmt.initializer != None:
             value = self.evaluate(stmt.initializer)
-        self.environment.define(stmt.name.lexeme, value)
+        self.define(stmt.name, stmt.slot, value)
         return None
     
-    def visit_while_stmt(self, stmt: StmtWhile):
+    def visit_while_stmt(self, stmt: StmtWhile) -> Any:
         while self.is_truthy(self.evaluate(stmt.condition)):
-            self.execute(stmt.body)
+            if self.execute(stmt.body) is RETURN:
+                return RETURN
         return None
 
     def visit_assign_expr(self, expr: ExprAssign):
         value = self.evaluate(expr.value)
-        distance = None
-        if expr in self.locals:
-            distance = self.locals[expr]
-        if distance != None:
-            self.environment.assign_at(distance, expr.name, value)
+        if expr.depth is not None:
+            self.environment.assign_at(expr.depth, expr.slot, value)
+        elif expr.slot is not None and self.globals.values[expr.slot] is not UNDEFINED:
+            self.globals.values[expr.slot] = value
         else:
             self.globals.assign(expr.name, value)
         return value
@@ -3,10 +3,12 @@ from stmt import *
 from environment import Environment, RuntimeException
 import time
 
-class Return(RuntimeException):
-    def __init__(self, value):
-        super().__init__(None, None)
-        self.value = value
+# What executing a statement gives back when it ran a 'return'. The value
+# being returned is left in the interpreter's return_value.
+RETURN = object()
+# Left as the return value by a call in tail position; the call itself is
+# waiting in the interpreter's tail_call.
+TAIL_CALL = object()
 
 @runtime_checkable
 class LoxCallable(Protocol):
@@ -30,22 +32,31 @@ class LoxFunction(LoxCallable):
         self.closure = closure
         self.is_initializer = is_initializer
 
-    def bind(self, instance: 'LoxInstance') -> 'LoxFunction':
-        enviroment = Environment(self.closure)
-        enviroment.define("this", instance)
-        return LoxFunction(self.declaration, enviroment, self.is_initializer)
+    def bind(self, instance: 'LoxInstance') -> 'BoundMethod':
+        return BoundMethod(self, instance)
 
     def call(self, interpreter, arguments: list[Any]):
-        environment = Environment(self.closure)
-        for i in range(len(self.declaration.parameters)):
-            environment.define(self.declaration.parameters[i].lexeme, arguments[i])
-        try:
-            interpreter.execute_block(self.declaration.body, environment)
-        except Return as return_value:
-            if self.is_initializer: return self.closure.get_at(0, "this")
-            return return_value.value
-        if self.is_initializer: return self.closure.get_at(0, "this")
-        return None
+        return self.invoke(interpreter, None, arguments)
+
+    def invoke(self, interpreter, this: 'LoxInstance', arguments: list[Any]):
+        # A method gets its instance in slot 0 of the new frame. Calls the
+        # body makes in tail position are run by this loop rather than
+        # nested, so tail recursion needs no more Python stack.
+        function = self
+        while True:
+            environment = Environment(function.closure, function.declaration.size)
+            values = environment.values
+            if this is None:
+                values[:len(arguments)] = arguments
+            else:
+                values[0] = this
+                values[1:len(arguments) + 1] = arguments
+            completion = interpreter.execute_body(function.declaration, environment)
+            if function.is_initializer: return this
+            if completion is not RETURN: return None
+            value = interpreter.return_value
+            if value is not TAIL_CALL: return value
+            function, this, arguments = interpreter.tail_call
     
     def arity(self) -> int:
         return len(self.declaration.parameters)
@@ -53,48 +64,124 @@ class LoxFunction(LoxCallable):
     def __str__(self) -> str:
         return f"function {self.declaration.name.lexeme}"
     
+class BoundMethod(LoxCallable):
+    # A method read off an instance without being called straight away.
+    __slots__ = ("method", "this")
+
+    def __init__(self, method: LoxFunction, this: 'LoxInstance'):
+        self.method = method
+        self.this = this
+
+    def call(self, interpreter, arguments: list[Any]):
+        return self.method.invoke(interpreter, self.this, arguments)
+
+    def arity(self) -> int:
+        return self.method.arity()
+
+    def __str__(self) -> str:
+        return str(self.method)
+
 class LoxClass(LoxCallable):
     def __init__(self, name: str, superclass: 'LoxClass', methods: dict):
         self.name = name
         self.superclass = superclass
-        self.methods = methods
+        # Inherited methods are copied down, so finding any method is one
+        # lookup however deep the hierarchy is.
+        self.methods = dict(superclass.methods) if superclass is not None else {}
+        self.methods.update(methods)
+        self.initializer = self.methods.get("init")
+        self.initializer_arity = self.initializer.arity() if self.initializer is not None else 0
+        self.shape = Shape()
 
     def find_method(self, name: str) -> LoxFunction:
-        if name in self.methods:
-            return self.methods[name]
-        if self.superclass != None:
-            return self.superclass.find_method(name)
-        return None
+        return self.methods.get(name)
 
     def call(self, interpreter, arguments: list[Any]):
         instance = LoxInstance(self)
-        initializer = self.find_method("init")
-        if initializer != None:
-            initializer.bind(instance).call(interpreter, arguments)
+        if self.initializer is not None:
+            self.initializer.invoke(interpreter, instance, arguments)
         return instance
     
     def arity(self) -> int:
-        initializer = self.find_method("init")
-        if initializer == None: return 0
-        return initializer.arity()
+        return self.initializer_arity
 
     def __str__(self) -> str:
         return self.name
     
+class Shape(dict):
+    # Maps each field name to its index in an instance's values. Instances
+    # of one class that add the same fields in the same order share a shape.
+    __slots__ = ("transitions",)
+
+    def __init__(self, *args) -> None:
+        super().__init__(*args)
+        self.transitions: dict[str, Shape] = {}
+
+    def with_field(self, name: str) -> "Shape":
+        shape = self.transitions.get(name)
+        if shape is None:
+            shape = self.transitions[name] = Shape(self)
+            shape[name] = len(self)
+        return shape
+
 class LoxInstance:
+    __slots__ = ("klass", "shape", "values")
+
     def __init__(self, klass: LoxClass):
         self.klass = klass
-        self.fields = {}
+        self.shape = klass.shape
+        self.values = []
 
     def __str__(self) -> str:
         return self.klass.name + " instance"
     
     def get(self, name: Token):
-        if name.lexeme in self.fields:
-            return self.fields[name.lexeme]
+        index = self.shape.get(name.lexeme)
+        if index is not None:
+            return self.values[index]
         method = self.klass.find_method(name.lexeme)
         if method != None: return method.bind(self)
         raise RuntimeException(name, f"Undefined property '{name.lexeme}'.")
     
     def set(self, name: Token, value: Any) -> None:
-        self.fields[name.lexeme] = value
+        self.store(name.lexeme, value)
+
+    def store(self, name: str, value: Any) -> None:
+        index = self.shape.get(name)
+        if index is None:
+            self.shape = self.shape.with_field(name)
+            self.values.append(value)
+        else:
+            self.values[index] = value
+
+class InlineCache:
+    # Remembers, for one property access in the source, which method each
+    # class it has seen resolves the name to. A class's methods never change
+    # once it exists, so entries stay valid; fields shadow methods and are
+    # always checked before the cache.
+    __slots__ = ("klass", "method", "entries")
+    limit = 4
+
+    def __init__(self) -> None:
+        self.klass = None
+        self.method = None
+        self.entries: dict = None
+
+    def __reduce__(self):
+        # What a cache has seen belongs to one run; a pickled AST gets an
+        # empty one.
+        return (InlineCache, ())
+
+    def lookup(self, klass: LoxClass, name: str) -> LoxFunction:
+        if klass is self.klass:
+            return self.method
+        if self.entries is not None and klass in self.entries:
+            return self.entries[klass]
+        method = klass.find_method(name)
+        if self.klass is None:
+            self.klass, self.method = klass, method
+        elif self.entries is None:
+            self.entries = {klass: method}
+        elif len(self.entries) < self.limit:
+            self.entries[klass] = method
+        return method
@@ -0,0 +1,164 @@
+import sys, threading
+from typing import Any
+from tokentype import Token, TokenType
+from environment import RuntimeException, UNDEFINED
+from lox_callable import LoxCallable, LoxClass, LoxInstance, Clock
+from interpreter import stringify
+
+RECURSION_LIMIT = 1_000_000
+STACK_SIZE = 1024 * 1024 * 1024
+
+# Support code for modules generated by lox2py. Generated code does the
+# common cases inline and calls these for everything else, including every
+# runtime error, so the errors read exactly as the interpreter's do.
+
+class Cell:
+    # A local captured by a closure. Each execution of its declaration makes
+    # a new cell, so closures created in a loop see their own variable.
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any = None) -> None:
+        self.value = value
+
+    def set(self, value: Any) -> Any:
+        self.value = value
+        return value
+
+class Function(LoxCallable):
+    __slots__ = ("fn", "name", "parameters", "is_initializer")
+
+    def __init__(self, fn, name: str, parameters: int, is_initializer: bool = False) -> None:
+        self.fn = fn
+        self.name = name
+        self.parameters = parameters
+        self.is_initializer = is_initializer
+
+    def bind(self, instance: LoxInstance) -> "Method":
+        return Method(self, instance)
+
+    def call(self, interpreter, arguments: list[Any]) -> Any:
+        return self.fn(*arguments)
+
+    def invoke(self, interpreter, this: LoxInstance, arguments: list[Any]) -> Any:
+        result = self.fn(this, *arguments)
+        return this if self.is_initializer else result
+
+    def arity(self) -> int:
+        return self.parameters
+
+    def __str__(self) -> str:
+        return f"function {self.name}"
+
+class Method(LoxCallable):
+    # A method bound to its instance, which is passed as the first argument.
+    __slots__ = ("function", "this")
+
+    def __init__(self, function: Function, this: LoxInstance) -> None:
+        self.function = function
+        self.this = this
+
+    def bind(self, instance: LoxInstance) -> "Method":
+        return Method(self.function, instance)
+
+    def call(self, interpreter, arguments: list[Any]) -> Any:
+        return self.function.invoke(interpreter, self.this, arguments)
+
+    def arity(self) -> int:
+        return self.function.parameters
+
+    def __str__(self) -> str:
+        return str(self.function)
+
+def error(lexeme: str, line: int, message: str) -> RuntimeException:
+    return RuntimeException(Token(TokenType.IDENTIFIER, lexeme, None, line), message)
+
+def undefined(name: str, line: int) -> Any:
+    raise error(name, line, f"Undefined variable '{name}'.")
+
+def assign_global(module: dict, name: str, value: Any, line: int) -> Any:
+    if module["g_" + name] is UNDEFINED:
+        undefined(name, line)
+    module["g_" + name] = value
+    return value
+
+def add(left: Any, right: Any, line: int) -> Any:
+    if type(left) is str and type(right) is str:
+        return left + right
+    raise error("+", line, "Operand must be two numbers or two strings.")
+
+def operands(lexeme: str, line: int) -> Any:
+    raise error(lexeme, line, "Operands must be numbers.")
+
+def operand(line: int) -> Any:
+    raise error("-", line, "Operand must be a number.")
+
+def call(callee: Any, lexeme: str, line: int, *arguments: Any) -> Any:
+    if not isinstance(callee, LoxCallable):
+        raise error(lexeme, line, "Can only call functions and classes.")
+    if len(arguments) != callee.arity():
+        raise error(lexeme, line, f"Expected {callee.arity()} arguments but got {len(arguments)}.")
+    return callee.call(None, list(arguments))
+
+def get_property(obj: Any, name: str, line: int) -> Any:
+    if isinstance(obj, LoxInstance):
+        index = obj.shape.get(name)
+        if index is not None:
+            return obj.values[index]
+        return obj.get(Token(TokenType.IDENTIFIER, name, None, line))
+    raise error(name, line, "Only instances have properties.")
+
+def instance_of(obj: Any, name: str, line: int) -> LoxInstance:
+    if isinstance(obj, LoxInstance):
+        return obj
+    raise error(name, line, "Only instances have fields.")
+
+def store(instance: LoxInstance, name: str, value: Any) -> Any:
+    instance.store(name, value)
+    return value
+
+def super_method(superclass: LoxClass, this: LoxInstance, name: str, line: int) -> Method:
+    method = superclass.find_method(name)
+    if method is None:
+        raise error(name, line, f"Undefined property '{name}'.")
+    return method.bind(this)
+
+def superclass(value: Any, name: str, line: int) -> LoxClass:
+    if not isinstance(value, LoxClass):
+        raise error(name, line, "Superclass must be a class.")
+    return value
+
+def overflow_line(traceback, call_lines: dict, filename: str) -> int:
+    # The innermost generated line that was running is the call that
+    # overflowed.
+    line = 0
+    while traceback is not None:
+        if traceback.tb_frame.f_code.co_filename == filename:
+            line = call_lines.get(traceback.tb_lineno, line)
+        traceback = traceback.tb_next
+    return line
+
+def run(main, call_lines: dict = {}) -> None:
+    # Lox calls are Python calls in generated code, so main runs on a thread
+    # with room for deep recursion. Going past that is a Lox stack overflow,
+    # reported at the call that made it.
+    status = []
+    def execute() -> None:
+        try:
+            main()
+        except RuntimeException as runtime_error:
+            sys.stdout.flush()
+            sys.stderr.write(runtime_error.report())
+            status.append(70)
+        except RecursionError as recursion:
+            sys.stdout.flush()
+            line = overflow_line(recursion.__traceback__, call_lines, main.__code__.co_filename)
+            sys.stderr.write(error(")", line, "Stack overflow.").report())
+            status.append(70)
+        sys.stderr.flush()
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), RECURSION_LIMIT))
+    threading.stack_size(STACK_SIZE)
+    thread = threading.Thread(target=execute)
+    thread.start()
+    thread.join()
+    if status:
+        sys.exit(status[0])
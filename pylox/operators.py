@@ -0,0 +1,82 @@
+from typing import Any
+from tokentype import Token, TokenType
+from environment import RuntimeException
+
+# One handler per operator. The resolver stores the handler on each binary
+# and unary node, so evaluating one is a single call with no dispatch on the
+# operator and no re-checking of operands that are already floats.
+
+def number_operands(operator: Token) -> RuntimeException:
+    return RuntimeException(operator, "Operands must be numbers.")
+
+def add(operator: Token, left: Any, right: Any) -> Any:
+    if (type(left) is float and type(right) is float) or (type(left) is str and type(right) is str):
+        return left + right
+    raise RuntimeException(operator, "Operand must be two numbers or two strings.")
+
+def subtract(operator: Token, left: Any, right: Any) -> float:
+    if type(left) is float and type(right) is float:
+        return left - right
+    raise number_operands(operator)
+
+def multiply(operator: Token, left: Any, right: Any) -> float:
+    if type(left) is float and type(right) is float:
+        return left * right
+    raise number_operands(operator)
+
+def divide(operator: Token, left: Any, right: Any) -> float:
+    if type(left) is float and type(right) is float:
+        return left / right
+    raise number_operands(operator)
+
+def greater(operator: Token, left: Any, right: Any) -> bool:
+    if type(left) is float and type(right) is float:
+        return left > right
+    raise number_operands(operator)
+
+def greater_equal(operator: Token, left: Any, right: Any) -> bool:
+    if type(left) is float and type(right) is float:
+        return left >= right
+    raise number_operands(operator)
+
+def less(operator: Token, left: Any, right: Any) -> bool:
+    if type(left) is float and type(right) is float:
+        return left < right
+    raise number_operands(operator)
+
+def less_equal(operator: Token, left: Any, right: Any) -> bool:
+    if type(left) is float and type(right) is float:
+        return left <= right
+    raise number_operands(operator)
+
+def equal(operator: Token, left: Any, right: Any) -> bool:
+    return type(left) is type(right) and left == right
+
+def not_equal(operator: Token, left: Any, right: Any) -> bool:
+    return type(left) is not type(right) or left != right
+
+def negate(operator: Token, right: Any) -> float:
+    if type(right) is float:
+        return -right
+    raise RuntimeException(operator, "Operand must be a number.")
+
+def logical_not(operator: Token, right: Any) -> bool:
+    return right is None or right is False
+
+BINARY = {
+    TokenType.PLUS: add,
+    TokenType.MINUS: subtract,
+    TokenType.STAR: multiply,
+    TokenType.SLASH: divide,
+    TokenType.GREATER: greater,
+    TokenType.GREATER_EQUAL: greater_equal,
+    TokenType.LESS: less,
+    TokenType.LESS_EQUAL: less_equal,
+    TokenType.EQUAL_EQUAL: equal,
+    TokenType.BANG_EQUAL: not_equal
+}
+
+UNARY = {
+    TokenType.MINUS: negate,
+    TokenType.BANG: logical_not
+}
@@ -0,0 +1,291 @@
+from expr import *
+from stmt import *
+from tokentype import TokenType
+from environment import RuntimeException
+from operators import BINARY, UNARY
+
+class Binding:
+    __slots__ = ("assigned", "constant", "value")
+
+    def __init__(self, assigned: bool = False) -> None:
+        self.assigned = assigned
+        self.constant = False
+        self.value = None
+
+class Optimizer(ExprVisitor, StmtVisitor):
+    def __init__(self, interpreter) -> None:
+        self.interpreter = interpreter
+        self.analysis = BindingAnalysis(interpreter.locals)
+
+    def optimize(self, statements: list[Stmt]) -> list[Stmt]:
+        self.analysis.analyze_list(statements)
+        for stmt in statements:
+            self.optimize_stmt(stmt)
+        return statements
+
+    def optimize_stmt(self, stmt: Stmt) -> None:
+        if stmt is not None:
+            stmt.accept(self)
+
+    def optimize_expr(self, expr: Expr) -> Expr:
+        return expr.accept(self)
+
+    def visit_block_stmt(self, stmt: StmtBlock) -> None:
+        for statement in stmt.statements:
+            self.optimize_stmt(statement)
+
+    def visit_class_stmt(self, stmt: StmtClass) -> None:
+        # The superclass stays a variable: it is reported by name at runtime.
+        for method in stmt.methods:
+            self.visit_function_stmt(method)
+
+    def visit_expression_stmt(self, stmt: StmtExpression) -> None:
+        stmt.expression = self.optimize_expr(stmt.expression)
+
+    def visit_for_stmt(self, stmt: StmtFor) -> None:
+        self.optimize_stmt(stmt.initializer)
+        stmt.condition = self.optimize_expr(stmt.condition)
+        self.optimize_stmt(stmt.body)
+        if stmt.increment is not None:
+            stmt.increment = self.optimize_expr(stmt.increment)
+
+    def visit_function_stmt(self, stmt: StmtFunction) -> None:
+        for statement in stmt.body:
+            self.optimize_stmt(statement)
+
+    def visit_if_stmt(self, stmt: StmtIf) -> None:
+        stmt.condition = self.optimize_expr(stmt.condition)
+        self.optimize_stmt(stmt.then_branch)
+        self.optimize_stmt(stmt.else_branch)
+
+    def visit_print_stmt(self, stmt: StmtPrint) -> None:
+        stmt.expression = self.optimize_expr(stmt.expression)
+
+    def visit_return_stmt(self, stmt: StmtReturn) -> None:
+        if stmt.value is not None:
+            stmt.value = self.optimize_expr(stmt.value)
+
+    def visit_var_stmt(self, stmt: StmtVar) -> None:
+        if stmt.initializer is not None:
+            stmt.initializer = self.optimize_expr(stmt.initializer)
+        binding = self.analysis.declarations.get(stmt)
+        if binding is None or binding.assigned:
+            return
+        if stmt.initializer is None:
+            binding.constant = True
+        elif isinstance(stmt.initializer, ExprLiteral):
+            binding.constant = True
+            binding.value = stmt.initializer.value
+
+    def visit_while_stmt(self, stmt: StmtWhile) -> None:
+        stmt.condition = self.optimize_expr(stmt.condition)
+        self.optimize_stmt(stmt.body)
+
+    def visit_assign_expr(self, expr: ExprAssign) -> Expr:
+        expr.value = self.optimize_expr(expr.value)
+        return expr
+
+    def visit_binary_expr(self, expr: ExprBinary) -> Expr:
+        expr.left = self.optimize_expr(expr.left)
+        expr.right = self.optimize_expr(expr.right)
+        if not (isinstance(expr.left, ExprLiteral) and isinstance(expr.right, ExprLiteral)):
+            return expr
+        left, right = expr.left.value, expr.right.value
+        # Operands of the wrong type are left alone so the runtime error is
+        # still raised, at the same token, when the expression is evaluated.
+        if expr.operator.type == TokenType.SLASH and right == 0:
+            return expr
+        try:
+            return ExprLiteral(BINARY[expr.operator.type](expr.operator, left, right))
+        except RuntimeException:
+            return expr
+
+    def visit_call_expr(self, expr: ExprCall) -> Expr:
+        expr.callee = self.optimize_expr(expr.callee)
+        expr.arguments = [self.optimize_expr(argument) for argument in expr.arguments]
+        return expr
+
+    def visit_get_expr(self, expr: ExprGet) -> Expr:
+        expr.object = self.optimize_expr(expr.object)
+        return expr
+
+    def visit_grouping_expr(self, expr: ExprGrouping) -> Expr:
+        return self.optimize_expr(expr.expression)
+
+    def visit_literal_expr(self, expr: ExprLiteral) -> Expr:
+        return expr
+
+    def visit_logical_expr(self, expr: ExprLogical) -> Expr:
+        expr.left = self.optimize_expr(expr.left)
+        expr.right = self.optimize_expr(expr.right)
+        if not isinstance(expr.left, ExprLiteral):
+            return expr
+        truthy = self.interpreter.is_truthy(expr.left.value)
+        if expr.operator.type == TokenType.OR:
+            return expr.left if truthy else expr.right
+        return expr.right if truthy else expr.left
+
+    def visit_set_expr(self, expr: ExprSet) -> Expr:
+        expr.object = self.optimize_expr(expr.object)
+        expr.value = self.optimize_expr(expr.value)
+        return expr
+
+    def visit_super_expr(self, expr: ExprSuper) -> Expr:
+        return expr
+
+    def visit_this_expr(self, expr: ExprThis) -> Expr:
+        return expr
+
+    def visit_unary_expr(self, expr: ExprUnary) -> Expr:
+        expr.right = self.optimize_expr(expr.right)
+        if not isinstance(expr.right, ExprLiteral):
+            return expr
+        try:
+            return ExprLiteral(UNARY[expr.operator.type](expr.operator, expr.right.value))
+        except RuntimeException:
+            return expr
+
+    def visit_variable_expr(self, expr: ExprVariable) -> Expr:
+        binding = self.analysis.uses.get(expr)
+        if binding is not None and binding.constant:
+            return ExprLiteral(binding.value)
+        return expr
+
+class BindingAnalysis(ExprVisitor, StmtVisitor):
+    # Mirrors the Resolver's scopes to find which local declaration every
+    # variable refers to and which locals are ever assigned after that.
+    def __init__(self, locals: dict) -> None:
+        self.locals = locals
+        self.scopes: list[dict[str, Binding]] = []
+        self.declarations: dict[StmtVar, Binding] = {}
+        self.uses: dict[ExprVariable, Binding] = {}
+
+    def analyze_list(self, statements: list[Stmt]) -> None:
+        for stmt in statements:
+            if stmt is not None:
+                stmt.accept(self)
+
+    def analyze(self, expr: Expr) -> None:
+        if expr is not None:
+            expr.accept(self)
+
+    def declare(self, name: str, binding: Binding = None) -> Binding:
+        if binding is None:
+            binding = Binding(assigned=True)
+        if self.scopes:
+            self.scopes[-1][name] = binding
+        return binding
+
+    def lookup(self, expr: Expr, name: str) -> Binding:
+        for scope in reversed(self.scopes):
+            if name in scope:
+                if expr in self.locals:
+                    return scope[name]
+                return None
+        return None
+
+    def visit_block_stmt(self, stmt: StmtBlock) -> None:
+        self.scopes.append({})
+        self.analyze_list(stmt.statements)
+        self.scopes.pop()
+
+    def visit_class_stmt(self, stmt: StmtClass) -> None:
+        self.declare(stmt.name.lexeme)
+        self.analyze(stmt.superclass)
+        if stmt.superclass is not None:
+            self.scopes.append({"super": Binding(assigned=True)})
+        self.scopes.append({"this": Binding(assigned=True)})
+        for method in stmt.methods:
+            self.function(method)
+        self.scopes.pop()
+        if stmt.superclass is not None:
+            self.scopes.pop()
+
+    def visit_expression_stmt(self, stmt: StmtExpression) -> None:
+        self.analyze(stmt.expression)
+
+    def visit_for_stmt(self, stmt: StmtFor) -> None:
+        scoped = isinstance(stmt.initializer, StmtVar)
+        if scoped:
+            self.scopes.append({})
+        self.analyze_list([stmt.initializer])
+        self.analyze(stmt.condition)
+        self.analyze_list([stmt.body])
+        self.analyze(stmt.increment)
+        if scoped:
+            self.scopes.pop()
+
+    def visit_function_stmt(self, stmt: StmtFunction) -> None:
+        self.declare(stmt.name.lexeme)
+        self.function(stmt)
+
+    def function(self, stmt: StmtFunction) -> None:
+        self.scopes.append({param.lexeme: Binding(assigned=True) for param in stmt.parameters})
+        self.analyze_list(stmt.body)
+        self.scopes.pop()
+
+    def visit_if_stmt(self, stmt: StmtIf) -> None:
+        self.analyze(stmt.condition)
+        self.analyze_list([stmt.then_branch, stmt.else_branch])
+
+    def visit_print_stmt(self, stmt: StmtPrint) -> None:
+        self.analyze(stmt.expression)
+
+    def visit_return_stmt(self, stmt: StmtReturn) -> None:
+        self.analyze(stmt.value)
+
+    def visit_var_stmt(self, stmt: StmtVar) -> None:
+        if self.scopes:
+            self.declarations[stmt] = self.declare(stmt.name.lexeme, Binding())
+        self.analyze(stmt.initializer)
+
+    def visit_while_stmt(self, stmt: StmtWhile) -> None:
+        self.analyze(stmt.condition)
+        self.analyze_list([stmt.body])
+
+    def visit_assign_expr(self, expr: ExprAssign) -> None:
+        self.analyze(expr.value)
+        for scope in reversed(self.scopes):
+            if expr.name.lexeme in scope:
+                scope[expr.name.lexeme].assigned = True
+                return
+
+    def visit_binary_expr(self, expr: ExprBinary) -> None:
+        self.analyze(expr.left)
+        self.analyze(expr.right)
+
+    def visit_call_expr(self, expr: ExprCall) -> None:
+        self.analyze(expr.callee)
+        for argument in expr.arguments:
+            self.analyze(argument)
+
+    def visit_get_expr(self, expr: ExprGet) -> None:
+        self.analyze(expr.object)
+
+    def visit_grouping_expr(self, expr: ExprGrouping) -> None:
+        self.analyze(expr.expression)
+
+    def visit_literal_expr(self, expr: ExprLiteral) -> None:
+        return None
+
+    def visit_logical_expr(self, expr: ExprLogical) -> None:
+        self.analyze(expr.left)
+        self.analyze(expr.right)
+
+    def visit_set_expr(self, expr: ExprSet) -> None:
+        self.analyze(expr.value)
+        self.analyze(expr.object)
+
+    def visit_super_expr(self, expr: ExprSuper) -> None:
+        return None
+
+    def visit_this_expr(self, expr: ExprThis) -> None:
+        return None
+
+    def visit_unary_expr(self, expr: ExprUnary) -> None:
+        self.analyze(expr.right)
+
+    def visit_variable_expr(self, expr: ExprVariable) -> None:
+        binding = self.lookup(expr, expr.name.lexeme)
+        if binding is not None:
+            self.uses[expr] = binding
@@ -1,3 +1,7 @@
+from collections import deque
+from collections.abc import Sequence
+from enum import IntEnum
+from typing import Iterable
 from tokentype import *
 from expr import *
 from stmt import *
@@ -15,11 +19,63 @@ class ParseError(Exception):
                 where = f"at '{self.token.lexeme}'"
         return f"Parse error {where} [line {self.token.line}]: {self.message}\n"
 
+class TokenBuffer:
+    def __init__(self, tokens: Iterable[Token], size: int = 2) -> None:
+        self.tokens = iter(tokens)
+        self.buffer: deque[Token] = deque()
+        self.size = size
+        self.offset = 0
+
+    def __getitem__(self, index: int) -> Token:
+        if index < self.offset:
+            raise IndexError("Token is no longer buffered.")
+        while index >= self.offset + len(self.buffer):
+            token = next(self.tokens, None)
+            if token is None:
+                return self.buffer[-1]
+            self.buffer.append(token)
+            if len(self.buffer) > self.size:
+                self.buffer.popleft()
+                self.offset += 1
+        return self.buffer[index - self.offset]
+
+class Precedence(IntEnum):
+    NONE = 0
+    ASSIGNMENT = 1
+    OR = 2
+    AND = 3
+    EQUALITY = 4
+    COMPARISON = 5
+    TERM = 6
+    FACTOR = 7
+    UNARY = 8
+    CALL = 9
+
 class Parser:
-    def __init__(self, tokens: list[Token]) -> None:
-        self.tokens: list[Token] = tokens
+    infix_precedence = {
+        TokenType.OR: Precedence.OR,
+        TokenType.AND: Precedence.AND,
+        TokenType.BANG_EQUAL: Precedence.EQUALITY,
+        TokenType.EQUAL_EQUAL: Precedence.EQUALITY,
+        TokenType.GREATER: Precedence.COMPARISON,
+        TokenType.GREATER_EQUAL: Precedence.COMPARISON,
+        TokenType.LESS: Precedence.COMPARISON,
+        TokenType.LESS_EQUAL: Precedence.COMPARISON,
+        TokenType.MINUS: Precedence.TERM,
+        TokenType.PLUS: Precedence.TERM,
+        TokenType.SLASH: Precedence.FACTOR,
+        TokenType.STAR: Precedence.FACTOR,
+        TokenType.LEFT_PAREN: Precedence.CALL,
+        TokenType.DOT: Precedence.CALL
+    }
+
+    def __init__(self, tokens: Iterable[Token], pratt: bool = False) -> None:
+        if not isinstance(tokens, Sequence):
+            tokens = TokenBuffer(tokens)
+        self.tokens: Sequence[Token] | TokenBuffer = tokens
         self.errors: list[ParseError] = []
         self.current = 0
+        self.pratt = pratt
 
     def parse(self):
         statements = []
@@ -55,16 +111,8 @@ class Parser:
         self.consume(TokenType.RIGHT_PAREN, "Expect ')' after for clauses.")
         body = self.statement()
 
-        if increment != None:
-            body = StmtBlock([body, StmtExpression(increment)])
-
         if condition == None: condition = ExprLiteral(True)
-        body = StmtWhile(condition, body)
-
-        if initializer != None:
-            body = StmtBlock([initializer, body])
-
-        return body
+        return StmtFor(initializer, condition, increment, body)
     
     def if_statement(self) -> Stmt:
         self.consume(TokenType.LEFT_PAREN, "Expect '(' after 'if'.")
@@ -156,14 +204,58 @@ class Parser:
     
     def and_expression(self) -> Expr:
         expr = self.equality()
-        while self.match(TokenType.OR):
+        while self.match(TokenType.AND):
             operator = self.previous()
             right = self.equality()
             expr = ExprLogical(expr, operator, right)
         return expr
 
     def expression(self) -> Expr:
+        if self.pratt:
+            return self.parse_precedence(Precedence.ASSIGNMENT)
         return self.assignment()
+
+    def parse_precedence(self, precedence: Precedence) -> Expr:
+        token = self.peek()
+        typ = token.type
+        if typ == TokenType.NUMBER or typ == TokenType.STRING:
+            self.current += 1
+            expr = ExprLiteral(token.literal)
+        elif typ == TokenType.IDENTIFIER:
+            self.current += 1
+            expr = ExprVariable(token)
+        elif typ == TokenType.BANG or typ == TokenType.MINUS:
+            self.current += 1
+            expr = ExprUnary(token, self.parse_precedence(Precedence.UNARY))
+        else:
+            expr = self.primary()
+
+        infix_precedence = self.infix_precedence
+        while True:
+            operator = self.peek()
+            infix = infix_precedence.get(operator.type, Precedence.NONE)
+            if infix < precedence or infix == Precedence.NONE:
+                break
+            self.current += 1
+            if operator.type == TokenType.LEFT_PAREN:
+                expr = self.finish_call(expr)
+            elif operator.type == TokenType.DOT:
+                name = self.consume(TokenType.IDENTIFIER, "Expect property name after '.'.")
+                expr = ExprGet(expr, name)
+            elif infix <= Precedence.AND:
+                expr = ExprLogical(expr, operator, self.parse_precedence(infix + 1))
+            else:
+                expr = ExprBinary(expr, operator, self.parse_precedence(infix + 1))
+
+        if precedence <= Precedence.ASSIGNMENT and self.match(TokenType.EQUAL):
+            equals = self.previous()
+            value = self.parse_precedence(Precedence.ASSIGNMENT)
+            if isinstance(expr, ExprVariable):
+                return ExprAssign(expr.name, value)
+            elif isinstance(expr, ExprGet):
+                return ExprSet(expr.object, expr.name, value)
+            raise self.error(equals, "Invalid assignment target.")
+        return expr
     
     def declaration(self) -> Stmt:
         try:
@@ -253,13 +345,13 @@ class Parser:
     
     def primary(self) -> Expr:
         if self.match(TokenType.FALSE):
-            expr = ExprLiteral("false")
+            expr = ExprLiteral(False)
             return expr
         if self.match(TokenType.TRUE):
-            expr = ExprLiteral("true")
+            expr = ExprLiteral(True)
             return expr
         if self.match(TokenType.NIL):
-            expr = ExprLiteral("null")
+            expr = ExprLiteral(None)
             return expr
         if self.match(TokenType.NUMBER, TokenType.STRING):
             expr = ExprLiteral(self.previous().literal)
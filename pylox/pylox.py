@@ -1,59 +1,117 @@
-import sys, locale
+import sys, locale, mmap
 from scanner import Scanner
 from astprinter import AstPrinter
 from parser import Parser
 from interpreter import Interpreter
 from resolver import Resolver
-    
+from ast_cache import AstCache
+from optimizer import Optimizer
+from closure_compiler import ClosureInterpreter
+from vm import VMInterpreter
+
+ENGINES = {"visitor": Interpreter, "closure": ClosureInterpreter, "vm": VMInterpreter}
+OPTIONS = ["--no-cache", "--optimize"] + [f"--engine={engine}" for engine in ENGINES]
+
 def main(argv: list) -> None:
-    if len(argv) > 2:
-        print("Usage: python3 pylox [script]")
+    options = [arg for arg in argv[1:] if arg.startswith("--")]
+    args = [arg for arg in argv[1:] if not arg.startswith("--")]
+    engine = "visitor"
+    max_depth = None
+    for option in options:
+        if option.startswith("--engine="):
+            engine = option[len("--engine="):]
+        elif option.startswith("--max-depth="):
+            value = option[len("--max-depth="):]
+            max_depth = int(value) if value.isdigit() else 0
+    known = all(option in OPTIONS or option.startswith("--max-depth=") for option in options)
+    # Only the VM keeps its own call stack, so only it takes a depth limit.
+    if len(args) > 1 or not known or (max_depth is not None and (max_depth < 1 or engine != "vm")):
+        print(f"Usage: python3 pylox [--no-cache] [--optimize] [--engine={'|'.join(ENGINES)}] [--max-depth=n] [script]")
         sys.exit(64)
-    elif len(argv) == 2:
-        run_file(argv[1])
+    if len(args) == 1:
+        run_file(args[0], "--no-cache" not in options, "--optimize" in options, engine, max_depth)
     else:
-        run_prompt()
+        run_prompt(engine, max_depth)
         
-def run_file(path: str) -> None:
+def run_file(path: str, use_cache: bool = True, optimize: bool = False, engine: str = "visitor",
+             max_depth: int = None) -> None:
     with open(path, 'rb') as f:
-        bytes = f.read()
-    text = bytes.decode(locale.getpreferredencoding())
-    error = run(text)
+        try:
+            source = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            source = b""
+        try:
+            cache = AstCache(path) if use_cache else None
+            error = run(source, locale.getpreferredencoding(), cache, optimize, engine, max_depth)
+        finally:
+            if isinstance(source, mmap.mmap):
+                source.close()
     if error:
         sys.exit(error)
 
-def run_prompt() -> None:
+def run_prompt(engine: str = "visitor", max_depth: int = None) -> None:
     try:
         while True:
             try:
                 line = input("> ")
-                run(line)
+                run(line, engine=engine, max_depth=max_depth)
             except EOFError:
                 break
     except KeyboardInterrupt:
         print("Stoped due to the user interruption")
 
-def run(code: str):
-    scanner = Scanner(code)
-    tokens, scan_errors = scanner.scan_tokens()
+def run(code: str | bytes, encoding: str = "utf-8", cache: AstCache = None, optimize: bool = False,
+        engine: str = "visitor", max_depth: int = None):
+    interpreter = ENGINES[engine]() if max_depth is None else ENGINES[engine](max_depth)
+    key = cache.key(code, encoding) if cache else None
+    program = cache.load(key) if cache else None
+    if program is None:
+        statements, error = compile_program(code, encoding, interpreter)
+        if error:
+            return error
+        if cache:
+            cache.store(key, (statements, interpreter.locals, interpreter.globals.names))
+    else:
+        statements, interpreter.locals, names = program
+        interpreter.globals.adopt(names)
+
+    if optimize:
+        statements = Optimizer(interpreter).optimize(statements)
 
-    if scan_errors:
-        for error in scan_errors:
+    compile_errors = interpreter.compile(statements)
+    if compile_errors:
+        for error in compile_errors:
             sys.stderr.write(error.report())
         sys.stderr.flush()
         return 65
 
-    parser = Parser(tokens)
+    text, runtime_errors = interpreter.interpret(statements)
+
+    if runtime_errors:
+        for error in runtime_errors:
+            sys.stderr.write(error.report())
+        sys.stderr.flush()
+        return 70
+    
+    return None
+
+def compile_program(code: str | bytes, encoding: str, interpreter: Interpreter):
+    scanner = Scanner(code, fast=True, encoding=encoding)
+    parser = Parser(scanner.iter_tokens(), pratt=True)
     statements, parse_errors = parser.parse()
 
+    if scanner.errors:
+        for error in scanner.errors:
+            sys.stderr.write(error.report())
+        sys.stderr.flush()
+        return None, 65
+
     if parse_errors:
         for error in parse_errors:
             sys.stderr.write(error.report())
         sys.stderr.flush()
-        return 65
-    
-    
-    interpreter = Interpreter()
+        return None, 65
+
     resolver = Resolver(interpreter)
     resolver_errors = resolver.resolve_list(statements)
 
@@ -61,17 +119,9 @@ def run(code: str):
         for error in resolver_errors:
             sys.stderr.write(error.report())
         sys.stderr.flush()
-        return 65
-
-    text, runtime_errors = interpreter.interpret(statements)
+        return None, 65
 
-    if runtime_errors:
-        for error in runtime_errors:
-            sys.stderr.write(error.report())
-        sys.stderr.flush()
-        return 70
-    
-    return None
+    return statements, None
     
 
 if __name__ == "__main__":
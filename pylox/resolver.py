@@ -1,6 +1,7 @@
 from expr import *
 from stmt import *
 from environment import RuntimeException
+from operators import BINARY, UNARY
 from enum import Enum
 
 class FunctionType(Enum):
@@ -14,16 +15,36 @@ class ClassType(Enum):
    CLASS = "CLASS"
    SUBCLASS = "SUBCLASS"
 
+class Scope:
+    # Where the variables of one lexical scope live at runtime. Functions and
+    # classes always get an environment; blocks only when a closure captures
+    # one of their variables, otherwise they borrow slots in the enclosing
+    # environment.
+    def __init__(self, parent: "Scope", node: Stmt, fixed: bool) -> None:
+        self.parent = parent
+        self.node = node
+        self.fixed = fixed
+        self.owner = self if fixed else (parent.owner if parent else None)
+        self.slots: dict[str, int] = {}
+        self.declarations: list[tuple[Stmt, str]] = []
+        self.references: list[tuple[Expr, "Scope", str]] = []
+        self.children: list[Scope] = []
+        self.captured = False
+        self.frame: Scope = None
+        self.base = 0
+        if parent: parent.children.append(self)
+
 class Resolver(ExprVisitor, StmtVisitor):
     def __init__(self, interpeter) -> None:
         self.interperter = interpeter
         self.scopes = []
+        self.layouts: list[Scope] = []
         self.errors = []
         self.current_function = FunctionType.NONE
         self.current_class = ClassType.NONE
 
     def visit_block_stmt(self, stmt: StmtBlock) -> None:
-        self.begin_scope()
+        self.begin_scope(stmt)
         self.resolve_list(stmt.statements)
         self.end_scope()
         return None
@@ -31,7 +52,7 @@ class Resolver(ExprVisitor, StmtVisitor):
     def visit_class_stmt(self, stmt: StmtClass) -> None:
         enclosing_class = self.current_class
         self.current_class = ClassType.CLASS
-        self.declare(stmt.name)
+        self.declare(stmt.name, stmt)
         self.define(stmt.name)
         if stmt.superclass != None:
             if stmt.name.lexeme == stmt.superclass.name.lexeme:
@@ -41,16 +62,13 @@ class Resolver(ExprVisitor, StmtVisitor):
                 self.resolve_expr(stmt.superclass)
 
         if stmt.superclass != None:
-            self.begin_scope()
-            self.scopes[-1]["super"] = True
-        self.begin_scope()
-        self.scopes[-1]["this"] = True
+            self.begin_scope(fixed=True)
+            self.add_local("super")
         for method in stmt.methods:
             declaration = FunctionType.METHOD
             if method.name.lexeme == "init":
                 declaration = FunctionType.INITIALIZER
             self.resolve_function(method, declaration)
-        self.end_scope()
         if stmt.superclass != None: self.end_scope()
         self.current_class = enclosing_class
         return None
@@ -59,8 +77,18 @@ class Resolver(ExprVisitor, StmtVisitor):
         self.resolve_expr(stmt.expression)
         return None
     
+    def visit_for_stmt(self, stmt: StmtFor) -> None:
+        scoped = isinstance(stmt.initializer, StmtVar)
+        if scoped: self.begin_scope(stmt)
+        if stmt.initializer != None: self.resolve_stmt(stmt.initializer)
+        self.resolve_expr(stmt.condition)
+        self.resolve_stmt(stmt.body)
+        if stmt.increment != None: self.resolve_expr(stmt.increment)
+        if scoped: self.end_scope()
+        return None
+
     def visit_function_stmt(self, stmt: StmtFunction) -> None:
-        self.declare(stmt.name)
+        self.declare(stmt.name, stmt)
         self.define(stmt.name)
         self.resolve_function(stmt, FunctionType.FUNCTION)
         return None
@@ -76,6 +104,7 @@ class Resolver(ExprVisitor, StmtVisitor):
             if self.current_function == FunctionType.INITIALIZER:
                 self.error(stmt.keyword, "Can't return a value from an initializer.")
             self.resolve_expr(stmt.value)
+        stmt.tail = isinstance(stmt.value, ExprCall)
         return None
 
     def visit_if_stmt(self, stmt: StmtIf) -> None:
@@ -85,7 +114,7 @@ class Resolver(ExprVisitor, StmtVisitor):
         return None
     
     def visit_var_stmt(self, stmt: StmtVar) -> None:
-        self.declare(stmt.name)
+        self.declare(stmt.name, stmt)
         if stmt.initializer != None:
             self.resolve_expr(stmt.initializer)
         self.define(stmt.name)
@@ -104,6 +133,7 @@ class Resolver(ExprVisitor, StmtVisitor):
     def visit_binary_expr(self, expr: ExprBinary) -> None:
         self.resolve_expr(expr.left)
         self.resolve_expr(expr.right)
+        expr.handler = BINARY[expr.operator.type]
         return None
     
     def visit_call_expr(self, expr: ExprCall) -> None:
@@ -151,6 +181,7 @@ class Resolver(ExprVisitor, StmtVisitor):
 
     def visit_unary_expr(self, expr: ExprUnary) -> None:
         self.resolve_expr(expr.right)
+        expr.handler = UNARY[expr.operator.type]
         return None
     
     def visit_variable_expr(self, expr: ExprVariable) -> None:
@@ -175,7 +206,10 @@ class Resolver(ExprVisitor, StmtVisitor):
     def resolve_function(self, fun: StmtFunction, typ: FunctionType) -> None:
         enclosing_function = self.current_function
         self.current_function = typ
-        self.begin_scope()
+        self.begin_scope(fun, fixed=True)
+        # A method's instance is passed in slot 0 of its own frame.
+        if typ in (FunctionType.METHOD, FunctionType.INITIALIZER):
+            self.add_local("this")
         for param in fun.parameters:
             self.declare(param)
             self.define(param)
@@ -183,17 +217,61 @@ class Resolver(ExprVisitor, StmtVisitor):
         self.end_scope()
         self.current_function = enclosing_function
 
-    def begin_scope(self) -> None:
+    def begin_scope(self, node: Stmt = None, fixed: bool = False) -> None:
         self.scopes.append({})
+        self.layouts.append(Scope(self.layouts[-1] if self.layouts else None, node, fixed))
 
     def end_scope(self) -> None:
         self.scopes.pop()
+        scope = self.layouts.pop()
+        # Whether a scope is captured is only known once all of it has been
+        # seen, so slots and depths are handed out when the outermost ends.
+        if not self.layouts:
+            self.layout(scope, None, 0)
+            self.bind(scope)
 
-    def declare(self, name: Token) -> None:
-        if len(self.scopes) == 0: return
+    def layout(self, scope: Scope, frame: Scope, base: int) -> int:
+        allocated = scope.fixed or scope.captured or (frame is None and len(scope.slots) > 0)
+        if allocated:
+            frame, base = scope, 0
+        scope.frame, scope.base = frame, base
+        top = base + len(scope.slots)
+        for child in scope.children:
+            top = max(top, self.layout(child, frame, base + len(scope.slots)))
+        if scope.node is not None:
+            scope.node.size = top if allocated else None
+        return base if allocated else top
+
+    def bind(self, scope: Scope) -> None:
+        for node, name in scope.declarations:
+            node.slot = scope.base + scope.slots[name]
+        for expr, current, name in scope.references:
+            depth = 0
+            frame = current.frame
+            while frame is not scope.frame:
+                depth += 1
+                frame = frame.parent.frame
+            expr.depth, expr.slot = depth, scope.base + scope.slots[name]
+            self.interperter.resolve(expr, expr.depth, expr.slot)
+        for child in scope.children:
+            self.bind(child)
+
+    def add_local(self, name: str) -> None:
+        self.scopes[-1][name] = True
+        self.layouts[-1].slots[name] = len(self.layouts[-1].slots)
+
+    def declare(self, name: Token, node: Stmt = None) -> None:
+        if len(self.scopes) == 0:
+            if node is not None: node.slot = self.interperter.global_slot(name.lexeme)
+            return
         scope = self.scopes[-1]
         if name.lexeme in scope:
             self.error(name,  "Already a variable with this name in this scope.")
+        else:
+            layout = self.layouts[-1]
+            layout.slots[name.lexeme] = len(layout.slots)
+            if node is not None:
+                layout.declarations.append((node, name.lexeme))
         scope[name.lexeme] = False
 
     def define(self, name: Token) -> None:
@@ -203,8 +281,14 @@ class Resolver(ExprVisitor, StmtVisitor):
     def resolve_local(self, expr: Expr, name: Token) -> None:
         for i in range(len(self.scopes)- 1, -1, -1):
             if name.lexeme in self.scopes[i]:
-                self.interperter.resolve(expr, len(self.scopes) - 1 - i)
+                scope, current = self.layouts[i], self.layouts[-1]
+                if current.owner is not scope.owner:
+                    scope.captured = True
+                scope.references.append((expr, current, name.lexeme))
                 return
+        # Not found in any scope: the name is a global.
+        expr.depth = None
+        expr.slot = self.interperter.global_slot(name.lexeme)
 
     def error(self, token: Token, message: str) -> RuntimeException:
         error = RuntimeException(token, message)
@@ -1,4 +1,5 @@
-from tokentype import TokenType, Token
+import re
+from tokentype import TokenType, Token, TokenArray
 
 class ScanError(Exception):
     def __init__(self, line: int, message: str):
@@ -28,8 +29,58 @@ class Scanner:
         "while": TokenType.WHILE
     }
 
-    def __init__(self, source: str) -> None:
+    operators = {
+        "(": TokenType.LEFT_PAREN,
+        ")": TokenType.RIGHT_PAREN,
+        "{": TokenType.LEFT_BRACE,
+        "}": TokenType.RIGHT_BRACE,
+        ",": TokenType.COMMA,
+        ".": TokenType.DOT,
+        "-": TokenType.MINUS,
+        "+": TokenType.PLUS,
+        ";": TokenType.SEMICOLON,
+        "*": TokenType.STAR,
+        "/": TokenType.SLASH,
+        "!": TokenType.BANG,
+        "!=": TokenType.BANG_EQUAL,
+        "=": TokenType.EQUAL,
+        "==": TokenType.EQUAL_EQUAL,
+        "<": TokenType.LESS,
+        "<=": TokenType.LESS_EQUAL,
+        ">": TokenType.GREATER,
+        ">=": TokenType.GREATER_EQUAL
+    }
+
+    # Master pattern for the fast path. It only covers ASCII lexemes; anything
+    # it does not match (block comments, unterminated strings, non-ASCII input,
+    # bad characters) is handed to scan_token(), which stays the reference.
+    token_pattern = re.compile(r"""
+        [ \t\r]*
+        (?:
+        (?P<identifier>[A-Za-z][A-Za-z0-9_]*)
+      | (?P<operator>[!=<>]=?|[(){},.\-+;*]|/(?![*/]))
+      | (?P<newline>\n)
+      | (?P<number>[0-9]+(?:\.[0-9]+)?)
+      | (?P<string>"[^"]*")
+      | (?P<comment>//[^\n]*)
+        )
+    """, re.VERBOSE)
+
+    # The same pattern over raw bytes, used when the source is a bytes-like
+    # buffer (e.g. a memory-mapped file) that is pure ASCII.
+    byte_pattern = re.compile(token_pattern.pattern.encode(), re.VERBOSE)
+    byte_keywords = {text.encode(): typ for text, typ in keywords.items()}
+    byte_operators = {text.encode(): typ for text, typ in operators.items()}
+    byte_space = re.compile(rb"[ \t\r]*")
+    byte_comment = re.compile(rb"\*/|/\*|\n")
+    non_ascii = re.compile(rb"[\x80-\xff]")
+
+    def __init__(self, source: str | bytes, fast: bool = False, encoding: str = "utf-8") -> None:
+        if not isinstance(source, str) and not (fast and self.is_ascii(source, encoding)):
+            source = str(source, encoding)
         self.source = source
+        self.fast = fast
+        self.encoding = encoding
         self.tokens: list[Token] = []
         self.errors: list[ScanError] = []
         self.line = 1
@@ -40,6 +91,8 @@ class Scanner:
         return self.current >= len(self.source)
 
     def scan_tokens(self):
+        if self.fast:
+            return self.scan_tokens_fast()
         try:
             while not self.is_at_end():
                 self.start = self.current
@@ -49,6 +102,190 @@ class Scanner:
         except ScanError:
             return self.tokens, self.errors
     
+    def iter_tokens(self):
+        tokens = self.fast_tokens() if self.fast else self.reference_tokens()
+        try:
+            yield from tokens
+        except ScanError:
+            yield Token(TokenType.EOF, "", None, self.line)
+
+    def reference_tokens(self):
+        while not self.is_at_end():
+            yield from self.reference_token(self.current, self.line)
+        yield Token(TokenType.EOF, "", None, self.line)
+
+    def scan_tokens_fast(self):
+        try:
+            self.tokens.extend(self.fast_tokens())
+        except ScanError:
+            pass
+        return self.tokens, self.errors
+
+    def is_ascii(self, source: bytes, encoding: str) -> bool:
+        try:
+            if bytes(range(128)).decode(encoding) != "".join(map(chr, range(128))):
+                return False
+        except (LookupError, UnicodeDecodeError):
+            return False
+        return self.non_ascii.search(source) is None
+
+    def fast_tokens(self):
+        source = self.source
+        decode = not isinstance(source, str)
+        for typ, start, end, line in self.fast_spans():
+            text = source[start:end]
+            if decode:
+                text = text.decode(self.encoding)
+            if typ is TokenType.NUMBER:
+                yield Token(typ, text, float(text), line)
+            elif typ is TokenType.STRING:
+                yield Token(typ, text, text[1:-1], line)
+            else:
+                yield Token(typ, text, None, line)
+
+    def scan_token_array(self):
+        tokens = TokenArray(self.source, self.encoding)
+        append = tokens.append
+        try:
+            for typ, start, end, line in self.fast_spans():
+                append(typ, start, end, line)
+        except ScanError:
+            pass
+        return tokens, self.errors
+
+    def fast_spans(self, pos: int = 0, line: int = 1):
+        if not isinstance(self.source, str):
+            return self.byte_spans(pos, line)
+        return self.text_spans(pos, line)
+
+    def text_spans(self, pos: int = 0, line: int = 1):
+        source = self.source
+        length = len(source)
+        match = self.token_pattern.match
+        keywords = self.keywords
+        operators = self.operators
+        while pos < length:
+            m = match(source, pos)
+            if m is not None:
+                kind = m.lastgroup
+                end = m.end()
+                text = m.group(kind)
+                if kind == "identifier":
+                    if end == length or source[end] < '\x80':
+                        yield keywords.get(text, TokenType.IDENTIFIER), end - len(text), end, line
+                        pos = end
+                        continue
+                elif kind == "operator":
+                    yield operators[text], end - len(text), end, line
+                    pos = end
+                    continue
+                elif kind == "newline":
+                    line += 1
+                    pos = end
+                    continue
+                elif kind == "number":
+                    if source[end:end + 1] < '\x80' and not (source[end:end + 1] == '.' and source[end + 1:end + 2] >= '\x80'):
+                        yield TokenType.NUMBER, end - len(text), end, line
+                        pos = end
+                        continue
+                elif kind == "string":
+                    line += text.count('\n')
+                    yield TokenType.STRING, end - len(text), end, line
+                    pos = end
+                    continue
+                else:
+                    pos = end
+                    continue
+                pos = end - len(text)
+            # Fall back to the reference scanner for a single lexeme.
+            for token in self.reference_token(pos, line):
+                yield token.type, self.start, self.current, self.line
+            pos = self.current
+            line = self.line
+        self.line = line
+        self.current = pos
+        yield TokenType.EOF, pos, pos, line
+
+    def byte_spans(self, pos: int = 0, line: int = 1):
+        source = self.source
+        length = len(source)
+        match = self.byte_pattern.match
+        keywords = self.byte_keywords
+        operators = self.byte_operators
+        while pos < length:
+            m = match(source, pos)
+            if m is None:
+                pos = self.byte_space.match(source, pos).end()
+                if pos == length:
+                    break
+                pos, line = self.byte_special(pos, line)
+                continue
+            kind = m.lastgroup
+            end = m.end()
+            text = m.group(kind)
+            if kind == "identifier":
+                yield keywords.get(text, TokenType.IDENTIFIER), end - len(text), end, line
+            elif kind == "operator":
+                yield operators[text], end - len(text), end, line
+            elif kind == "newline":
+                line += 1
+            elif kind == "number":
+                yield TokenType.NUMBER, end - len(text), end, line
+            elif kind == "string":
+                line += text.count(b'\n')
+                yield TokenType.STRING, end - len(text), end, line
+            pos = end
+        self.line = line
+        self.current = pos
+        yield TokenType.EOF, pos, pos, line
+
+    def byte_special(self, pos: int, line: int) -> tuple[int, int]:
+        source = self.source
+        self.line = line
+        char = source[pos:pos + 1]
+        if char == b'/':
+            depth = 1
+            for m in self.byte_comment.finditer(source, pos + 2):
+                delimiter = m.group()
+                if delimiter == b'\n':
+                    line += 1
+                elif delimiter == b'*/':
+                    depth -= 1
+                    # Like block_comment(), a comment closed at the very end
+                    # of the input is still reported as unterminated.
+                    if depth == 0 and m.end() < len(source):
+                        return m.end(), line
+                    if depth == 0:
+                        break
+                else:
+                    depth += 1
+            self.line = line
+            raise self.error("Unterminated block comment.")
+        if char == b'"':
+            self.line = line + source[pos:].count(b'\n')
+            raise self.error("Unterminated string.")
+        raise self.error("Unexpected character.")
+
+    def span_token(self, typ: TokenType, start: int, end: int, line: int) -> Token:
+        text = self.source[start:end]
+        if not isinstance(text, str):
+            text = text.decode(self.encoding)
+        if typ is TokenType.NUMBER:
+            return Token(typ, text, float(text), line)
+        if typ is TokenType.STRING:
+            return Token(typ, text, text[1:-1], line)
+        return Token(typ, text, None, line)
+
+    def reference_token(self, pos: int, line: int) -> list[Token]:
+        tokens, self.tokens = self.tokens, []
+        self.start = self.current = pos
+        self.line = line
+        try:
+            self.scan_token()
+            return self.tokens
+        finally:
+            self.tokens = tokens
+
     def scan_token(self) -> None:
         c = self.advance()
         match c:
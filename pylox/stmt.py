@@ -6,6 +6,7 @@ class StmtVisitor(Protocol):
     def visit_block_stmt(self, stmt: "StmtBlock") -> Any: ...
     def visit_class_stmt(self, stmt: "StmtClass") -> Any: ...
     def visit_expression_stmt(self, stmt: "StmtExpression") -> Any: ...
+    def visit_for_stmt(self, stmt: "StmtFor") -> Any: ...
     def visit_function_stmt(self, stmt: "StmtFunction") -> Any: ...
     def visit_if_stmt(self, stmt: "StmtIf") -> Any: ...
     def visit_print_stmt(self, stmt: "StmtPrint") -> Any: ...
@@ -14,42 +15,77 @@ class StmtVisitor(Protocol):
     def visit_while_stmt(self, stmt: "StmtWhile") -> Any: ...
 
 class Stmt:
+    __slots__ = ()
+
     def accept(self, visitor: StmtVisitor) -> Any:
         raise NotImplementedError("Method accept() must be realized")
 
 class StmtBlock(Stmt):
+    __slots__ = ("statements", "size")
+    __match_args__ = ("statements",)
+
     def __init__(self, statements: list[Stmt]) -> None:
         self.statements = statements
+        self.size: int = None
 
     def accept(self, visitor: StmtVisitor) -> Any:
         return visitor.visit_block_stmt(self)
 
 class StmtClass(Stmt):
+    __slots__ = ("name", "superclass", "methods", "slot")
+    __match_args__ = ("name", "superclass", "methods")
+
     def __init__(self, name: Token, superclass: 'ExprVariable', methods: list['StmtFunction']) -> None:
         self.name = name
         self.superclass = superclass
         self.methods = methods
+        self.slot: int = None
 
     def accept(self, visitor: StmtVisitor) -> Any:
         return visitor.visit_class_stmt(self)
 
 class StmtExpression(Stmt):
+    __slots__ = ("expression",)
+    __match_args__ = ("expression",)
+
     def __init__(self, expression: Expr) -> None:
         self.expression = expression
 
     def accept(self, visitor: StmtVisitor) -> Any:
         return visitor.visit_expression_stmt(self)
 
+class StmtFor(Stmt):
+    __slots__ = ("initializer", "condition", "increment", "body", "size")
+    __match_args__ = ("initializer", "condition", "increment", "body")
+
+    def __init__(self, initializer: Stmt, condition: Expr, increment: Expr, body: Stmt) -> None:
+        self.initializer = initializer
+        self.condition = condition
+        self.increment = increment
+        self.body = body
+        self.size: int = None
+
+    def accept(self, visitor: StmtVisitor) -> Any:
+        return visitor.visit_for_stmt(self)
+
 class StmtFunction(Stmt):
+    __slots__ = ("name", "parameters", "body", "slot", "size")
+    __match_args__ = ("name", "parameters", "body")
+
     def __init__(self, name: Token, parameters: list[Token], body: list[Stmt]) -> None:
         self.name = name
         self.parameters = parameters
         self.body = body
+        self.slot: int = None
+        self.size: int = None
 
     def accept(self, visitor: StmtVisitor) -> Any:
         return visitor.visit_function_stmt(self)
 
 class StmtIf(Stmt):
+    __slots__ = ("condition", "then_branch", "else_branch")
+    __match_args__ = ("condition", "then_branch", "else_branch")
+
     def __init__(self, condition: Expr, then_branch: Stmt, else_branch: Stmt) -> None:
         self.condition = condition
         self.then_branch = then_branch
@@ -59,6 +95,9 @@ class StmtIf(Stmt):
         return visitor.visit_if_stmt(self)
 
 class StmtPrint(Stmt):
+    __slots__ = ("expression",)
+    __match_args__ = ("expression",)
+
     def __init__(self, expression: Expr) -> None:
         self.expression = expression
 
@@ -66,22 +105,33 @@ class StmtPrint(Stmt):
         return visitor.visit_print_stmt(self)
 
 class StmtReturn(Stmt):
+    __slots__ = ("keyword", "value", "tail")
+    __match_args__ = ("keyword", "value")
+
     def __init__(self, keyword: Token, value: Expr) -> None:
         self.keyword = keyword
         self.value = value
+        self.tail: bool = None
 
     def accept(self, visitor: StmtVisitor) -> Any:
         return visitor.visit_return_stmt(self)
 
 class StmtVar(Stmt):
+    __slots__ = ("name", "initializer", "slot")
+    __match_args__ = ("name", "initializer")
+
     def __init__(self, name: Token, initializer: Expr) -> None:
         self.name = name
         self.initializer = initializer
+        self.slot: int = None
 
     def accept(self, visitor: StmtVisitor) -> Any:
         return visitor.visit_var_stmt(self)
 
 class StmtWhile(Stmt):
+    __slots__ = ("condition", "body")
+    __match_args__ = ("condition", "body")
+
     def __init__(self, condition: Expr, body: Stmt) -> None:
         self.condition = condition
         self.body = body
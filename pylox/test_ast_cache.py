@@ -0,0 +1,79 @@
+import unittest, io, pickle, tempfile
+import unittest.mock
+from pathlib import Path
+
+from ast_cache import AstCache
+from interpreter import Interpreter
+import pylox
+
+class TestAstCache(unittest.TestCase):
+    source = """fun make() {
+  var a = "closure";
+  fun f() { print a; }
+  return f;
+}
+{
+  var f = make();
+  f();
+}"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.script = Path(directory.name) / "script.lox"
+
+    def run_source(self, source: str, cache: AstCache) -> str:
+        output_buffer = io.StringIO()
+        with unittest.mock.patch('sys.stdout', new=output_buffer):
+            error = pylox.run(source, cache=cache)
+        self.assertIsNone(error)
+        return output_buffer.getvalue().strip()
+
+    def test_warm_run_skips_front_end(self):
+        cache = AstCache(str(self.script))
+        self.assertEqual(self.run_source(self.source, cache), "closure")
+        self.assertTrue(cache.path.exists())
+        with unittest.mock.patch('pylox.compile_program') as compile_program:
+            self.assertEqual(self.run_source(self.source, cache), "closure")
+        compile_program.assert_not_called()
+
+    def test_cached_program_is_resolved(self):
+        cache = AstCache(str(self.script))
+        key = cache.key(self.source)
+        self.run_source(self.source, cache)
+        statements, locals, names = cache.load(key)
+        self.assertEqual(len(statements), 2)
+        self.assertNotEqual(locals, {})
+        self.assertIn("make", names)
+
+    def test_changed_source_invalidates(self):
+        cache = AstCache(str(self.script))
+        self.run_source(self.source, cache)
+        changed = self.source.replace('"closure"', '"changed"')
+        self.assertIsNone(cache.load(cache.key(changed)))
+        self.assertEqual(self.run_source(changed, cache), "changed")
+        self.assertEqual(self.run_source(changed, cache), "changed")
+
+    def test_corrupt_entry_is_ignored(self):
+        cache = AstCache(str(self.script))
+        key = cache.key(self.source)
+        cache.path.parent.mkdir()
+        cache.path.write_bytes(b"LOXC" + key + b"garbage")
+        self.assertIsNone(cache.load(key))
+        self.assertEqual(self.run_source(self.source, cache), "closure")
+
+    def test_encoding_is_part_of_key(self):
+        cache = AstCache(str(self.script))
+        source = self.source.encode("utf-8")
+        self.assertNotEqual(cache.key(source, "utf-8"), cache.key(source, "latin-1"))
+        self.assertEqual(cache.key(source, "utf-8"), cache.key(self.source))
+
+    def test_inline_caches_are_not_stored(self):
+        source = 'class A { f() { return "f"; } }\nvar a = A();\nprint a.f;'
+        interpreter = Interpreter()
+        statements, _ = pylox.compile_program(source, "utf-8", interpreter)
+        with unittest.mock.patch('sys.stdout', new=io.StringIO()):
+            interpreter.interpret(statements)
+        self.assertIsNotNone(statements[2].expression.cache.klass)
+        loaded = pickle.loads(pickle.dumps(statements))
+        self.assertIsNone(loaded[2].expression.cache.klass)
@@ -0,0 +1,12 @@
+import unittest
+import unittest.mock
+
+import test_interpreter
+from closure_compiler import ClosureInterpreter
+
+class TestClosureInterpreter(test_interpreter.TestInterpreter):
+    # Runs every interpreter test again on the closure-compiling engine.
+    def setUp(self):
+        patcher = unittest.mock.patch.object(test_interpreter, "Interpreter", ClosureInterpreter)
+        patcher.start()
+        self.addCleanup(patcher.stop)
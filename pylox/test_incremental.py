@@ -0,0 +1,98 @@
+import unittest, io
+import unittest.mock
+
+from incremental import IncrementalFrontEnd
+from interpreter import Interpreter
+
+class TestIncremental(unittest.TestCase):
+    source = """fun add(a, b) {
+  var sum = a + b;
+  return sum;
+}
+/* helpers
+   end here */
+fun twice(x) {
+  return add(x, x);
+}
+print twice(2);
+"""
+
+    def run_session(self, session: IncrementalFrontEnd) -> str:
+        output_buffer = io.StringIO()
+        with unittest.mock.patch('sys.stdout', new=output_buffer):
+            interpreter = Interpreter()
+            interpreter.locals.update(session.locals)
+            interpreter.globals.adopt(session.globals.names)
+            _, errors = interpreter.interpret(session.statements)
+        self.assertEqual(errors, [])
+        return output_buffer.getvalue().strip()
+
+    def test_edit_reuses_statements(self):
+        session = IncrementalFrontEnd(self.source)
+        self.assertEqual(session.errors, [])
+        self.assertEqual(self.run_session(session), "4")
+        add, twice, call = session.statements
+        start = self.source.index("twice(2)") + len("twice(")
+        errors = session.edit(start, start + 1, "21")
+        self.assertEqual(errors, [])
+        self.assertEqual(session.reparsed, 1)
+        self.assertIs(session.statements[0], add)
+        self.assertIs(session.statements[1], twice)
+        self.assertIsNot(session.statements[2], call)
+        self.assertEqual(self.run_session(session), "42")
+
+    def test_update_shifts_lines(self):
+        session = IncrementalFrontEnd(self.source)
+        twice = session.statements[1]
+        errors = session.update("\n\n" + self.source.replace("a + b", "a * b"))
+        self.assertEqual(errors, [])
+        self.assertIs(session.statements[1], twice)
+        self.assertEqual(twice.name.line, 9)
+        self.assertEqual(self.run_session(session), "4")
+
+    def test_broken_edit_recovers(self):
+        session = IncrementalFrontEnd(self.source)
+        start = self.source.index("/* helpers")
+        errors = session.edit(start, start + 2, "")
+        self.assertNotEqual(errors, [])
+        self.assertFalse(session.valid)
+        errors = session.update(self.source.replace("twice(2)", "twice(5)"))
+        self.assertEqual(errors, [])
+        self.assertEqual(self.run_session(session), "10")
+
+    def test_resolver_errors(self):
+        session = IncrementalFrontEnd(self.source)
+        errors = session.update(self.source + "return 1;\n")
+        self.assertEqual(errors[-1].message, "Can't return from top-level code.")
+        self.assertEqual(session.reparsed, 2)
+        errors = session.update(self.source)
+        self.assertEqual(errors, [])
+
+    def test_edit_moves_later_statements(self):
+        session = IncrementalFrontEnd(self.source)
+        twice, call = session.statements[1], session.statements[2]
+        token = call.expression.callee.name
+        errors = session.edit(0, 0, "\n\n\n")
+        self.assertEqual(errors, [])
+        self.assertEqual(session.relexed, 0)
+        self.assertEqual(session.reparsed, 0)
+        self.assertIs(session.statements[2], call)
+        self.assertIs(call.expression.callee.name, token)
+        self.assertEqual(token.line, 13)
+        self.assertEqual(twice.name.line, 10)
+        start = session.source.index("print") + 3
+        errors = session.edit(start, start + 2, "nt twice(3);\nprint")
+        self.assertEqual(errors, [])
+        self.assertEqual(session.statements[3].expression.callee.name.line, 14)
+        self.assertEqual(self.run_session(session), "6\n4")
+
+    def test_edit_reports_shifted_lines(self):
+        session = IncrementalFrontEnd("print 1;\nprint 2;\n")
+        errors = session.edit(0, 0, "print\n\n")
+        fresh = IncrementalFrontEnd(session.source)
+        self.assertEqual([error.report() for error in errors], [error.report() for error in fresh.errors])
+        self.assertEqual(errors[0].token.line, 3)
+        session = IncrementalFrontEnd("print 1;\nprint 2 + 3;\n")
+        start = session.source.index("2 +")
+        errors = session.edit(start, start, "\n\n;")
+        self.assertEqual(errors[0].report(), "Parse error at ';' [line 4]: Expect expression.\n")
@@ -5,6 +5,7 @@ from scanner import Scanner
 from parser import *
 from interpreter import *
 from resolver import *
+import operators
 
 class TestInterpreter(unittest.TestCase):
     def test_interpret(self):
@@ -156,6 +157,34 @@ for (var b = 1; a < 100; b = temp + b) {
         self.assertEqual(output, expected)
         self.assertEqual(errors, [])
 
+    def test_for_closures(self):
+        source = """var first;
+var last;
+for (var i = 0; i < 3; i = i + 1) {
+  var j = i;
+  fun f() { return i + j * 10; }
+  if (first == nil) first = f;
+  last = f;
+}
+print first();
+print last();
+var k = 0;
+for (; k < 2;) k = k + 1;
+print k;"""
+        tokens, scan_errors = Scanner(source).scan_tokens()
+        self.assertEqual(scan_errors, [])
+        statements, parse_errors = Parser(tokens).parse()
+        self.assertEqual(parse_errors, [])
+        self.assertIsInstance(statements[2], StmtFor)
+        interpreter = Interpreter()
+        resolver_errors = Resolver(interpreter).resolve_list(statements)
+        self.assertEqual(resolver_errors, [])
+        output_buffer = io.StringIO()
+        with unittest.mock.patch('sys.stdout', new=output_buffer):
+            _, errors = interpreter.interpret(statements)
+        self.assertEqual(output_buffer.getvalue().split(), ["3", "23", "2"])
+        self.assertEqual(errors, [])
+
     def test_resolver(self):
         source = """var a = "global";
 {
@@ -185,6 +214,89 @@ showA();
 global"""
         self.assertEqual(output, expected)
         self.assertEqual(errors, [])
+        global_read = statements[1].statements[0].body[0].expression
+        self.assertIsNone(global_read.depth)
+        self.assertNotIn(global_read, interpreter.locals)
+
+    def test_resolver_slots(self):
+        source = """{
+  var a = 1;
+  fun f(x, y) { return y + a; }
+  var b = a;
+  b = f(1, 2);
+}"""
+        tokens, scan_errors = Scanner(source).scan_tokens()
+        self.assertEqual(scan_errors, [])
+        statements, parse_errors = Parser(tokens).parse()
+        self.assertEqual(parse_errors, [])
+        interpreter = Interpreter()
+        self.assertEqual(Resolver(interpreter).resolve_list(statements), [])
+        block = statements[0].statements
+        body = block[1].body[0].value
+        self.assertEqual(interpreter.locals[body.left], (0, 1))
+        self.assertEqual(interpreter.locals[body.right], (1, 0))
+        self.assertEqual(interpreter.locals[block[2].initializer], (0, 0))
+        self.assertEqual(interpreter.locals[block[3].expression], (0, 2))
+        self.assertEqual(interpreter.locals[block[3].expression.value.callee], (0, 1))
+        self.assertEqual((body.left.depth, body.left.slot), (0, 1))
+        self.assertEqual((body.right.depth, body.right.slot), (1, 0))
+        self.assertEqual((block[3].expression.depth, block[3].expression.slot), (0, 2))
+        interpreter.interpret(statements)
+        self.assertEqual(interpreter.errors, [])
+
+    def test_resolver_escape(self):
+        source = """fun f(n) {
+  { var a = n; print a; }
+  { var b = n; var c = b; print c; }
+  for (var i = 0; i < n; i = i + 1) {
+    var d = i;
+    fun g() { return d; }
+    print g();
+  }
+  {}
+}
+f(2);"""
+        tokens, scan_errors = Scanner(source).scan_tokens()
+        self.assertEqual(scan_errors, [])
+        statements, parse_errors = Parser(tokens).parse()
+        self.assertEqual(parse_errors, [])
+        interpreter = Interpreter()
+        self.assertEqual(Resolver(interpreter).resolve_list(statements), [])
+        function = statements[0]
+        first, second, loop, empty = function.body
+        self.assertEqual((first.size, second.size, loop.size, empty.size), (None, None, None, None))
+        self.assertEqual(loop.body.size, 2)
+        self.assertEqual(function.size, 3)
+        self.assertEqual((first.statements[0].slot, second.statements[1].slot, loop.initializer.slot), (1, 2, 1))
+        self.assertEqual(interpreter.locals[loop.body.statements[1].body[0].value], (1, 0))
+        output_buffer = io.StringIO()
+        with unittest.mock.patch('sys.stdout', new=output_buffer):
+            interpreter.interpret(statements)
+        self.assertEqual(output_buffer.getvalue().split(), ["2", "2", "0", "1"])
+        self.assertEqual(interpreter.errors, [])
+
+    def test_global_slots(self):
+        source = """fun get() { return late; }
+var late = 1;
+print get();
+late = late + 1;
+print get();
+print missing;
+print "unreachable";"""
+        tokens, scan_errors = Scanner(source).scan_tokens()
+        self.assertEqual(scan_errors, [])
+        statements, parse_errors = Parser(tokens).parse()
+        self.assertEqual(parse_errors, [])
+        interpreter = Interpreter()
+        self.assertEqual(Resolver(interpreter).resolve_list(statements), [])
+        read = statements[0].body[0].value
+        self.assertIsNone(read.depth)
+        self.assertEqual(read.slot, interpreter.globals.names["late"])
+        self.assertEqual(statements[1].slot, read.slot)
+        output_buffer = io.StringIO()
+        with unittest.mock.patch('sys.stdout', new=output_buffer):
+            interpreter.interpret(statements)
+        self.assertEqual(output_buffer.getvalue().split(), ["1", "2"])
 
     def test_return_in_global(self):
         source = """var a = "global";
@@ -300,4 +412,168 @@ C().test();"""
         expected = "A method"
         self.assertEqual(output, expected)
         self.assertEqual(errors, [])
-        
\ No newline at end of file
+        
+    def test_runtime_errors(self):
+        source = """print 1 + 2 * 3 >= 7;
+print -"a";"""
+        scanner = Scanner(source)
+        tokens, scan_errors = scanner.scan_tokens()
+        parser = Parser(tokens)
+        statements, parse_errors = parser.parse()
+        interpreter = Interpreter()
+        resolver = Resolver(interpreter)
+        resolver_errors = resolver.resolve_list(statements)
+        self.assertEqual(resolver_errors, [])
+        self.assertIs(statements[0].expression.handler, operators.greater_equal)
+        output_buffer = io.StringIO()
+        with unittest.mock.patch('sys.stdout', new=output_buffer):
+            _, errors = interpreter.interpret(statements)
+        self.assertEqual(output_buffer.getvalue().strip(), "true")
+        self.assertEqual(errors[0].report(), "Runtime error at '-' [line 2]: Operand must be a number.\n")
+        with unittest.mock.patch('sys.stdout', new=io.StringIO()):
+            _, errors = Interpreter().interpret(Parser(Scanner("print missing;").scan_tokens()[0]).parse()[0])
+        self.assertEqual(errors[0].message, "Undefined variable 'missing'.")
+
+    def test_return_from_loops(self):
+        source = """fun find(limit) {
+  for (var i = 0; i < limit; i = i + 1) {
+    var j = 0;
+    while (j <= i) {
+      if (i * j == 6) { return i; }
+      j = j + 1;
+    }
+  }
+  print "not reached";
+}
+class A { init() { return; } }
+print find(10);
+print A();"""
+        scanner = Scanner(source)
+        tokens, scan_errors = scanner.scan_tokens()
+        parser = Parser(tokens)
+        statements, parse_errors = parser.parse()
+        interpreter = Interpreter()
+        resolver = Resolver(interpreter)
+        resolver_errors = resolver.resolve_list(statements)
+        self.assertEqual(resolver_errors, [])
+        output_buffer = io.StringIO()
+        with unittest.mock.patch('sys.stdout', new=output_buffer):
+            _, errors = interpreter.interpret(statements)
+        self.assertEqual(output_buffer.getvalue().strip().split("\n"), ["3", "A instance"])
+        self.assertEqual(errors, [])
+
+    def test_property_cache(self):
+        source = """class A { f() { return "A"; } }
+class B < A { f() { return "B"; } }
+fun call(o) { return o.f(); }
+class C < B {}
+print call(A()); print call(B()); print call(C());
+var a = A();
+fun g() { return "field"; }
+a.f = g;
+print call(a);"""
+        scanner = Scanner(source)
+        tokens, scan_errors = scanner.scan_tokens()
+        parser = Parser(tokens)
+        statements, parse_errors = parser.parse()
+        interpreter = Interpreter()
+        resolver = Resolver(interpreter)
+        resolver_errors = resolver.resolve_list(statements)
+        self.assertEqual(resolver_errors, [])
+        output_buffer = io.StringIO()
+        with unittest.mock.patch('sys.stdout', new=output_buffer):
+            _, errors = interpreter.interpret(statements)
+        self.assertEqual(output_buffer.getvalue().strip().split("\n"), ["A", "B", "B", "field"])
+        self.assertEqual(errors, [])
+
+    def test_flattened_methods(self):
+        source = """class A { init(a, b) {} f() {} }
+class B < A { g() {} }
+class C < B { f() {} }"""
+        scanner = Scanner(source)
+        tokens, scan_errors = scanner.scan_tokens()
+        parser = Parser(tokens)
+        statements, parse_errors = parser.parse()
+        interpreter = Interpreter()
+        resolver = Resolver(interpreter)
+        resolver.resolve_list(statements)
+        interpreter.interpret(statements)
+        a, b, c = (interpreter.globals.values[interpreter.global_slot(name)] for name in "ABC")
+        self.assertEqual(sorted(c.methods), ["f", "g", "init"])
+        self.assertIs(c.find_method("g"), b.methods["g"])
+        self.assertIsNot(c.find_method("f"), a.methods["f"])
+        self.assertIs(c.initializer, a.initializer)
+        self.assertEqual(c.arity(), 2)
+
+    def test_invoke(self):
+        source = """class A { init(n) { this.n = n; } get() { return this.n; } }
+class B < A { get() { return super.get() + 1; } }
+var b = B(1);
+var m = b.get;
+print m(); print b.get(); print m;
+print b.init(5).get();"""
+        scanner = Scanner(source)
+        tokens, scan_errors = scanner.scan_tokens()
+        parser = Parser(tokens)
+        statements, parse_errors = parser.parse()
+        interpreter = Interpreter()
+        resolver = Resolver(interpreter)
+        resolver_errors = resolver.resolve_list(statements)
+        self.assertEqual(resolver_errors, [])
+        this = statements[0].methods[1].body[0].value.object
+        self.assertEqual((this.depth, this.slot), (0, 0))
+        self.assertEqual(statements[0].methods[0].size, 2)
+        output_buffer = io.StringIO()
+        with unittest.mock.patch('sys.stdout', new=output_buffer):
+            _, errors = interpreter.interpret(statements)
+        self.assertEqual(output_buffer.getvalue().strip().split("\n"), ["2", "2", "function get", "6"])
+        self.assertEqual(errors, [])
+
+    def test_instance_shapes(self):
+        source = """class P { init(x, y) { this.x = x; this.y = y; } }
+var a = P(1, 2); var b = P(3, 4);
+var c = P(5, 6); c.z = 7; c.x = 8;
+var d = P(0, 0); d.z = 1;
+print c.x + c.y + c.z;"""
+        scanner = Scanner(source)
+        tokens, scan_errors = scanner.scan_tokens()
+        parser = Parser(tokens)
+        statements, parse_errors = parser.parse()
+        interpreter = Interpreter()
+        resolver = Resolver(interpreter)
+        resolver.resolve_list(statements)
+        output_buffer = io.StringIO()
+        with unittest.mock.patch('sys.stdout', new=output_buffer):
+            _, errors = interpreter.interpret(statements)
+        self.assertEqual(output_buffer.getvalue().strip(), "21")
+        a, b, c, d = (interpreter.globals.values[interpreter.global_slot(name)] for name in "abcd")
+        self.assertIs(a.shape, b.shape)
+        self.assertEqual(dict(a.shape), {"x": 0, "y": 1})
+        self.assertIsNot(c.shape, a.shape)
+        self.assertIs(c.shape, d.shape)
+        self.assertEqual(c.values, [8.0, 6.0, 7.0])
+
+    def test_tail_calls(self):
+        source = """fun count(n, total) { if (n == 0) return total; return count(n - 1, total + 1); }
+fun even(n) { if (n == 0) return true; return odd(n - 1); }
+fun odd(n) { if (n == 0) return false; return even(n - 1); }
+class Walker { walk(n) { if (n == 0) return "done"; return this.walk(n - 1); } }
+fun now() { return clock(); }
+print count(100000, 0);
+print even(20001);
+print Walker().walk(20000);
+print now() > 0;
+count(1);"""
+        scanner = Scanner(source)
+        tokens, scan_errors = scanner.scan_tokens()
+        parser = Parser(tokens)
+        statements, parse_errors = parser.parse()
+        interpreter = Interpreter()
+        resolver = Resolver(interpreter)
+        resolver.resolve_list(statements)
+        self.assertTrue(all(stmt.tail for stmt in statements[0].body[1:]))
+        output_buffer = io.StringIO()
+        with unittest.mock.patch('sys.stdout', new=output_buffer):
+            _, errors = interpreter.interpret(statements)
+        self.assertEqual(output_buffer.getvalue().strip().split("\n"), ["100000", "false", "done", "true"])
+        self.assertEqual([error.message for error in errors], ["Expected 2 arguments but got 1."])
@@ -0,0 +1,83 @@
+import unittest, io
+import unittest.mock
+
+from scanner import Scanner
+from parser import *
+from interpreter import *
+from resolver import *
+from optimizer import Optimizer
+
+class TestOptimizer(unittest.TestCase):
+    def compile(self, source: str):
+        tokens, scan_errors = Scanner(source).scan_tokens()
+        self.assertEqual(scan_errors, [])
+        statements, parse_errors = Parser(tokens).parse()
+        self.assertEqual(parse_errors, [])
+        interpreter = Interpreter()
+        resolver_errors = Resolver(interpreter).resolve_list(statements)
+        self.assertEqual(resolver_errors, [])
+        return interpreter, statements
+
+    def run_program(self, source: str, optimize: bool):
+        interpreter, statements = self.compile(source)
+        if optimize:
+            statements = Optimizer(interpreter).optimize(statements)
+        output_buffer = io.StringIO()
+        with unittest.mock.patch('sys.stdout', new=output_buffer):
+            _, errors = interpreter.interpret(statements)
+        return output_buffer.getvalue(), [error.report() for error in errors]
+
+    def test_folds_constants(self):
+        interpreter, statements = self.compile('print (1 + 2) * 3 > 8 == !nil;\nprint "a" + "b";\nprint nil or "x";')
+        Optimizer(interpreter).optimize(statements)
+        self.assertEqual([s.expression.value for s in statements], [True, "ab", "x"])
+        for statement in statements:
+            self.assertIsInstance(statement.expression, ExprLiteral)
+
+    def test_keeps_type_errors(self):
+        interpreter, statements = self.compile('print 1 - "a";\nprint -"b";\nprint 1 / 0 or 2;')
+        Optimizer(interpreter).optimize(statements)
+        for statement in statements:
+            self.assertNotIsInstance(statement.expression, ExprLiteral)
+        output, errors = self.run_program('print 2 + 2;\nprint 1 + "a";', True)
+        self.assertEqual(output, "4\n")
+        self.assertEqual(errors, self.run_program('print 2 + 2;\nprint 1 + "a";', False)[1])
+
+    def test_propagates_unassigned_locals(self):
+        source = """{
+  var a = 2 * 3;
+  var b = 1;
+  b = b + a;
+  print a + b;
+}"""
+        interpreter, statements = self.compile(source)
+        Optimizer(interpreter).optimize(statements)
+        block = statements[0].statements
+        self.assertIsInstance(block[3].expression, ExprBinary)
+        self.assertEqual(block[3].expression.left.value, 6.0)
+        self.assertIsInstance(block[3].expression.right, ExprVariable)
+
+    def test_same_output(self):
+        source = """var g = 1;
+fun counter() {
+  var step = 2;
+  var count = 0;
+  fun next() {
+    count = count + step;
+    return count;
+  }
+  return next;
+}
+var c = counter();
+c();
+print c() + g;
+class A { value() { var v = "A" + "!"; return v; } }
+print A().value();
+{
+  var x = 5;
+  fun shadow() { var x = "inner"; return x; }
+  print shadow() + " " + "outer";
+  print x * 2;
+}
+print g == 1 and "yes";"""
+        self.assertEqual(self.run_program(source, False), self.run_program(source, True))
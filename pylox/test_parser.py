@@ -88,4 +88,69 @@ class TestParser(unittest.TestCase):
         parser = Parser(tokens)
         pr_expr, errors = parser.parse()
         self.assertEqual(pr_expr, [None])
-        self.assertIn(errors[0].message, "Expect ')' after expression.")
\ No newline at end of file
+        self.assertIn(errors[0].message, "Expect ')' after expression.")
+
+    def test_token_stream(self):
+        source = "(5-3)* -2 == 4;\nprint 1 + 2;\n"
+        tokens, _ = Scanner(source).scan_tokens()
+        statements, errors = Parser(tokens).parse()
+        parser = Parser(Scanner(source, fast=True).iter_tokens())
+        stream_statements, stream_errors = parser.parse()
+        printer = AstPrinter()
+        self.assertEqual([printer.print(s.expression) for s in statements],
+                         [printer.print(s.expression) for s in stream_statements])
+        self.assertEqual(errors, stream_errors)
+        self.assertLessEqual(len(parser.tokens.buffer), 2)
+
+    def test_token_stream_error(self):
+        parser = Parser(Scanner("(3-4").iter_tokens())
+        pr_expr, errors = parser.parse()
+        self.assertEqual(pr_expr, [None])
+        self.assertIn(errors[0].message, "Expect ')' after expression.")
+
+    def test_token_array(self):
+        source = "(5-3)* -2 == 4;\nprint 1 + 2;\n"
+        tokens, _ = Scanner(source).scan_tokens()
+        statements, errors = Parser(tokens).parse()
+        array, _ = Scanner(source).scan_token_array()
+        array_statements, array_errors = Parser(array).parse()
+        printer = AstPrinter()
+        self.assertEqual([printer.print(s.expression) for s in statements],
+                         [printer.print(s.expression) for s in array_statements])
+        self.assertEqual(errors, array_errors)
+
+    def test_pratt_matches_recursive_descent(self):
+        sources = [
+            "(5-3)* -2 == 4;",
+            "a = b.c = !d or e and f != g <= h + i * -j;",
+            "print f(a, b)(c).d.e(1 + 2) / 3;",
+            "a + b = c;",
+            "var x = (1;",
+        ]
+        printer = AstPrinter()
+        for source in sources:
+            tokens, _ = Scanner(source).scan_tokens()
+            statements, errors = Parser(tokens).parse()
+            pratt_statements, pratt_errors = Parser(tokens, pratt=True).parse()
+            self.assertEqual([e.message for e in errors], [e.message for e in pratt_errors])
+            self.assertEqual(self.dump(statements), self.dump(pratt_statements))
+
+    def test_logical_precedence(self):
+        tokens, _ = Scanner("a or b and c;").scan_tokens()
+        for pratt in (False, True):
+            statements, errors = Parser(tokens, pratt).parse()
+            self.assertEqual(errors, [])
+            expr = statements[0].expression
+            self.assertIsInstance(expr, ExprLogical)
+            self.assertEqual(expr.operator.type, TokenType.OR)
+            self.assertEqual(expr.right.operator.type, TokenType.AND)
+
+    def dump(self, node):
+        if isinstance(node, list):
+            return [self.dump(item) for item in node]
+        if isinstance(node, Token):
+            return (node.type, node.lexeme, node.line)
+        if isinstance(node, (Expr, Stmt)):
+            return (type(node).__name__, {name: self.dump(getattr(node, name)) for name in node.__slots__})
+        return node
+
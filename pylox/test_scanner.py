@@ -1,4 +1,4 @@
-import unittest
+import unittest, mmap, tempfile
 
 from scanner import *
 
@@ -88,5 +88,74 @@ class TestScanner(unittest.TestCase):
         self.assertIn("Unterminated block comment.", errors[0].message)
         self.assertEqual(1, len(errors))
 
+    def test_fast_matches_reference(self):
+        sources = [
+            "var a = 1.5;\nprint a >= 2 != !b;",
+            "fun f(x_1) { return x_1 / 2.; } // done",
+            "/* outer /* inner */\n */ print \"multi\nline\";",
+            "var caf\u00e9 = 3; var _x = 1;",
+            "print \"unterminated\n",
+            "@",
+        ]
+        for source in sources:
+            tokens, errors = Scanner(source).scan_tokens()
+            fast_tokens, fast_errors = Scanner(source, fast=True).scan_tokens()
+            self.assertEqual(tokens, fast_tokens)
+            self.assertEqual([t.line for t in tokens], [t.line for t in fast_tokens])
+            self.assertEqual([(e.line, e.message) for e in errors],
+                             [(e.line, e.message) for e in fast_errors])
+
+    def test_iter_tokens(self):
+        source = "var a = 1;\n/* note */ print a + \"b\";"
+        for fast in (False, True):
+            tokens, _ = Scanner(source, fast).scan_tokens()
+            self.assertEqual(tokens, list(Scanner(source, fast).iter_tokens()))
+
+    def test_iter_tokens_stops_at_error(self):
+        scanner = Scanner("print 1; @ print 2;")
+        tokens = list(scanner.iter_tokens())
+        self.assertEqual(TokenType.EOF, tokens[-1].type)
+        self.assertEqual(4, len(tokens))
+        self.assertEqual("Unexpected character.", scanner.errors[0].message)
+
+    def test_token_array(self):
+        source = "var a = 1.5;\nprint \"two\nlines\" + a;"
+        tokens, _ = Scanner(source).scan_tokens()
+        array, errors = Scanner(source).scan_token_array()
+        self.assertEqual([], errors)
+        self.assertEqual(len(tokens), len(array))
+        self.assertEqual(tokens, list(array))
+        self.assertEqual([t.line for t in tokens], [t.line for t in array])
+        self.assertEqual('"two\nlines"', array.lexeme(6))
+        self.assertEqual(1.5, array.literal(3))
+
+    def test_bytes_source(self):
+        sources = [
+            "var a = 1.5;\n/* a /* nested */ comment */ print a >= 2;",
+            "print \"multi\nline\"; // trailing",
+            "print \"unterminated\n",
+            "var _x = 1;",
+            "print \"caf\u00e9\";",
+        ]
+        for source in sources:
+            tokens, errors = Scanner(source).scan_tokens()
+            byte_tokens, byte_errors = Scanner(source.encode(), fast=True).scan_tokens()
+            self.assertEqual(tokens, byte_tokens)
+            self.assertEqual([t.line for t in tokens], [t.line for t in byte_tokens])
+            self.assertEqual([(e.line, e.message) for e in errors],
+                             [(e.line, e.message) for e in byte_errors])
+
+    def test_mapped_source(self):
+        source = "var a = \"mapped\";\nprint a;\n"
+        with tempfile.TemporaryFile() as f:
+            f.write(source.encode())
+            f.flush()
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                scanner = Scanner(mapped, fast=True)
+                self.assertIs(mapped, scanner.source)
+                tokens, errors = scanner.scan_tokens()
+                array, _ = Scanner(mapped, fast=True).scan_token_array()
+                self.assertEqual(tokens, list(array))
+        self.assertEqual(Scanner(source).scan_tokens()[0], tokens)
+        self.assertEqual([], errors)
 
-    
\ No newline at end of file
@@ -0,0 +1,93 @@
+import unittest, io
+import unittest.mock
+
+from scanner import Scanner
+from parser import Parser
+from interpreter import Interpreter
+from resolver import Resolver
+from environment import RuntimeException
+from transpiler import Transpiler
+
+class TestTranspiler(unittest.TestCase):
+    def compile(self, source: str) -> dict:
+        tokens, _ = Scanner(source).scan_tokens()
+        statements, _ = Parser(tokens).parse()
+        Resolver(Interpreter()).resolve_list(statements)
+        module = {}
+        exec(Transpiler().transpile(statements), module)
+        return module
+
+    def run_source(self, source: str) -> str:
+        module = self.compile(source)
+        output_buffer = io.StringIO()
+        with unittest.mock.patch('sys.stdout', new=output_buffer):
+            module["main"]()
+        return output_buffer.getvalue()
+
+    def test_transpile(self):
+        source = """
+        fun counter() {
+            var n = 0;
+            fun inc() { n = n + 1; return n; }
+            return inc;
+        }
+        var c = counter();
+        c(); print c();
+        var fs = nil;
+        for (var i = 0; i < 3; i = i + 1) {
+            var j = i;
+            fun f() { return j; }
+            if (i == 1) fs = f;
+        }
+        print fs();
+        class A { init(x) { this.x = x; } get() { return this.x; } }
+        class B < A { get() { return super.get() * 2; } }
+        var b = B(1.5);
+        print b.get();
+        print b.init(4).x;
+        print "a" + "b";
+        print nil == false;
+        print !0 or "yes";
+        print 10 / 4;
+        print B;
+        print counter;
+        """
+        self.assertEqual(self.run_source(source).split("\n"),
+                         ["2", "1", "3", "4", "ab", "false", "yes", "2.5", "B", "function counter", ""])
+
+    def test_runtime_error(self):
+        module = self.compile("var a = 1;\nprint a;\nprint a + \"x\";")
+        with unittest.mock.patch('sys.stdout', new=io.StringIO()):
+            with self.assertRaises(RuntimeException) as raised:
+                module["main"]()
+        self.assertEqual(raised.exception.report(),
+                         "Runtime error at '+' [line 3]: Operand must be two numbers or two strings.\n")
+
+    def test_deep_recursion(self):
+        module = self.compile("""class C { d(n) { if (n == 0) return 0; return this.d(n - 1) + 1; } }
+print C().d(20000);""")
+        output_buffer = io.StringIO()
+        with unittest.mock.patch('sys.stdout', new=output_buffer):
+            module["run"](module["main"])
+        self.assertEqual(output_buffer.getvalue(), "20000\n")
+        for source, line in (("fun f() { f(); }\nf();", 1),
+                             ("class C {\n  d() {\n    return this.d(\n    );\n  }\n}\nC().d();", 4)):
+            module = self.compile(source)
+            error_buffer = io.StringIO()
+            with unittest.mock.patch('sys.stderr', new=error_buffer):
+                with self.assertRaises(SystemExit) as raised:
+                    module["run"](module["main"], module["CALL_LINES"])
+            self.assertEqual(raised.exception.code, 70)
+            self.assertEqual(error_buffer.getvalue(), f"Runtime error at ')' [line {line}]: Stack overflow.\n")
+
+    def test_nested_calls(self):
+        argument = "1"
+        for _ in range(30):
+            argument = f"f({argument}, g())"
+        source = f"fun f(a, b) {{ return a + b; }}\nfun g() {{ return 1; }}\nprint {argument};"
+        tokens, _ = Scanner(source).scan_tokens()
+        statements, _ = Parser(tokens).parse()
+        Resolver(Interpreter()).resolve_list(statements)
+        code = Transpiler().transpile(statements)
+        self.assertLess(len(code), 20000)
+        self.assertEqual(self.run_source(source), "31\n")
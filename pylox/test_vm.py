@@ -0,0 +1,160 @@
+import unittest, io
+import unittest.mock
+
+from scanner import Scanner
+from parser import Parser
+from resolver import Resolver
+from compiler import Compiler
+from debug import disassemble_chunk
+from vm import VMInterpreter, FRAMES_MAX
+import pylox
+
+class TestVM(unittest.TestCase):
+    def parse(self, source: str) -> list:
+        tokens, _ = Scanner(source).scan_tokens()
+        statements, _ = Parser(tokens).parse()
+        return statements
+
+    def run_source(self, source: str, max_depth: int = FRAMES_MAX) -> tuple[str, list]:
+        statements = self.parse(source)
+        interpreter = VMInterpreter(max_depth)
+        Resolver(interpreter).resolve_list(statements)
+        output_buffer = io.StringIO()
+        with unittest.mock.patch('sys.stdout', new=output_buffer):
+            _, errors = interpreter.interpret(statements)
+        return output_buffer.getvalue(), errors
+
+    def test_vm(self):
+        source = """
+        fun counter() {
+            var n = 0;
+            fun inc() { n = n + 1; return n; }
+            return inc;
+        }
+        var c = counter();
+        c(); print c();
+        var fs = nil;
+        for (var i = 0; i < 3; i = i + 1) {
+            var j = i;
+            fun f() { return j; }
+            if (i == 1) fs = f;
+        }
+        print fs();
+        fun fib(n) { if (n < 2) return n; return fib(n - 1) + fib(n - 2); }
+        print fib(10);
+        print nil or "a" + "b";
+        print 2 >= 2 and 1 != 1;
+        print 10 / 4;
+        print counter;
+        """
+        output, errors = self.run_source(source)
+        self.assertEqual(errors, [])
+        self.assertEqual(output.split("\n"), ["2", "1", "55", "ab", "false", "2.5", "function counter", ""])
+
+    def test_runtime_errors(self):
+        output, errors = self.run_source("print 1;\nprint -\"x\";")
+        self.assertEqual(output, "1\n")
+        self.assertEqual(errors[0].report(), "Runtime error at '-' [line 2]: Operand must be a number.\n")
+        _, errors = self.run_source("fun f() { f(); }\nf();", 64)
+        self.assertEqual(errors[0].message, "Stack overflow.")
+        _, errors = self.run_source("class A { f(x) {} }\nA().f();")
+        self.assertEqual(errors[0].report(), "Runtime error at ')' [line 2]: Expected 1 arguments but got 0.\n")
+        _, errors = self.run_source("class A {}\nA().f();")
+        self.assertEqual(errors[0].report(), "Runtime error at 'f' [line 2]: Undefined property 'f'.\n")
+
+    def test_classes(self):
+        source = """
+        class A {
+            init(name) { this.name = name; }
+            greet() { return "hi " + this.name; }
+            getter() { fun get() { return this.name; } return get; }
+        }
+        class B < A {
+            init(name) { super.init(name + "!"); }
+            greet() { var base = super.greet; return base() + "?"; }
+        }
+        var b = B("b");
+        print b.greet();
+        print b.getter()();
+        b.greet = A("field").getter();
+        print b.greet();
+        print b.init("again").name;
+        print B;
+        """
+        output, errors = self.run_source(source)
+        self.assertEqual(errors, [])
+        self.assertEqual(output.split("\n"), ["hi b!?", "b!", "field", "again!", "B", ""])
+
+    def test_deep_recursion(self):
+        source = "fun depth(n) { if (n == 0) return 0; return depth(n - 1) + 1; }\nprint depth(100000);"
+        output, errors = self.run_source(source)
+        self.assertEqual(errors, [])
+        self.assertEqual(output, "100000\n")
+        output, errors = self.run_source(source, 1000)
+        self.assertEqual(errors[0].report(), "Runtime error at ')' [line 1]: Stack overflow.\n")
+
+    def test_disassemble(self):
+        function = Compiler().compile(self.parse("var a = 1;\nwhile (a < 3) a = a + 1;"))
+        output_buffer = io.StringIO()
+        with unittest.mock.patch('sys.stdout', new=output_buffer):
+            disassemble_chunk(function.chunk, "script")
+        self.assertEqual(output_buffer.getvalue().split("\n"), [
+            "== script ==",
+            "0000    1 OP_CONSTANT         0 '1'",
+            "0002    | OP_DEFINE_GLOBAL    1 'a'",
+            "0004    2 OP_GET_GLOBAL       1 'a'",
+            "0006    | OP_CONSTANT         2 '3'",
+            "0008    | OP_LESS",
+            "0009    | OP_JUMP_IF_FALSE    9 -> 24",
+            "0012    | OP_POP",
+            "0013    | OP_GET_GLOBAL       1 'a'",
+            "0015    | OP_CONSTANT         0 '1'",
+            "0017    | OP_ADD",
+            "0018    | OP_SET_GLOBAL       1 'a'",
+            "0020    | OP_POP",
+            "0021    | OP_LOOP            21 -> 4",
+            "0024    | OP_POP",
+            "0025    | OP_NIL",
+            "0026    | OP_RETURN",
+            ""])
+
+    def test_compile_errors(self):
+        source = "{ " + " ".join(f"var v{i};" for i in range(257)) + " }"
+        error_buffer = io.StringIO()
+        with unittest.mock.patch('sys.stderr', new=error_buffer):
+            self.assertEqual(pylox.run(source, engine="vm"), 65)
+        self.assertEqual(error_buffer.getvalue(),
+                         "Compile error at 'v255' [line 1]: Too many local variables in function.\n"
+                         "Compile error at 'v256' [line 1]: Too many local variables in function.\n")
+
+    def test_large_program(self):
+        lines = [f"var v{i} = {i};" for i in range(300)]
+        lines += ["v299 = v298 + 0.5;", "print v299;", "print v0 + v299;", "print v300;"]
+        output, errors = self.run_source("\n".join(lines))
+        self.assertEqual(output, "298.5\n298.5\n")
+        self.assertEqual(errors[0].report(), "Runtime error at 'v300' [line 304]: Undefined variable 'v300'.\n")
+        function = Compiler().compile(self.parse("\n".join(lines)))
+        self.assertEqual(len(function.chunk.constants), 602)
+        output_buffer = io.StringIO()
+        with unittest.mock.patch('sys.stdout', new=output_buffer):
+            disassemble_chunk(function.chunk, "script")
+        self.assertIn("OP_CONSTANT_LONG  256 '128'", output_buffer.getvalue())
+        self.assertIn("OP_DEFINE_GLOBAL_LONG  257 'v128'", output_buffer.getvalue())
+
+    def test_large_program_with_classes(self):
+        lines = [f"var v{i} = {i};" for i in range(300)]
+        lines += ["fun f(n) { return n + v299; }",
+                  "class A { init(x) { this.x = x; } get() { return this.x; } }",
+                  "class B < A { get() { return super.get() + 1; } }",
+                  "var b = B(f(1));", "b.y = 2;", "print b.x + b.y;", "print b.get();", "b.get(1);"]
+        output, errors = self.run_source("\n".join(lines))
+        self.assertEqual(output, "302\n301\n")
+        self.assertEqual(errors[0].report(), "Runtime error at ')' [line 308]: Expected 0 arguments but got 1.\n")
+        function = Compiler().compile(self.parse("\n".join(lines)))
+        output_buffer = io.StringIO()
+        with unittest.mock.patch('sys.stdout', new=output_buffer):
+            disassemble_chunk(function.chunk, "script")
+        self.assertIn("OP_CLOSURE_LONG", output_buffer.getvalue())
+        self.assertIn("OP_CLASS_LONG", output_buffer.getvalue())
+        self.assertIn("OP_SET_PROPERTY_LONG", output_buffer.getvalue())
+        self.assertIn("OP_GET_PROPERTY_LONG", output_buffer.getvalue())
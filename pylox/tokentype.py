@@ -1,3 +1,5 @@
+from array import array
+from collections.abc import Sequence
 from enum import Enum
 from typing import Any
 
@@ -47,6 +49,8 @@ class TokenType(Enum):
    EOF = "EOF"
 
 class Token:
+    __slots__ = ("type", "lexeme", "literal", "line")
+
     def __init__(self, typ: TokenType, lexeme: str, literal: Any, line: int) -> None:
         self.type = typ
         self.lexeme = lexeme
@@ -59,4 +63,61 @@ class Token:
     def __eq__(self, other):
         if isinstance(other, Token):
             return self.type == other.type and self.lexeme == other.lexeme and self.literal == other.literal
-        return False
\ No newline at end of file
+        return False
+
+TOKEN_TYPES = list(TokenType)
+TOKEN_IDS = {typ: index for index, typ in enumerate(TOKEN_TYPES)}
+
+class TokenArray(Sequence):
+    def __init__(self, source: str | bytes, encoding: str = "utf-8") -> None:
+        offset = 'I' if len(source) < 2 ** 32 else 'Q'
+        self.source = source
+        self.encoding = encoding
+        self.types = array('B')
+        self.starts = array(offset)
+        self.ends = array(offset)
+        self.lines = array('I')
+        self.last = (None, None)
+        self.before_last = (None, None)
+
+    def append(self, typ: TokenType, start: int, end: int, line: int) -> None:
+        self.types.append(TOKEN_IDS[typ])
+        self.starts.append(start)
+        self.ends.append(end)
+        self.lines.append(line)
+
+    def __len__(self) -> int:
+        return len(self.types)
+
+    def type(self, index: int) -> TokenType:
+        return TOKEN_TYPES[self.types[index]]
+
+    def lexeme(self, index: int) -> str:
+        text = self.source[self.starts[index]:self.ends[index]]
+        if isinstance(text, str):
+            return text
+        return text.decode(self.encoding)
+
+    def literal(self, index: int) -> Any:
+        typ = self.type(index)
+        if typ is TokenType.NUMBER:
+            return float(self.lexeme(index))
+        if typ is TokenType.STRING:
+            return self.lexeme(index)[1:-1]
+        return None
+
+    def token(self, index: int) -> Token:
+        return Token(self.type(index), self.lexeme(index), self.literal(index), self.lines[index])
+
+    def __getitem__(self, index: int) -> Token:
+        # The parser only looks at the current and the previous token, so
+        # keeping the last two materialised tokens keeps their identity stable.
+        if self.last[0] == index:
+            return self.last[1]
+        if self.before_last[0] == index:
+            return self.before_last[1]
+        token = self.token(index)
+        self.before_last = self.last
+        self.last = (index, token)
+        return token
+
@@ -0,0 +1,89 @@
+import sys, time, io, contextlib
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from scanner import Scanner
+from parser import Parser
+from pylox import ENGINES, compile_program
+
+def main() -> None:
+    if len(sys.argv) not in (2, 3) or sys.argv[1] not in BENCHMARKS:
+        print(f"Usage: benchmark <{'|'.join(BENCHMARKS)}> [script]")
+        sys.exit(64)
+    benchmark, sample = BENCHMARKS[sys.argv[1]]
+    if len(sys.argv) == 3:
+        source = Path(sys.argv[2]).read_text()
+    else:
+        source = sample()
+    benchmark(source)
+
+def sample_program() -> str:
+    lines = []
+    for i in range(2000):
+        lines.append(f"fun f{i}(a, b) {{")
+        lines.append(f"  var c = (a + b * {i}) / 2 - -a;")
+        lines.append(f"  if (c >= {i} and !(a == b) or c < 0) return c.field.method(a, b);")
+        lines.append(f"  return \"s\" + \"t\";")
+        lines.append("}")
+    return "\n".join(lines)
+
+def sample_workload() -> str:
+    return """fun fib(n) { if (n < 2) return n; return fib(n - 1) + fib(n - 2); }
+class Point {
+  init(x, y) { this.x = x; this.y = y; }
+  add(other) { return Point(this.x + other.x, this.y + other.y); }
+}
+var sum = Point(0, 0);
+for (var i = 0; i < 20000; i = i + 1) {
+  var step = Point(i, 1);
+  sum = sum.add(step);
+}
+var total = 0;
+var j = 0;
+while (j < 100000) { total = total + j * 2; j = j + 1; }
+print fib(20) + sum.x + sum.y + total;"""
+
+def best_of(runs: int, function) -> float:
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def bench_parser(source: str) -> None:
+    tokens, errors = Scanner(source, fast=True).scan_tokens()
+    if errors:
+        sys.exit(65)
+    for name, pratt in (("recursive descent", False), ("pratt", True)):
+        elapsed = best_of(5, lambda: Parser(tokens, pratt).parse())
+        print(f"{name:>18}: {elapsed:.3f}s  {len(tokens) / elapsed:,.0f} tokens/s")
+
+def bench_engine(source: str) -> None:
+    for name, engine in ENGINES.items():
+        def run() -> None:
+            interpreter = engine()
+            statements, error = compile_program(source, "utf-8", interpreter)
+            if error:
+                sys.exit(error)
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                _, errors = interpreter.interpret(statements)
+            timings.append(time.perf_counter() - start)
+            return errors
+        timings = []
+        for _ in range(3):
+            errors = run()
+        if errors:
+            print(f"{name:>18}: {errors[0].message}")
+        else:
+            print(f"{name:>18}: {min(timings):.3f}s")
+
+BENCHMARKS = {
+    "parser": (bench_parser, sample_program),
+    "engine": (bench_engine, sample_workload),
+}
+
+if __name__ == "__main__":
+    main()
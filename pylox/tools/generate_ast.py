@@ -2,43 +2,49 @@ import sys
 from pathlib import Path
 
 def main() -> None:
-    if len(sys.argv) != 2:
-        print("Usage: generate_ast <output_directory>")
+    options = [arg for arg in sys.argv[1:] if arg.startswith("--")]
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    if len(args) != 1 or any(option not in ("--no-slots", "--no-match-args") for option in options):
+        print("Usage: generate_ast <output_directory> [--no-slots] [--no-match-args]")
         sys.exit(64)
-    output_dir = sys.argv[1]
+    output_dir = args[0]
+    slots = "--no-slots" not in options
+    match_args = "--no-match-args" not in options
     Path(output_dir).mkdir(parents=True, exist_ok=True)
     import_for_expr = ["from typing import Any, Protocol",
                        "from tokentype import Token"]
     import_for_stmt = import_for_expr + ["from expr import Expr"]
     define_ast(output_dir, "Expr", import_for_expr, [
-        "Assign   : Token name, Expr value",
-        "Binary   : Expr left, Token operator, Expr right",
+        "Assign   : Token name, Expr value | int depth, int slot",
+        "Binary   : Expr left, Token operator, Expr right | Any handler",
         "Call     : Expr callee, Token paren, list[Expr] arguments",
-        "Get      : Expr object, Token name",
+        "Get      : Expr object, Token name | Any cache",
         "Grouping : Expr expression",
         "Literal  : Any value",
         "Logical  : Expr left, Token operator, Expr right",
         "Set      : Expr object, Token name, Expr value",
-        "Super    : Token keyword, Token method",
-        "This     : Token keyword",
-        "Unary    : Token operator, Expr right",
-        "Variable : Token name"
-    ])
+        "Super    : Token keyword, Token method | int depth, int slot",
+        "This     : Token keyword | int depth, int slot",
+        "Unary    : Token operator, Expr right | Any handler",
+        "Variable : Token name | int depth, int slot"
+    ], slots, match_args)
     define_ast(output_dir, "Stmt", import_for_stmt, [
-        "Block      : list[Stmt] statements",
-        "Class      : Token name, 'ExprVariable' superclass, list['StmtFunction'] methods",
+        "Block      : list[Stmt] statements | int size",
+        "Class      : Token name, 'ExprVariable' superclass, list['StmtFunction'] methods | int slot",
         "Expression : Expr expression",
-        "Function   : Token name, list[Token] parameters, list[Stmt] body",
+        "For        : Stmt initializer, Expr condition, Expr increment, Stmt body | int size",
+        "Function   : Token name, list[Token] parameters, list[Stmt] body | int slot, int size",
         "If         : Expr condition, Stmt then_branch, Stmt else_branch",
         "Print      : Expr expression",
-        "Return     : Token keyword, Expr value",
-        "Var        : Token name, Expr initializer",
+        "Return     : Token keyword, Expr value | bool tail",
+        "Var        : Token name, Expr initializer | int slot",
         "While      : Expr condition, Stmt body"
-    ])
+    ], slots, match_args)
 
 
 
-def define_ast(output_dir: str, base_name: str, imports: list[str], types: list[str]) -> None:
+def define_ast(output_dir: str, base_name: str, imports: list[str], types: list[str],
+               slots: bool = True, match_args: bool = True) -> None:
     path = Path(output_dir) / f"{base_name.lower()}.py"
     with open (path, 'w', encoding='utf-8') as writer:
         # File heading
@@ -47,17 +53,37 @@ def define_ast(output_dir: str, base_name: str, imports: list[str], types: list[
         writer.write(f"\n")
         define_visitor(writer, base_name, types)
         writer.write(f"class {base_name}:\n")
+        if slots:
+            writer.write(f"    __slots__ = ()\n\n")
         writer.write(f"    def accept(self, visitor: {base_name}Visitor) -> Any:\n"+
                      f"        raise NotImplementedError(\"Method accept() must be realized\")\n\n")
         for type_def in types:
             class_name, fields = type_def.split(':', 1)
-            define_type(writer, base_name, class_name.strip(), fields)
+            define_type(writer, base_name, class_name.strip(), fields, slots, match_args)
 
 
-def define_type(writer, base_name: str, class_name: str, fields: str) -> None:
+def define_type(writer, base_name: str, class_name: str, fields: str,
+                slots: bool, match_args: bool) -> None:
     # subclass head
     writer.write(f"class {base_name}{class_name.strip()}({base_name}):\n")
+    # fields after '|' are filled in by the resolver, not the parser;
+    # they start out as None
+    fields, _, resolved = fields.partition("|")
     fields = fields.strip().split(", ")
+    resolved = resolved.split(", ") if resolved.strip() else []
+    names = ", ".join(f'"{field.split()[1]}"' for field in fields)
+    if len(fields) == 1:
+        names += ","
+    slot_names = ", ".join(f'"{field.split()[1]}"' for field in fields + resolved)
+    if len(fields + resolved) == 1:
+        slot_names += ","
+    # compact layout: no per-instance __dict__
+    if slots:
+        writer.write(f"    __slots__ = ({slot_names})\n")
+    if match_args:
+        writer.write(f"    __match_args__ = ({names})\n")
+    if slots or match_args:
+        writer.write("\n")
     writer.write(f"    def __init__(self")
     # type announcement
     for field in fields:
@@ -68,6 +94,9 @@ def define_type(writer, base_name: str, class_name: str, fields: str) -> None:
     for field in fields:
         typ, name = field.strip().split()
         writer.write(f"        self.{name} = {name}\n")
+    for field in resolved:
+        typ, name = field.strip().split()
+        writer.write(f"        self.{name}: {typ} = None\n")
     writer.write('\n' +
                  f"    def accept(self, visitor: {base_name}Visitor) -> Any:\n" +
                  f"        return visitor.visit_{class_name.lower()}_{base_name.lower()}(self)")
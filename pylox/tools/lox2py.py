@@ -0,0 +1,25 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from interpreter import Interpreter
+from pylox import compile_program
+from transpiler import Transpiler
+
+def main() -> None:
+    if len(sys.argv) not in (2, 3):
+        print("Usage: lox2py <script.lox> [output.py]")
+        sys.exit(64)
+    statements, code = compile_program(Path(sys.argv[1]).read_bytes(), "utf-8", Interpreter())
+    if statements is None:
+        sys.exit(code)
+    runtime = str(Path(__file__).resolve().parent.parent)
+    module = Transpiler(runtime_path=runtime).transpile(statements)
+    if len(sys.argv) == 3:
+        Path(sys.argv[2]).write_text(module)
+    else:
+        sys.stdout.write(module)
+
+if __name__ == "__main__":
+    main()
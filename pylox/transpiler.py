@@ -0,0 +1,461 @@
+from expr import *
+from stmt import *
+from tokentype import TokenType
+
+class Symbol:
+    # One Lox local and the Python name it is compiled to. Captured locals
+    # live in a Cell; 'this' and 'super' never change, so they are passed
+    # to nested functions by value instead.
+    __slots__ = ("python", "owner", "constant", "captured")
+
+    def __init__(self, python: str, owner: "FunctionInfo", constant: bool = False) -> None:
+        self.python = python
+        self.owner = owner
+        self.constant = constant
+        self.captured = False
+
+class FunctionInfo:
+    def __init__(self, parent: "FunctionInfo") -> None:
+        self.parent = parent
+        # Captured symbols of enclosing functions used here or further in.
+        self.free: dict[Symbol, None] = {}
+        self.global_writes: set[str] = set()
+        self.parameters: list[Symbol] = []
+        self.this: Symbol = None
+
+class CaptureAnalysis(ExprVisitor, StmtVisitor):
+    # Mirrors the Resolver's scopes to give every local a Python name and to
+    # find which locals nested functions capture. Whether a name is global
+    # is taken from the resolver.
+    def __init__(self) -> None:
+        self.scopes: list[dict[str, Symbol]] = []
+        self.main = FunctionInfo(None)
+        self.function = self.main
+        self.functions: dict[StmtFunction, FunctionInfo] = {}
+        self.declarations: dict[Stmt, Symbol] = {}
+        self.references: dict[Expr, Symbol] = {}
+        self.supers: dict[ExprSuper, tuple[Symbol, Symbol]] = {}
+        self.classes: dict[StmtClass, Symbol] = {}
+        self.globals: dict[str, None] = {"clock": None}
+        self.count = 0
+
+    def analyze(self, statements: list[Stmt]) -> None:
+        for stmt in statements:
+            if stmt is not None:
+                stmt.accept(self)
+
+    def analyze_expr(self, expr: Expr) -> None:
+        if expr is not None:
+            expr.accept(self)
+
+    def symbol(self, prefix: str, name: str, constant: bool = False) -> Symbol:
+        self.count += 1
+        return Symbol(f"{prefix}{name}_{self.count}", self.function, constant)
+
+    def declare(self, stmt: Stmt, name: str) -> None:
+        if self.scopes:
+            symbol = self.symbol("l_", name)
+            self.scopes[-1][name] = symbol
+            self.declarations[stmt] = symbol
+        else:
+            self.globals[name] = None
+            self.function.global_writes.add(name)
+
+    def reference(self, expr: Expr, name: str) -> Symbol:
+        for scope in reversed(self.scopes):
+            if name in scope:
+                symbol = scope[name]
+                function = self.function
+                while function is not symbol.owner:
+                    function.free[symbol] = None
+                    if not symbol.constant:
+                        symbol.captured = True
+                    function = function.parent
+                return symbol
+        return None
+
+    def function_body(self, stmt: StmtFunction, method: bool) -> None:
+        info = FunctionInfo(self.function)
+        self.functions[stmt] = info
+        self.function = info
+        if method:
+            info.this = self.symbol("this_", "", constant=True)
+            self.scopes.append({"this": info.this})
+        info.parameters = [self.symbol("l_", param.lexeme) for param in stmt.parameters]
+        self.scopes.append({param.lexeme: symbol for param, symbol in zip(stmt.parameters, info.parameters)})
+        self.analyze(stmt.body)
+        self.scopes.pop()
+        if method:
+            self.scopes.pop()
+        self.function = info.parent
+
+    def visit_block_stmt(self, stmt: StmtBlock) -> None:
+        self.scopes.append({})
+        self.analyze(stmt.statements)
+        self.scopes.pop()
+
+    def visit_class_stmt(self, stmt: StmtClass) -> None:
+        self.declare(stmt, stmt.name.lexeme)
+        self.analyze_expr(stmt.superclass)
+        if stmt.superclass is not None:
+            self.classes[stmt] = self.symbol("l_super_", stmt.name.lexeme, constant=True)
+            self.scopes.append({"super": self.classes[stmt]})
+        for method in stmt.methods:
+            self.function_body(method, True)
+        if stmt.superclass is not None:
+            self.scopes.pop()
+
+    def visit_expression_stmt(self, stmt: StmtExpression) -> None:
+        self.analyze_expr(stmt.expression)
+
+    def visit_for_stmt(self, stmt: StmtFor) -> None:
+        self.scopes.append({})
+        self.analyze([stmt.initializer])
+        self.analyze_expr(stmt.condition)
+        self.analyze([stmt.body])
+        self.analyze_expr(stmt.increment)
+        self.scopes.pop()
+
+    def visit_function_stmt(self, stmt: StmtFunction) -> None:
+        self.declare(stmt, stmt.name.lexeme)
+        self.function_body(stmt, False)
+
+    def visit_if_stmt(self, stmt: StmtIf) -> None:
+        self.analyze_expr(stmt.condition)
+        self.analyze([stmt.then_branch, stmt.else_branch])
+
+    def visit_print_stmt(self, stmt: StmtPrint) -> None:
+        self.analyze_expr(stmt.expression)
+
+    def visit_return_stmt(self, stmt: StmtReturn) -> None:
+        self.analyze_expr(stmt.value)
+
+    def visit_var_stmt(self, stmt: StmtVar) -> None:
+        self.analyze_expr(stmt.initializer)
+        self.declare(stmt, stmt.name.lexeme)
+
+    def visit_while_stmt(self, stmt: StmtWhile) -> None:
+        self.analyze_expr(stmt.condition)
+        self.analyze([stmt.body])
+
+    def visit_assign_expr(self, expr: ExprAssign) -> None:
+        self.analyze_expr(expr.value)
+        if expr.depth is None:
+            self.globals[expr.name.lexeme] = None
+            self.function.global_writes.add(expr.name.lexeme)
+        else:
+            self.references[expr] = self.reference(expr, expr.name.lexeme)
+
+    def visit_binary_expr(self, expr: ExprBinary) -> None:
+        self.analyze_expr(expr.left)
+        self.analyze_expr(expr.right)
+
+    def visit_call_expr(self, expr: ExprCall) -> None:
+        self.analyze_expr(expr.callee)
+        for argument in expr.arguments:
+            self.analyze_expr(argument)
+
+    def visit_get_expr(self, expr: ExprGet) -> None:
+        self.analyze_expr(expr.object)
+
+    def visit_grouping_expr(self, expr: ExprGrouping) -> None:
+        self.analyze_expr(expr.expression)
+
+    def visit_literal_expr(self, expr: ExprLiteral) -> None:
+        return None
+
+    def visit_logical_expr(self, expr: ExprLogical) -> None:
+        self.analyze_expr(expr.left)
+        self.analyze_expr(expr.right)
+
+    def visit_set_expr(self, expr: ExprSet) -> None:
+        self.analyze_expr(expr.value)
+        self.analyze_expr(expr.object)
+
+    def visit_super_expr(self, expr: ExprSuper) -> None:
+        self.supers[expr] = (self.reference(expr, "super"), self.reference(expr, "this"))
+
+    def visit_this_expr(self, expr: ExprThis) -> None:
+        self.references[expr] = self.reference(expr, "this")
+
+    def visit_unary_expr(self, expr: ExprUnary) -> None:
+        self.analyze_expr(expr.right)
+
+    def visit_variable_expr(self, expr: ExprVariable) -> None:
+        if expr.depth is None:
+            self.globals[expr.name.lexeme] = None
+        else:
+            self.references[expr] = self.reference(expr, expr.name.lexeme)
+
+class Transpiler(ExprVisitor, StmtVisitor):
+    # Compiles a resolved program into a Python module that runs it on
+    # lox_runtime. Expression visitors return Python source; statement
+    # visitors emit lines.
+    comparisons = (TokenType.GREATER, TokenType.GREATER_EQUAL, TokenType.LESS,
+                   TokenType.LESS_EQUAL, TokenType.EQUAL_EQUAL, TokenType.BANG_EQUAL)
+    numeric = {
+        TokenType.GREATER: ">",
+        TokenType.GREATER_EQUAL: ">=",
+        TokenType.LESS: "<",
+        TokenType.LESS_EQUAL: "<=",
+        TokenType.MINUS: "-",
+        TokenType.SLASH: "/",
+        TokenType.STAR: "*"
+    }
+
+    def __init__(self, runtime_path: str = None) -> None:
+        self.runtime_path = runtime_path
+        self.analysis = CaptureAnalysis()
+        self.lines: list[str] = []
+        self.depth = 0
+        self.count = 0
+        # The Lox line of the first call on each generated line, which is
+        # where a stack overflow on that line is reported.
+        self.call_lines: dict[int, int] = {}
+        self.call_line: int = None
+
+    def transpile(self, statements: list[Stmt]) -> str:
+        self.analysis.analyze(statements)
+        self.lines = ["# Generated by lox2py."]
+        if self.runtime_path is not None:
+            self.lines += ["import sys", f"sys.path.insert(0, {self.runtime_path!r})"]
+        self.lines += ["from lox_runtime import *", "", "g_clock = Clock()"]
+        self.lines += [f"g_{name} = UNDEFINED" for name in self.analysis.globals if name != "clock"]
+        self.lines.append("")
+        self.emit("def main():")
+        self.body(self.analysis.main, [], statements)
+        self.lines += ["", f"CALL_LINES = {self.call_lines!r}"]
+        self.lines += ["", "if __name__ == \"__main__\":", "    run(main, CALL_LINES)", ""]
+        return "\n".join(self.lines)
+
+    def emit(self, line: str) -> None:
+        if self.call_line is not None:
+            self.call_lines[len(self.lines) + 1] = self.call_line
+            self.call_line = None
+        self.lines.append("    " * self.depth + line)
+
+    def temp(self) -> str:
+        self.count += 1
+        return f"_t{self.count}"
+
+    def body(self, info: FunctionInfo, parameters: list[Symbol], statements: list[Stmt]) -> None:
+        self.depth += 1
+        start = len(self.lines)
+        if info.global_writes:
+            self.emit("global " + ", ".join(f"g_{name}" for name in sorted(info.global_writes)))
+        for parameter in parameters:
+            if parameter.captured:
+                self.emit(f"{parameter.python} = Cell({parameter.python})")
+        for stmt in statements:
+            self.emit_stmt(stmt)
+        if len(self.lines) == start:
+            self.emit("pass")
+        self.depth -= 1
+
+    def emit_stmt(self, stmt: Stmt) -> None:
+        if stmt is not None:
+            stmt.accept(self)
+
+    def nested(self, stmt: Stmt) -> None:
+        self.depth += 1
+        start = len(self.lines)
+        self.emit_stmt(stmt)
+        if len(self.lines) == start:
+            self.emit("pass")
+        self.depth -= 1
+
+    def expr(self, expr: Expr) -> str:
+        return expr.accept(self)
+
+    def condition(self, expr: Expr) -> str:
+        # Comparisons and '!' always produce a bool; anything else goes
+        # through Lox truthiness.
+        if isinstance(expr, ExprBinary) and expr.operator.type in self.comparisons:
+            return self.expr(expr)
+        if isinstance(expr, ExprUnary) and expr.operator.type == TokenType.BANG:
+            return self.expr(expr)
+        temp = self.temp()
+        return f"({temp} := {self.expr(expr)}) is not None and {temp} is not False"
+
+    def read(self, symbol: Symbol) -> str:
+        return f"{symbol.python}.value" if symbol.captured else symbol.python
+
+    def define(self, stmt: Stmt, name: str, value: str) -> None:
+        symbol = self.analysis.declarations.get(stmt)
+        if symbol is None:
+            self.emit(f"g_{name} = {value}")
+        elif symbol.captured:
+            self.emit(f"{symbol.python}.value = {value}")
+        else:
+            self.emit(f"{symbol.python} = {value}")
+
+    def function(self, stmt: StmtFunction, is_initializer: bool = None) -> str:
+        info = self.analysis.functions[stmt]
+        self.count += 1
+        name = f"fn{self.count}_{stmt.name.lexeme}"
+        parameters = [symbol.python for symbol in info.parameters]
+        if info.this is not None:
+            parameters.insert(0, info.this.python)
+        if info.free:
+            parameters += ["*"] + [f"{symbol.python}={symbol.python}" for symbol in info.free]
+        self.emit(f"def {name}({', '.join(parameters)}):")
+        self.body(info, info.parameters, stmt.body)
+        flag = "" if is_initializer is None else f", {is_initializer}"
+        return f"Function({name}, {stmt.name.lexeme!r}, {len(stmt.parameters)}{flag})"
+
+    def visit_block_stmt(self, stmt: StmtBlock) -> None:
+        for statement in stmt.statements:
+            self.emit_stmt(statement)
+
+    def visit_class_stmt(self, stmt: StmtClass) -> None:
+        symbol = self.analysis.declarations.get(stmt)
+        if symbol is not None and symbol.captured:
+            self.emit(f"{symbol.python} = Cell()")
+        superclass = "None"
+        if stmt.superclass is not None:
+            superclass = self.analysis.classes[stmt].python
+            name = stmt.superclass.name
+            self.emit(f"{superclass} = superclass({self.expr(stmt.superclass)}, {name.lexeme!r}, {name.line})")
+        methods = []
+        for method in stmt.methods:
+            function = self.function(method, method.name.lexeme == "init")
+            methods.append(f"{method.name.lexeme!r}: {function}")
+        self.define(stmt, stmt.name.lexeme, f"LoxClass({stmt.name.lexeme!r}, {superclass}, {{{', '.join(methods)}}})")
+
+    def visit_expression_stmt(self, stmt: StmtExpression) -> None:
+        expr = stmt.expression
+        if not isinstance(expr, ExprAssign):
+            self.emit(self.expr(expr))
+            return
+        value = self.expr(expr.value)
+        if expr.depth is not None:
+            symbol = self.analysis.references[expr]
+            self.emit(f"{self.read(symbol)} = {value}")
+            return
+        temp, name = self.temp(), expr.name
+        self.emit(f"{temp} = {value}")
+        self.emit(f"if g_{name.lexeme} is UNDEFINED: undefined({name.lexeme!r}, {name.line})")
+        self.emit(f"g_{name.lexeme} = {temp}")
+
+    def visit_for_stmt(self, stmt: StmtFor) -> None:
+        self.emit_stmt(stmt.initializer)
+        self.emit(f"while {self.condition(stmt.condition)}:")
+        self.depth += 1
+        self.emit_stmt(stmt.body)
+        if stmt.increment is not None:
+            self.emit_stmt(StmtExpression(stmt.increment))
+        else:
+            self.emit("pass")
+        self.depth -= 1
+
+    def visit_function_stmt(self, stmt: StmtFunction) -> None:
+        symbol = self.analysis.declarations.get(stmt)
+        if symbol is not None and symbol.captured:
+            self.emit(f"{symbol.python} = Cell()")
+        self.define(stmt, stmt.name.lexeme, self.function(stmt))
+
+    def visit_if_stmt(self, stmt: StmtIf) -> None:
+        self.emit(f"if {self.condition(stmt.condition)}:")
+        self.nested(stmt.then_branch)
+        if stmt.else_branch is not None:
+            self.emit("else:")
+            self.nested(stmt.else_branch)
+
+    def visit_print_stmt(self, stmt: StmtPrint) -> None:
+        self.emit(f"print(stringify({self.expr(stmt.expression)}))")
+
+    def visit_return_stmt(self, stmt: StmtReturn) -> None:
+        if stmt.value is None:
+            self.emit("return None")
+        else:
+            self.emit(f"return {self.expr(stmt.value)}")
+
+    def visit_var_stmt(self, stmt: StmtVar) -> None:
+        value = self.expr(stmt.initializer) if stmt.initializer is not None else "None"
+        symbol = self.analysis.declarations.get(stmt)
+        if symbol is not None and symbol.captured:
+            self.emit(f"{symbol.python} = Cell({value})")
+        else:
+            self.define(stmt, stmt.name.lexeme, value)
+
+    def visit_while_stmt(self, stmt: StmtWhile) -> None:
+        self.emit(f"while {self.condition(stmt.condition)}:")
+        self.nested(stmt.body)
+
+    def visit_assign_expr(self, expr: ExprAssign) -> str:
+        value = self.expr(expr.value)
+        if expr.depth is None:
+            return f"assign_global(globals(), {expr.name.lexeme!r}, {value}, {expr.name.line})"
+        symbol = self.analysis.references[expr]
+        if symbol.captured:
+            return f"{symbol.python}.set({value})"
+        return f"({symbol.python} := {value})"
+
+    def visit_binary_expr(self, expr: ExprBinary) -> str:
+        left, right = self.expr(expr.left), self.expr(expr.right)
+        a, b = self.temp(), self.temp()
+        token = expr.operator
+        if token.type == TokenType.EQUAL_EQUAL:
+            return f"(type({a} := {left}) is type({b} := {right}) and {a} == {b})"
+        if token.type == TokenType.BANG_EQUAL:
+            return f"(type({a} := {left}) is not type({b} := {right}) or {a} != {b})"
+        numbers = f"(type({a} := {left}) is float) & (type({b} := {right}) is float)"
+        if token.type == TokenType.PLUS:
+            return f"({a} + {b} if {numbers} else add({a}, {b}, {token.line}))"
+        op = self.numeric[token.type]
+        return f"({a} {op} {b} if {numbers} else operands({op!r}, {token.line}))"
+
+    def visit_call_expr(self, expr: ExprCall) -> str:
+        # The callee and arguments are evaluated once, in order, into temps
+        # that both the direct call and the checked call then use.
+        if self.call_line is None:
+            self.call_line = expr.paren.line
+        callee = self.temp()
+        temps = [self.temp() for _ in expr.arguments]
+        values = [f"({callee} := {self.expr(expr.callee)})"]
+        values += [f"({temp} := {self.expr(argument)})" for temp, argument in zip(temps, expr.arguments)]
+        fast = f"{callee}.fn({', '.join(temps)})"
+        slow = ", ".join([callee, repr(expr.paren.lexeme), str(expr.paren.line)] + temps)
+        return (f"({fast} if ({', '.join(values)},) and type({callee}) is Function "
+                f"and {callee}.parameters == {len(temps)} else call({slow}))")
+
+    def visit_get_expr(self, expr: ExprGet) -> str:
+        return f"get_property({self.expr(expr.object)}, {expr.name.lexeme!r}, {expr.name.line})"
+
+    def visit_grouping_expr(self, expr: ExprGrouping) -> str:
+        return self.expr(expr.expression)
+
+    def visit_literal_expr(self, expr: ExprLiteral) -> str:
+        return repr(expr.value)
+
+    def visit_logical_expr(self, expr: ExprLogical) -> str:
+        left, right, temp = self.expr(expr.left), self.expr(expr.right), self.temp()
+        truthy = f"({temp} := {left}) is not None and {temp} is not False"
+        if expr.operator.type == TokenType.OR:
+            return f"({temp} if {truthy} else {right})"
+        return f"({right} if {truthy} else {temp})"
+
+    def visit_set_expr(self, expr: ExprSet) -> str:
+        name = expr.name
+        instance = f"instance_of({self.expr(expr.object)}, {name.lexeme!r}, {name.line})"
+        return f"store({instance}, {name.lexeme!r}, {self.expr(expr.value)})"
+
+    def visit_super_expr(self, expr: ExprSuper) -> str:
+        superclass, this = self.analysis.supers[expr]
+        method = expr.method
+        return f"super_method({superclass.python}, {this.python}, {method.lexeme!r}, {method.line})"
+
+    def visit_this_expr(self, expr: ExprThis) -> str:
+        return self.analysis.references[expr].python
+
+    def visit_unary_expr(self, expr: ExprUnary) -> str:
+        right, temp = self.expr(expr.right), self.temp()
+        if expr.operator.type == TokenType.BANG:
+            return f"(({temp} := {right}) is None or {temp} is False)"
+        return f"(-{temp} if type({temp} := {right}) is float else operand({expr.operator.line}))"
+
+    def visit_variable_expr(self, expr: ExprVariable) -> str:
+        if expr.depth is not None:
+            return self.read(self.analysis.references[expr])
+        name = expr.name
+        return f"(g_{name.lexeme} if g_{name.lexeme} is not UNDEFINED else undefined({name.lexeme!r}, {name.line}))"
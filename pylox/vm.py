@@ -0,0 +1,441 @@
+from typing import Any
+from tokentype import Token, TokenType
+from environment import RuntimeException
+from lox_callable import LoxCallable, LoxInstance, Shape, Clock
+from interpreter import Interpreter, stringify
+from chunk import Function, OpCode
+from compiler import Compiler
+
+# The default limit on call depth. Calls only use the VM's own frame list,
+# never the Python stack, so this can be raised as far as memory allows.
+FRAMES_MAX = 250_000
+
+(OP_CONSTANT, OP_NIL, OP_TRUE, OP_FALSE, OP_POP, OP_GET_LOCAL, OP_SET_LOCAL, OP_GET_GLOBAL,
+ OP_DEFINE_GLOBAL, OP_SET_GLOBAL, OP_GET_UPVALUE, OP_SET_UPVALUE, OP_EQUAL, OP_GREATER,
+ OP_LESS, OP_ADD, OP_SUBSTRACT, OP_MULTIPLY, OP_DIVIDE, OP_NOT, OP_NEGATE, OP_PRINT,
+ OP_JUMP, OP_JUMP_IF_FALSE, OP_LOOP, OP_CALL, OP_CLOSURE, OP_CLOSE_UPVALUE,
+ OP_RETURN, OP_GET_PROPERTY, OP_SET_PROPERTY, OP_GET_SUPER, OP_INVOKE, OP_SUPER_INVOKE,
+ OP_CLASS, OP_INHERIT, OP_METHOD, OP_CONSTANT_LONG, OP_GET_GLOBAL_LONG, OP_DEFINE_GLOBAL_LONG,
+ OP_SET_GLOBAL_LONG, OP_CLOSURE_LONG, OP_GET_PROPERTY_LONG, OP_SET_PROPERTY_LONG, OP_GET_SUPER_LONG,
+ OP_CLASS_LONG, OP_METHOD_LONG) = (int(op) for op in OpCode)
+
+class Upvalue:
+    # Points at a stack slot while the variable is live, then holds the
+    # value itself once its scope ends.
+    __slots__ = ("index", "value")
+
+    def __init__(self, index: int) -> None:
+        self.index = index
+        self.value = None
+
+class Closure:
+    __slots__ = ("function", "upvalues")
+
+    def __init__(self, function: Function, upvalues: list[Upvalue]) -> None:
+        self.function = function
+        self.upvalues = upvalues
+
+    def arity(self) -> int:
+        return self.function.arity
+
+    def __str__(self) -> str:
+        return f"function {self.function.name}"
+
+class Class:
+    # Instances keep their fields in the same shapes as the tree-walker's.
+    __slots__ = ("name", "methods", "initializer", "shape")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.methods: dict[str, Closure] = {}
+        self.initializer: Closure = None
+        self.shape = Shape()
+
+    def arity(self) -> int:
+        return self.initializer.function.arity if self.initializer is not None else 0
+
+    def __str__(self) -> str:
+        return self.name
+
+class BoundMethod:
+    __slots__ = ("receiver", "method")
+
+    def __init__(self, receiver: LoxInstance, method: Closure) -> None:
+        self.receiver = receiver
+        self.method = method
+
+    def arity(self) -> int:
+        return self.method.function.arity
+
+    def __str__(self) -> str:
+        return str(self.method)
+
+class CallFrame:
+    __slots__ = ("closure", "ip", "base")
+
+    def __init__(self, closure: Closure, ip: int, base: int) -> None:
+        self.closure = closure
+        self.ip = ip
+        self.base = base
+
+class VM:
+    def __init__(self, max_depth: int = FRAMES_MAX) -> None:
+        self.max_depth = max_depth
+        self.stack: list[Any] = []
+        self.frames: list[CallFrame] = []
+        self.globals: dict[str, Any] = {"clock": Clock()}
+        self.open_upvalues: dict[int, Upvalue] = {}
+
+    def interpret(self, function: Function) -> None:
+        closure = Closure(function, [])
+        self.stack.append(closure)
+        self.frames.append(CallFrame(closure, 0, 0))
+        self.run()
+
+    def error(self, frame: CallFrame, offset: int, message: str) -> RuntimeException:
+        chunk = frame.closure.function.chunk
+        token = chunk.tokens.get(offset)
+        if token is None:
+            token = Token(TokenType.EOF, "", None, chunk.lines[offset])
+        self.stack.clear()
+        self.frames.clear()
+        self.open_upvalues.clear()
+        return RuntimeException(token, message)
+
+    def capture_upvalue(self, index: int) -> Upvalue:
+        upvalue = self.open_upvalues.get(index)
+        if upvalue is None:
+            upvalue = self.open_upvalues[index] = Upvalue(index)
+        return upvalue
+
+    def close_upvalues(self, last: int) -> None:
+        stack = self.stack
+        for index in [index for index in self.open_upvalues if index >= last]:
+            upvalue = self.open_upvalues.pop(index)
+            upvalue.value = stack[index]
+            upvalue.index = None
+
+    def call_value(self, callee: Any, count: int, frame: CallFrame, offset: int) -> Closure:
+        # Handles calling anything but a closure. Returns the closure still
+        # to be entered, if any, with its receiver already in slot zero.
+        stack = self.stack
+        if type(callee) is BoundMethod:
+            stack[-1 - count] = callee.receiver
+            return callee.method
+        if type(callee) is Class:
+            stack[-1 - count] = LoxInstance(callee)
+            if callee.initializer is not None:
+                return callee.initializer
+            if count != 0:
+                raise self.error(frame, offset, f"Expected 0 arguments but got {count}.")
+            return None
+        if isinstance(callee, LoxCallable):
+            if count != callee.arity():
+                raise self.error(frame, offset, f"Expected {callee.arity()} arguments but got {count}.")
+            arguments = stack[len(stack) - count:]
+            del stack[len(stack) - count - 1:]
+            stack.append(callee.call(None, arguments))
+            return None
+        raise self.error(frame, offset, "Can only call functions and classes.")
+
+    def run(self) -> None:
+        # The current frame's state lives in locals and is written back to
+        # the frame only around calls.
+        stack, frames, globals, max_depth = self.stack, self.frames, self.globals, self.max_depth
+        frame = frames[-1]
+        closure = frame.closure
+        code, constants = closure.function.chunk.code, closure.function.chunk.constants
+        ip, base = frame.ip, frame.base
+        while True:
+            op = code[ip]
+            ip += 1
+            if op == OP_GET_LOCAL:
+                stack.append(stack[base + code[ip]])
+                ip += 1
+            elif op == OP_CONSTANT:
+                stack.append(constants[code[ip]])
+                ip += 1
+            elif op == OP_POP:
+                stack.pop()
+            elif op == OP_JUMP_IF_FALSE:
+                value = stack[-1]
+                if value is None or value is False:
+                    ip += (code[ip] << 8 | code[ip + 1]) + 2
+                else:
+                    ip += 2
+            elif op == OP_SET_LOCAL:
+                stack[base + code[ip]] = stack[-1]
+                ip += 1
+            elif op == OP_GET_UPVALUE:
+                upvalue = closure.upvalues[code[ip]]
+                stack.append(stack[upvalue.index] if upvalue.index is not None else upvalue.value)
+                ip += 1
+            elif op == OP_SET_UPVALUE:
+                upvalue = closure.upvalues[code[ip]]
+                if upvalue.index is not None:
+                    stack[upvalue.index] = stack[-1]
+                else:
+                    upvalue.value = stack[-1]
+                ip += 1
+            elif op == OP_LESS or op == OP_GREATER or op == OP_SUBSTRACT or op == OP_MULTIPLY or op == OP_DIVIDE:
+                b = stack.pop()
+                a = stack[-1]
+                if type(a) is not float or type(b) is not float:
+                    raise self.error(frame, ip - 1, "Operands must be numbers.")
+                if op == OP_LESS:
+                    stack[-1] = a < b
+                elif op == OP_GREATER:
+                    stack[-1] = a > b
+                elif op == OP_SUBSTRACT:
+                    stack[-1] = a - b
+                elif op == OP_MULTIPLY:
+                    stack[-1] = a * b
+                else:
+                    stack[-1] = a / b
+            elif op == OP_ADD:
+                b = stack.pop()
+                a = stack[-1]
+                if (type(a) is float and type(b) is float) or (type(a) is str and type(b) is str):
+                    stack[-1] = a + b
+                else:
+                    raise self.error(frame, ip - 1, "Operand must be two numbers or two strings.")
+            elif op == OP_LOOP:
+                ip -= (code[ip] << 8 | code[ip + 1]) - 2
+            elif op == OP_JUMP:
+                ip += (code[ip] << 8 | code[ip + 1]) + 2
+            elif op == OP_GET_GLOBAL:
+                name = constants[code[ip]]
+                value = globals.get(name, globals)
+                if value is globals:
+                    raise self.error(frame, ip - 1, f"Undefined variable '{name}'.")
+                stack.append(value)
+                ip += 1
+            elif op == OP_CALL:
+                count = code[ip]
+                ip += 1
+                callee = stack[-1 - count]
+                if type(callee) is not Closure:
+                    callee = self.call_value(callee, count, frame, ip - 2)
+                    if callee is None:
+                        continue
+                if count != callee.function.arity:
+                    raise self.error(frame, ip - 2, f"Expected {callee.function.arity} arguments but got {count}.")
+                if len(frames) == max_depth:
+                    raise self.error(frame, ip - 2, "Stack overflow.")
+                frame.ip = ip
+                frame = CallFrame(callee, 0, len(stack) - count - 1)
+                frames.append(frame)
+                closure = callee
+                code, constants = closure.function.chunk.code, closure.function.chunk.constants
+                ip, base = 0, frame.base
+            elif op == OP_RETURN:
+                result = stack.pop()
+                if self.open_upvalues:
+                    self.close_upvalues(base)
+                frames.pop()
+                del stack[base:]
+                if not frames:
+                    return
+                stack.append(result)
+                frame = frames[-1]
+                closure = frame.closure
+                code, constants = closure.function.chunk.code, closure.function.chunk.constants
+                ip, base = frame.ip, frame.base
+            elif op == OP_INVOKE or op == OP_SUPER_INVOKE:
+                # The token for the method's name is at the instruction and
+                # the call's paren at its operand.
+                name, count = constants[code[ip]], code[ip + 1]
+                ip += 2
+                if op == OP_INVOKE:
+                    receiver = stack[-1 - count]
+                    if type(receiver) is not LoxInstance:
+                        raise self.error(frame, ip - 3, "Only instances have properties.")
+                    index = receiver.shape.get(name)
+                    if index is not None:
+                        callee = stack[-1 - count] = receiver.values[index]
+                        if type(callee) is not Closure:
+                            callee = self.call_value(callee, count, frame, ip - 2)
+                            if callee is None:
+                                continue
+                    else:
+                        callee = receiver.klass.methods.get(name)
+                else:
+                    callee = stack.pop().methods.get(name)
+                if callee is None:
+                    raise self.error(frame, ip - 3, f"Undefined property '{name}'.")
+                if count != callee.function.arity:
+                    raise self.error(frame, ip - 2, f"Expected {callee.function.arity} arguments but got {count}.")
+                if len(frames) == max_depth:
+                    raise self.error(frame, ip - 2, "Stack overflow.")
+                frame.ip = ip
+                frame = CallFrame(callee, 0, len(stack) - count - 1)
+                frames.append(frame)
+                closure = callee
+                code, constants = closure.function.chunk.code, closure.function.chunk.constants
+                ip, base = 0, frame.base
+            elif op == OP_GET_PROPERTY:
+                instance = stack[-1]
+                if type(instance) is not LoxInstance:
+                    raise self.error(frame, ip - 1, "Only instances have properties.")
+                name = constants[code[ip]]
+                index = instance.shape.get(name)
+                if index is not None:
+                    stack[-1] = instance.values[index]
+                else:
+                    method = instance.klass.methods.get(name)
+                    if method is None:
+                        raise self.error(frame, ip - 1, f"Undefined property '{name}'.")
+                    stack[-1] = BoundMethod(instance, method)
+                ip += 1
+            elif op == OP_SET_PROPERTY:
+                instance = stack[-2]
+                if type(instance) is not LoxInstance:
+                    raise self.error(frame, ip - 1, "Only instances have fields.")
+                value = stack.pop()
+                instance.store(constants[code[ip]], value)
+                stack[-1] = value
+                ip += 1
+            elif op == OP_GET_SUPER:
+                name = constants[code[ip]]
+                method = stack.pop().methods.get(name)
+                if method is None:
+                    raise self.error(frame, ip - 1, f"Undefined property '{name}'.")
+                stack[-1] = BoundMethod(stack[-1], method)
+                ip += 1
+            elif op == OP_NIL:
+                stack.append(None)
+            elif op == OP_TRUE:
+                stack.append(True)
+            elif op == OP_FALSE:
+                stack.append(False)
+            elif op == OP_EQUAL:
+                b = stack.pop()
+                a = stack[-1]
+                stack[-1] = type(a) is type(b) and a == b
+            elif op == OP_NOT:
+                value = stack[-1]
+                stack[-1] = value is None or value is False
+            elif op == OP_NEGATE:
+                value = stack[-1]
+                if type(value) is not float:
+                    raise self.error(frame, ip - 1, "Operand must be a number.")
+                stack[-1] = -value
+            elif op == OP_PRINT:
+                print(stringify(stack.pop()))
+            elif op == OP_SET_GLOBAL:
+                name = constants[code[ip]]
+                if name not in globals:
+                    raise self.error(frame, ip - 1, f"Undefined variable '{name}'.")
+                globals[name] = stack[-1]
+                ip += 1
+            elif op == OP_DEFINE_GLOBAL:
+                globals[constants[code[ip]]] = stack.pop()
+                ip += 1
+            elif op == OP_CLOSURE or op == OP_CLOSURE_LONG:
+                if op == OP_CLOSURE:
+                    function = constants[code[ip]]
+                    ip += 1
+                else:
+                    function = constants[code[ip] << 16 | code[ip + 1] << 8 | code[ip + 2]]
+                    ip += 3
+                upvalues = []
+                for _ in range(function.upvalue_count):
+                    if code[ip]:
+                        upvalues.append(self.capture_upvalue(base + code[ip + 1]))
+                    else:
+                        upvalues.append(closure.upvalues[code[ip + 1]])
+                    ip += 2
+                stack.append(Closure(function, upvalues))
+            elif op == OP_CLOSE_UPVALUE:
+                self.close_upvalues(len(stack) - 1)
+                stack.pop()
+            elif op == OP_CLASS:
+                stack.append(Class(constants[code[ip]]))
+                ip += 1
+            elif op == OP_INHERIT:
+                superclass = stack[-2]
+                if type(superclass) is not Class:
+                    raise self.error(frame, ip - 1, "Superclass must be a class.")
+                klass = stack.pop()
+                klass.methods.update(superclass.methods)
+                klass.initializer = superclass.initializer
+            elif op == OP_METHOD:
+                name = constants[code[ip]]
+                method = stack.pop()
+                stack[-1].methods[name] = method
+                if name == "init":
+                    stack[-1].initializer = method
+                ip += 1
+            else:
+                # The long forms, which only chunks with over 256 constants use.
+                constant = constants[code[ip] << 16 | code[ip + 1] << 8 | code[ip + 2]]
+                ip += 3
+                if op == OP_CONSTANT_LONG:
+                    stack.append(constant)
+                elif op == OP_GET_GLOBAL_LONG:
+                    value = globals.get(constant, globals)
+                    if value is globals:
+                        raise self.error(frame, ip - 4, f"Undefined variable '{constant}'.")
+                    stack.append(value)
+                elif op == OP_DEFINE_GLOBAL_LONG:
+                    globals[constant] = stack.pop()
+                elif op == OP_SET_GLOBAL_LONG:
+                    if constant not in globals:
+                        raise self.error(frame, ip - 4, f"Undefined variable '{constant}'.")
+                    globals[constant] = stack[-1]
+                elif op == OP_GET_PROPERTY_LONG:
+                    instance = stack[-1]
+                    if type(instance) is not LoxInstance:
+                        raise self.error(frame, ip - 4, "Only instances have properties.")
+                    index = instance.shape.get(constant)
+                    if index is not None:
+                        stack[-1] = instance.values[index]
+                    else:
+                        method = instance.klass.methods.get(constant)
+                        if method is None:
+                            raise self.error(frame, ip - 4, f"Undefined property '{constant}'.")
+                        stack[-1] = BoundMethod(instance, method)
+                elif op == OP_SET_PROPERTY_LONG:
+                    instance = stack[-2]
+                    if type(instance) is not LoxInstance:
+                        raise self.error(frame, ip - 4, "Only instances have fields.")
+                    value = stack.pop()
+                    instance.store(constant, value)
+                    stack[-1] = value
+                elif op == OP_GET_SUPER_LONG:
+                    method = stack.pop().methods.get(constant)
+                    if method is None:
+                        raise self.error(frame, ip - 4, f"Undefined property '{constant}'.")
+                    stack[-1] = BoundMethod(stack[-1], method)
+                elif op == OP_CLASS_LONG:
+                    stack.append(Class(constant))
+                else:
+                    method = stack.pop()
+                    stack[-1].methods[constant] = method
+                    if constant == "init":
+                        stack[-1].initializer = method
+
+class VMInterpreter(Interpreter):
+    # Runs a resolved program by compiling it to bytecode for the VM. Lox
+    # calls never nest Python calls, so recursion is limited only by
+    # max_depth.
+    def __init__(self, max_depth: int = FRAMES_MAX) -> None:
+        super().__init__()
+        self.max_depth = max_depth
+        self.function: Function = None
+
+    def compile(self, stmts: list) -> list:
+        compiler = Compiler()
+        self.function = compiler.compile(stmts)
+        return compiler.errors
+
+    def interpret(self, stmts: list) -> tuple:
+        if self.function is None:
+            errors = self.compile(stmts)
+            if errors:
+                return None, errors
+        try:
+            VM(self.max_depth).interpret(self.function)
+        except RuntimeException as error:
+            self.errors.append(error)
+        return None, self.errors